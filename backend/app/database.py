@@ -1,22 +1,54 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+from typing import List, Optional
+import itertools
+import logging
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
+from app.utils.metrics import DB_POOL_CHECKOUT_WAIT
+from app.utils.query_tracking import install_query_hooks
+from app.utils.read_your_writes import pinned_to_primary
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each connection checkout waited"""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
+def _create_engine(url: str):
+    # SQLite (local/test use) keeps SQLAlchemy's default pool for its dialect
+    if make_url(url).get_backend_name() == "sqlite":
+        return create_engine(url)
+    return create_engine(url, poolclass=InstrumentedQueuePool)
+
 # Get database URL from environment
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 # Handle special characters in password
 if DATABASE_URL:
     # SQLAlchemy requires URL encoding for special characters
-    engine = create_engine(DATABASE_URL)
+    engine = _create_engine(DATABASE_URL)
 else:
     # Fallback to local database
     DATABASE_URL = "postgresql://localhost:5432/propvivo_meeting_scheduler"
-    engine = create_engine(DATABASE_URL)
+    engine = _create_engine(DATABASE_URL)
+
+# Per-request query counting / N+1 detection
+install_query_hooks(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
@@ -27,3 +59,116 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Read replicas (comma-separated URLs). Reads through get_read_db() go to a healthy
+# replica unless the client wrote recently (see app/utils/read_your_writes.py).
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_HEALTH_INTERVAL_SECONDS = float(os.getenv("REPLICA_HEALTH_INTERVAL_SECONDS", "10"))
+# Postgres replicas further behind than this are taken out of rotation
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "30"))
+
+class Replica:
+    def __init__(self, url: str):
+        self.name = make_url(url).render_as_string(hide_password=True)
+        self.engine = _create_engine(url)
+        install_query_hooks(self.engine)
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine,
+                                            info={"replica": self.name})
+        self.healthy = True
+        self.lag_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        event.listen(self.engine, "handle_error", self._on_error)
+
+    def _on_error(self, context):
+        # A dropped connection takes the replica out of rotation until the next good health check
+        if context.is_disconnect:
+            self.mark_down(str(context.original_exception))
+
+    def mark_down(self, error: str):
+        if self.healthy:
+            logger.warning("Read replica marked unhealthy", extra={"replica": self.name, "error": error})
+        self.healthy = False
+        self.last_error = error
+
+    def check(self) -> bool:
+        try:
+            with self.engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+                lag = None
+                if self.engine.dialect.name == "postgresql":
+                    lag = connection.execute(text(
+                        "SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"
+                    )).scalar()
+            self.lag_seconds = float(lag) if lag is not None else None
+            if self.lag_seconds is not None and self.lag_seconds > REPLICA_MAX_LAG_SECONDS:
+                self.mark_down(f"replication lag {self.lag_seconds:.1f}s")
+                return False
+        except Exception as e:
+            self.mark_down(str(e))
+            return False
+        if not self.healthy:
+            logger.info("Read replica back in rotation", extra={"replica": self.name})
+        self.healthy = True
+        self.last_error = None
+        return True
+
+    def status(self) -> dict:
+        return {"replica": self.name, "healthy": self.healthy, "lag_seconds": self.lag_seconds, "error": self.last_error}
+
+class ReplicaSet:
+    def __init__(self, replicas: List[Replica]):
+        self.replicas = replicas
+        self._next = itertools.count()
+
+    def pick(self) -> Optional[Replica]:
+        """Next healthy replica, round robin; None when there is none"""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._next) % len(healthy)]
+
+    def check_all(self):
+        for replica in self.replicas:
+            replica.check()
+
+    def status(self) -> List[dict]:
+        return [replica.status() for replica in self.replicas]
+
+replicas = ReplicaSet([Replica(url) for url in DATABASE_REPLICA_URLS])
+
+@event.listens_for(Session, "before_flush")
+def _refuse_replica_writes(session, flush_context, instances):
+    if session.info.get("replica") and (session.new or session.dirty or session.deleted):
+        raise RuntimeError("Write attempted on a read-replica session; use get_db for writes")
+
+def read_session_factory():
+    """Where a read-only request should read: the primary while pinned or when no replica is healthy"""
+    if pinned_to_primary():
+        return SessionLocal
+    replica = replicas.pick()
+    return replica.session_factory if replica is not None else SessionLocal
+
+def _get_replica_db():
+    db = read_session_factory()()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Without replicas, reads share the request's primary session (FastAPI caches a
+# dependency per request by callable, so this avoids a second connection)
+get_read_db = _get_replica_db if replicas.replicas else get_db
+
+def start_replica_health_checks(stop: threading.Event) -> Optional[threading.Thread]:
+    """Ping every replica each REPLICA_HEALTH_INTERVAL_SECONDS until `stop` is set"""
+    if not replicas.replicas:
+        return None
+
+    def run():
+        while not stop.wait(REPLICA_HEALTH_INTERVAL_SECONDS):
+            replicas.check_all()
+
+    replicas.check_all()
+    thread = threading.Thread(target=run, name="replica-health", daemon=True)
+    thread.start()
+    return thread
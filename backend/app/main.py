@@ -1,19 +1,44 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import os
+import threading
 from dotenv import load_dotenv
 
-from app.database import engine, Base
-from app.routes import messages, schedule, meetings, auth
+from app.database import replicas, start_replica_health_checks
+from app.routes import messages, schedule, meetings, auth, admin
+from app.services.clients import WARM_CLIENTS, warm_clients
+from app.services.outbox import start_outbox_workers
+from app.utils.metrics import MetricsMiddleware, register_route_templates, render_metrics
+from app.utils.query_tracking import QueryCountMiddleware
+from app.utils.log import RequestContextMiddleware, configure_logging
+from app.utils.read_your_writes import PrimaryPinMiddleware
+from app.utils.profiling import ProfilingMiddleware
 
 load_dotenv()
+configure_logging()
+
+# Schema setup is an explicit step (python -m app.migrate); opt back in for local dev
+AUTO_CREATE_SCHEMA = os.getenv("AUTO_CREATE_SCHEMA", "False").lower() in ("1", "true", "yes")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Creating the tables when the start up happensz.
-    Base.metadata.create_all(bind=engine)
+    if AUTO_CREATE_SCHEMA:
+        from app.migrate import migrate
+        migrate()
+    # Import the deferred SDKs in the background; startup doesn't wait for them
+    if WARM_CLIENTS:
+        asyncio.get_running_loop().run_in_executor(None, warm_clients)
+    # Replica pings run on their own thread; a failing replica is skipped until it recovers
+    stop_health_checks = threading.Event()
+    await asyncio.get_running_loop().run_in_executor(None, start_replica_health_checks, stop_health_checks)
+    # Notifications queued in the outbox are delivered by worker threads, never inside a request
+    stop_outbox = threading.Event()
+    start_outbox_workers(stop_outbox)
     yield
+    stop_health_checks.set()
+    stop_outbox.set()
 
 app = FastAPI(
     title="PropVivo Meeting Scheduler",
@@ -29,13 +54,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    #lets browser clients on another origin read the read-your-writes pin and echo it
+    expose_headers=["X-DB-Pin"],
 )
 
-#routers
-app.include_router(auth.router, prefix="/api/auth", tags=["authentication"])
-app.include_router(messages.router, prefix="/api", tags=["messages"])
-app.include_router(schedule.router, prefix="/api", tags=["schedule"])
-app.include_router(meetings.router, prefix="/api", tags=["meetings"])
+#request ids, latency and SQL query counts per route; read-your-writes pin for replica routing;
+#on-demand profiles (inside the query counter, which collects their SQL)
+app.add_middleware(PrimaryPinMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(QueryCountMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestContextMiddleware)
+
+#routers; their full path templates label per-route metrics and query budgets
+for router, prefix, tag in (
+    (auth.router, "/api/auth", "authentication"),
+    (messages.router, "/api", "messages"),
+    (schedule.router, "/api", "schedule"),
+    (meetings.router, "/api", "meetings"),
+    (admin.router, "/api/admin", "admin"),
+):
+    app.include_router(router, prefix=prefix, tags=[tag])
+    register_route_templates(router, prefix)
 
 @app.get("/")
 async def root():
@@ -43,4 +83,16 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    if not replicas.replicas:
+        return {"status": "healthy"}
+    # Replicas failing over to the primary degrade reads, not availability
+    replica_status = replicas.status()
+    status = "healthy" if all(replica["healthy"] for replica in replica_status) else "degraded"
+    return {"status": status, "replicas": replica_status}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
+
+register_route_templates(app.router)
@@ -0,0 +1,36 @@
+"""Explicit schema setup, kept out of the request-serving startup path.
+
+Run once per deploy (or after pulling new models):
+
+    cd backend
+    python -m app.migrate
+
+create_all only adds missing tables and their indexes; changes to existing
+tables go through the scripts in backend/scripts (e.g. partition_messages.py).
+Set AUTO_CREATE_SCHEMA=True to have the app do this on startup instead, which
+is handy for local development and throwaway SQLite databases.
+"""
+import logging
+import time
+
+from app.database import Base, engine
+import app.models  # noqa: F401  (registers every table on Base.metadata)
+
+logger = logging.getLogger(__name__)
+
+
+def migrate(bind=None) -> float:
+    """Create missing tables; returns the seconds it took"""
+    start = time.perf_counter()
+    Base.metadata.create_all(bind=bind or engine)
+    elapsed = time.perf_counter() - start
+    logger.info("Schema up to date", extra={"duration_ms": round(elapsed * 1000, 1)})
+    return elapsed
+
+
+if __name__ == "__main__":
+    from app.utils.log import configure_logging
+
+    configure_logging()
+    migrate()
+    print("Schema up to date")
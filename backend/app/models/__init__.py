@@ -1,6 +1,9 @@
 from .user import User
 from .chat import Chat
 from .message import Message
-from .meeting import Meeting, MeetingParticipant
+from .meeting import Meeting, MeetingParticipant, MeetingException
+from .chat_member import ChatMember
+from .availability import AvailabilitySlot
+from .outbox import OutboxMessage
 
-__all__ = ["User", "Chat", "Message", "Meeting", "MeetingParticipant"]
+__all__ = ["User", "Chat", "Message", "Meeting", "MeetingParticipant", "MeetingException", "ChatMember", "AvailabilitySlot", "OutboxMessage"]
@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, CheckConstraint, DDL, event
+from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+class AvailabilitySlot(Base):
+    """One time range a participant said they are (or are not) free, extracted from a chat"""
+    __tablename__ = "availability_slots"
+    __table_args__ = (
+        CheckConstraint("end_utc > start_utc", name="availability_slots_range_check"),
+        Index("availability_slots_chat_range_idx", "chat_id", "start_utc", "end_utc"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    chat_id = Column(Integer, ForeignKey("chats.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("app_users.id"), nullable=False, index=True)
+    start_utc = Column(DateTime(timezone=True), nullable=False)
+    end_utc = Column(DateTime(timezone=True), nullable=False)
+    kind = Column(String, nullable=False, default="available")  # available, unavailable
+    source = Column(String, nullable=False, default="llm")  # llm = written by the scheduling agent
+    # Message the slot was read from; no FK because partitioned messages have a composite key
+    source_message_id = Column(Integer, nullable=True, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    #Relationships
+    user = relationship("User")
+
+# Postgres: the same range as a tstzrange with a GiST index, so overlap filters
+# (chat_id = ? AND during && ?) are index scans. Not mapped; only
+# app/services/availability.py queries it.
+POSTGRES_RANGE_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    "ALTER TABLE availability_slots ADD COLUMN IF NOT EXISTS during tstzrange "
+    "GENERATED ALWAYS AS (tstzrange(start_utc, end_utc, '[)')) STORED",
+    "CREATE INDEX IF NOT EXISTS availability_slots_during_idx ON availability_slots USING GIST (chat_id, during)",
+]
+
+for _statement in POSTGRES_RANGE_DDL:
+    event.listen(AvailabilitySlot.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
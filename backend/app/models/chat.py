@@ -13,3 +13,4 @@ class Chat(Base):
     # Relationships
     messages = relationship("Message", back_populates="chat")
     meetings = relationship("Meeting", back_populates="chat")
+    members = relationship("ChatMember", back_populates="chat")
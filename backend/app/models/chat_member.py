@@ -0,0 +1,76 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, event, select
+from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
+from sqlalchemy.dialects import postgresql, sqlite
+from app.database import Base
+from app.models.message import Message
+
+class ChatMember(Base):
+    """Who has posted in a chat, kept up to date on every message insert"""
+    __tablename__ = "chat_members"
+
+    chat_id = Column(Integer, ForeignKey("chats.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("app_users.id"), primary_key=True, index=True)
+    first_message_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_message_at = Column(DateTime(timezone=True), server_default=func.now())
+    message_count = Column(Integer, nullable=False, default=0)
+
+    #Relationships
+    chat = relationship("Chat", back_populates="members")
+    user = relationship("User")
+
+_UPSERT_DIALECTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+def upsert_chat_member(connection, chat_id: int, user_id: int, sent_at=None):
+    """Record one more message from user_id in chat_id"""
+    table = ChatMember.__table__
+    sent_at = sent_at if sent_at is not None else func.now()
+
+    insert = _UPSERT_DIALECTS.get(connection.dialect.name)
+    if insert is not None:
+        stmt = insert(table).values(
+            chat_id=chat_id, user_id=user_id,
+            first_message_at=sent_at, last_message_at=sent_at, message_count=1
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.chat_id, table.c.user_id],
+            set_={
+                "last_message_at": stmt.excluded.last_message_at,
+                "message_count": table.c.message_count + 1,
+            }
+        )
+        connection.execute(stmt)
+        return
+
+    # Other backends: update, and insert when there was nothing to update
+    result = connection.execute(
+        table.update()
+        .where(table.c.chat_id == chat_id, table.c.user_id == user_id)
+        .values(last_message_at=sent_at, message_count=table.c.message_count + 1)
+    )
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(
+            chat_id=chat_id, user_id=user_id,
+            first_message_at=sent_at, last_message_at=sent_at, message_count=1
+        ))
+
+def rebuild_chat_members(connection, chat_ids):
+    """Recompute chat_members for these chats from the messages table (after bulk inserts or deletes)"""
+    table = ChatMember.__table__
+    messages = Message.__table__
+    chat_ids = list(chat_ids)
+    if not chat_ids:
+        return
+    connection.execute(table.delete().where(table.c.chat_id.in_(chat_ids)))
+    connection.execute(table.insert().from_select(
+        ["chat_id", "user_id", "first_message_at", "last_message_at", "message_count"],
+        select(messages.c.chat_id, messages.c.user_id, func.min(messages.c.created_at),
+               func.max(messages.c.created_at), func.count(messages.c.id))
+        .where(messages.c.chat_id.in_(chat_ids))
+        .group_by(messages.c.chat_id, messages.c.user_id)
+    ))
+
+@event.listens_for(Message, "after_insert")
+def _track_chat_member(mapper, connection, target):
+    # created_at is a server default and not loaded yet unless it was set explicitly
+    upsert_chat_member(connection, target.chat_id, target.user_id, target.__dict__.get("created_at"))
@@ -1,10 +1,17 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index, UniqueConstraint, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
 
 class Meeting(Base):
     __tablename__ = "meetings"
+    __table_args__ = (
+        # Time-range scans ordered like the calendar's keyset pages
+        Index("meetings_start_utc_idx", "start_utc", "id"),
+        # Recurring series only: a handful of rows however many single meetings exist
+        Index("meetings_series_start_idx", "start_utc",
+              postgresql_where=text("rrule IS NOT NULL"), sqlite_where=text("rrule IS NOT NULL")),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     chat_id = Column(Integer, ForeignKey("chats.id"), nullable=False)
@@ -14,13 +21,29 @@ class Meeting(Base):
     description = Column(Text, nullable=True)
     status = Column(String, default="scheduled")  # scheduled, confirmed, cancelled   #maker tool for decision
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Recurrence: an RRULE (e.g. "FREQ=WEEKLY;BYDAY=MO") expanded from start_utc in `timezone`,
+    # so weekly 10:00 stays 10:00 local across DST. Occurrences are never stored as rows.
+    rrule = Column(Text, nullable=True)
+    timezone = Column(String, nullable=True)
+    # End of the last occurrence, or NULL when the series never ends; lets window queries skip finished series
+    series_end_utc = Column(DateTime(timezone=True), nullable=True)
+    # Attendance counters, kept in step with meeting_participants by app/services/rsvp.py
+    participant_count = Column(Integer, nullable=False, default=0, server_default="0")
+    confirmed_count = Column(Integer, nullable=False, default=0, server_default="0")
+    declined_count = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Relationships
     chat = relationship("Chat", back_populates="meetings")
     participants = relationship("MeetingParticipant", back_populates="meeting")
+    exceptions = relationship("MeetingException", back_populates="meeting", cascade="all, delete-orphan")
 
 class MeetingParticipant(Base):
     __tablename__ = "meeting_participants"
+    __table_args__ = (
+        Index("meeting_participants_meeting_user_idx", "meeting_id", "user_id"),
+        # A user's meetings (GET /users/me/meetings) without touching the table
+        Index("meeting_participants_user_meeting_idx", "user_id", "meeting_id", postgresql_include=["response"]),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     meeting_id = Column(Integer, ForeignKey("meetings.id"), nullable=False)
@@ -30,3 +53,25 @@ class MeetingParticipant(Base):
     # Relationships
     meeting = relationship("Meeting", back_populates="participants")
     user = relationship("User", back_populates="meeting_participants")
+
+class MeetingException(Base):
+    """One occurrence of a recurring meeting that was cancelled or moved"""
+    __tablename__ = "meeting_exceptions"
+    __table_args__ = (
+        UniqueConstraint("meeting_id", "original_start_utc", name="meeting_exceptions_occurrence_key"),
+        Index("meeting_exceptions_moved_idx", "start_utc"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    meeting_id = Column(Integer, ForeignKey("meetings.id"), nullable=False)
+    # Start the occurrence would have had according to the rule
+    original_start_utc = Column(DateTime(timezone=True), nullable=False)
+    status = Column(String, nullable=False, default="cancelled")  # cancelled, moved
+    # New times for a moved occurrence
+    start_utc = Column(DateTime(timezone=True), nullable=True)
+    end_utc = Column(DateTime(timezone=True), nullable=True)
+    title = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relationships
+    meeting = relationship("Meeting", back_populates="exceptions")
@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index, UniqueConstraint
+from sqlalchemy.sql import func
+from app.database import Base
+
+class OutboxMessage(Base):
+    """A notification to deliver, written in the same transaction as the change that caused it.
+
+    app/services/outbox.py drains pending rows in the background; nothing is sent inline.
+    """
+    __tablename__ = "outbox"
+    __table_args__ = (
+        UniqueConstraint("idempotency_key", name="outbox_idempotency_key"),
+        Index("outbox_due_idx", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # meeting_confirmation
+    # Meeting the notification is about; no FK so a replaced meeting's rows stay for the record
+    meeting_id = Column(Integer, nullable=True, index=True)
+    recipient = Column(String, nullable=False)
+    # JSON arguments for the sender
+    payload = Column(Text, nullable=False)
+    # Same key for the same notification, so enqueueing twice delivers once
+    idempotency_key = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="pending")  # pending, sending, sent, cancelled, dead
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now())
+    # A worker's claim on a "sending" row; another worker may take it over once locked_until passes
+    claim_token = Column(String, nullable=True)
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
@@ -1 +1 @@
-from . import messages, schedule, meetings
+from . import messages, schedule, meetings, admin
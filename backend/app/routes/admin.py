@@ -0,0 +1,95 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime, timezone
+
+from app.database import get_db, read_session_factory
+from app.models import User
+from app.auth import get_current_admin_user
+from app.services.bulk_transfer import (
+    ENTITIES, EXPORT_ORDER, BulkImportError, export_csv_gz, export_ndjson_gz, import_records_async,
+)
+from app.utils.profiling import list_profiles, load_folded, load_profile
+
+router = APIRouter()
+
+@router.get("/export")
+async def export_data(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    entity: Optional[str] = Query(None, description="CSV only: " + ", ".join(EXPORT_ORDER)),
+    chat_id: Optional[List[int]] = Query(None, description="Only these chats (repeatable); default everything"),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Stream chats, messages, meetings and participants as gzip-compressed NDJSON or CSV"""
+    if format == "csv" and entity not in ENTITIES:
+        raise HTTPException(status_code=400, detail=f"CSV export needs entity= one of {', '.join(EXPORT_ORDER)}")
+
+    session_factory = read_session_factory()
+
+    def chunks():
+        # Own session: the stream outlives the request's dependencies
+        stream_db = session_factory()
+        try:
+            if format == "csv":
+                yield from export_csv_gz(stream_db, entity, chat_id)
+            else:
+                yield from export_ndjson_gz(stream_db, chat_id)
+        finally:
+            stream_db.close()
+
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    filename = f"export-{entity}-{stamp}.csv.gz" if format == "csv" else f"export-{stamp}.ndjson.gz"
+    return StreamingResponse(
+        chunks(),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.post("/import")
+async def import_data(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Load an NDJSON export (gzip or plain) from the request body, giving everything new ids"""
+    # The body is read and inserted batch by batch, never held whole
+    try:
+        counts = await import_records_async(db, request.stream())
+    except BulkImportError as e:
+        # Batches before the bad line stay committed; say which chats they created
+        raise HTTPException(status_code=400, detail={
+            "error": str(e), "line": e.line, "imported": e.imported, "chat_ids": e.chat_ids,
+        })
+    return {"imported": counts}
+
+@router.get("/profiles")
+async def get_profiles(
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Newest request profiles first (request with X-Profile: 1 to capture one)"""
+    return {"profiles": list_profiles(limit=limit)}
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    current_user: User = Depends(get_current_admin_user)
+):
+    """A profile's wall-clock breakdown, scheduling stages and SQL statements"""
+    profile = load_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+@router.get("/profiles/{profile_id}/{kind}.folded", response_class=PlainTextResponse)
+async def get_profile_stacks(
+    profile_id: str,
+    kind: str,
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Folded stacks (cpu or wall) for flamegraph.pl, speedscope or inferno"""
+    folded = load_folded(profile_id, kind)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(folded, headers={"Content-Disposition": f'inline; filename="{profile_id}.{kind}.folded"'})
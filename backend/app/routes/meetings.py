@@ -1,12 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from itertools import groupby
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, timedelta
+import pytz
 
-from app.database import get_db
+from app.database import get_db, get_read_db, read_session_factory
 from app.models import Meeting, MeetingParticipant, User
-from app.auth import get_current_active_user
+from app.auth import get_current_active_user, is_admin
+from app.services.recurrence import iter_occurrences, series_end, set_exception
+from app.services.rsvp import apply_rsvps
+from app.services.user_calendar import free_busy, user_meetings_page
+from app.utils.chat_versions import chat_etag, not_modified_or_tag, tagged_read_factory
+from app.utils.fast_json import STREAM_BATCH_ROWS, dumps, stream_rows
 
 router = APIRouter()
 
@@ -25,6 +33,11 @@ class MeetingResponse(BaseModel):
     description: str
     status: str
     participants: List[MeetingParticipantResponse]
+    rrule: Optional[str] = None
+    timezone: Optional[str] = None
+    participant_count: int = 0
+    confirmed_count: int = 0
+    declined_count: int = 0
     
     class Config:
         from_attributes = True
@@ -32,43 +45,169 @@ class MeetingResponse(BaseModel):
 class ConfirmRequest(BaseModel):
     user_id: int
 
+class RSVPItem(BaseModel):
+    meeting_id: int
+    user_id: int
+    response: str  # confirmed, declined, invited
+
+class BatchRSVPRequest(BaseModel):
+    rsvps: List[RSVPItem]
+
+# Largest batch /meetings/rsvp accepts in one request
+MAX_RSVP_BATCH = 1000
+
+class RecurrenceRequest(BaseModel):
+    rrule: Optional[str] = None  # e.g. "FREQ=WEEKLY;BYDAY=MO"; null makes the meeting one-off again
+    timezone: Optional[str] = None  # wall-clock zone the rule repeats in, e.g. "Asia/Kolkata"
+
+class OccurrenceExceptionRequest(BaseModel):
+    original_start_utc: datetime
+    status: str = "cancelled"  # cancelled, moved
+    start_utc: Optional[datetime] = None
+    end_utc: Optional[datetime] = None
+    title: Optional[str] = None
+
+# Widest window /meetings/occurrences will expand
+MAX_OCCURRENCE_WINDOW = timedelta(days=366)
+
+# Page size limits for /users/me/meetings
+DEFAULT_CALENDAR_PAGE = 50
+MAX_CALENDAR_PAGE = 500
+
 @router.get("/meetings", response_model=List[MeetingResponse])
 async def get_meetings_by_chat(
     chat_id: int, 
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_active_user)
 ):
-    meetings = db.query(Meeting).filter(Meeting.chat_id == chat_id).all()
-    
-    meeting_responses = []
-    for meeting in meetings:
-        # Get participants with user details
-        participants = db.query(MeetingParticipant, User) \
-            .join(User, MeetingParticipant.user_id == User.id) \
-            .filter(MeetingParticipant.meeting_id == meeting.id) \
-            .all()
-        
-        participant_responses = []
-        for participant, user in participants:
-            participant_responses.append(MeetingParticipantResponse(
-                id=user.id,
-                name=user.name,
-                email=user.email,
-                response=participant.response
-            ))
-        
-        meeting_responses.append(MeetingResponse(
-            id=meeting.id,
-            chat_id=meeting.chat_id,
-            title=meeting.title,
-            start_utc=meeting.start_utc,
-            end_utc=meeting.end_utc,
-            description=meeting.description,
-            status=meeting.status,
-            participants=participant_responses
-        ))
+    # Unchanged since the client's last poll: 304 before any query
+    not_modified = not_modified_or_tag(request, response, chat_etag(chat_id, "meetings"))
+    if not_modified:
+        return not_modified
     
-    return meeting_responses
+    # One ordered meeting x participant join, grouped per meeting as it streams; from the
+    # primary while a replica could still pair the previous body with this ETag
+    session_factory = tagged_read_factory(chat_id, "meetings")
+    
+    def meeting_rows():
+        # Own session: the stream outlives the request's dependencies
+        stream_db = session_factory()
+        try:
+            rows = stream_db.execute(
+                select(Meeting.id, Meeting.chat_id, Meeting.title, Meeting.start_utc, Meeting.end_utc,
+                       Meeting.description, Meeting.status, Meeting.rrule, Meeting.timezone,
+                       Meeting.participant_count, Meeting.confirmed_count, Meeting.declined_count,
+                       User.id.label("user_id"), User.name.label("user_name"), User.email.label("user_email"),
+                       MeetingParticipant.response)
+                .outerjoin(MeetingParticipant, MeetingParticipant.meeting_id == Meeting.id)
+                .outerjoin(User, MeetingParticipant.user_id == User.id)
+                .where(Meeting.chat_id == chat_id)
+                .order_by(Meeting.id, MeetingParticipant.id)
+                .execution_options(yield_per=STREAM_BATCH_ROWS)
+            )
+            for _, group in groupby(rows, key=lambda row: row.id):
+                group = list(group)
+                meeting = group[0]
+                yield {
+                    "id": meeting.id,
+                    "chat_id": meeting.chat_id,
+                    "title": meeting.title,
+                    "start_utc": meeting.start_utc,
+                    "end_utc": meeting.end_utc,
+                    "description": meeting.description,
+                    "status": meeting.status,
+                    "participants": [
+                        {"id": row.user_id, "name": row.user_name, "email": row.user_email, "response": row.response}
+                        for row in group if row.user_id is not None
+                    ],
+                    "rrule": meeting.rrule,
+                    "timezone": meeting.timezone,
+                    "participant_count": meeting.participant_count or 0,
+                    "confirmed_count": meeting.confirmed_count or 0,
+                    "declined_count": meeting.declined_count or 0
+                }
+        finally:
+            stream_db.close()
+    
+    return stream_rows(request, meeting_rows(), response)
+
+@router.get("/users/me/meetings")
+async def get_my_meetings(
+    window_from: Optional[datetime] = Query(None, alias="from"),
+    window_to: Optional[datetime] = Query(None, alias="to"),
+    limit: int = DEFAULT_CALENDAR_PAGE,
+    cursor: Optional[str] = None,
+    view: str = "list",
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """The current user's meetings across all chats (default: the next 7 days).
+
+    view=list returns keyset-paginated entries (pass next_cursor back as cursor);
+    view=freebusy returns the busy intervals of the whole window, merged.
+    """
+    window_start = window_from or datetime.now(pytz.UTC)
+    if window_start.tzinfo is None:
+        window_start = window_start.replace(tzinfo=pytz.UTC)
+    window_end = window_to or window_start + timedelta(days=7)
+    if window_end.tzinfo is None:
+        window_end = window_end.replace(tzinfo=pytz.UTC)
+    if window_end <= window_start:
+        raise HTTPException(status_code=400, detail="to must be after from")
+    if window_end - window_start > MAX_OCCURRENCE_WINDOW:
+        raise HTTPException(status_code=400, detail="Window is limited to 366 days")
+    
+    window = {"from": window_start, "to": window_end}
+    if view == "freebusy":
+        busy = free_busy(db, current_user.id, window_start, window_end)
+        payload = {**window, "busy": [{"start_utc": start, "end_utc": end} for start, end in busy]}
+        return Response(content=dumps(payload), media_type="application/json")
+    if view != "list":
+        raise HTTPException(status_code=400, detail="view must be 'list' or 'freebusy'")
+    if not 1 <= limit <= MAX_CALENDAR_PAGE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_CALENDAR_PAGE}")
+    
+    try:
+        entries, next_cursor = user_meetings_page(db, current_user.id, window_start, window_end, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Plain dataclasses straight to bytes; no response model per entry
+    return Response(content=dumps({**window, "meetings": entries, "next_cursor": next_cursor}),
+                    media_type="application/json")
+
+@router.get("/meetings/occurrences")
+async def get_meeting_occurrences(
+    chat_id: int,
+    request: Request,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Every occurrence (single meetings and expanded recurring series) in a window, streamed as a JSON array or NDJSON"""
+    window_start = start or datetime.now(pytz.UTC)
+    if window_start.tzinfo is None:
+        window_start = window_start.replace(tzinfo=pytz.UTC)
+    window_end = end or window_start + timedelta(days=30)
+    if window_end.tzinfo is None:
+        window_end = window_end.replace(tzinfo=pytz.UTC)
+    if window_end <= window_start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if window_end - window_start > MAX_OCCURRENCE_WINDOW:
+        raise HTTPException(status_code=400, detail="Window is limited to 366 days")
+    
+    session_factory = read_session_factory()
+    
+    def occurrence_rows():
+        # Own session: the stream outlives the request's dependencies
+        db = session_factory()
+        try:
+            # Occurrence dataclasses go straight to orjson
+            yield from iter_occurrences(db, window_start, window_end, chat_id=chat_id)
+        finally:
+            db.close()
+    
+    return stream_rows(request, occurrence_rows())
 
 @router.get("/meetings/{meeting_id}", response_model=MeetingResponse)
 async def get_meeting(meeting_id: int, db: Session = Depends(get_db)):
@@ -100,24 +239,109 @@ async def get_meeting(meeting_id: int, db: Session = Depends(get_db)):
         end_utc=meeting.end_utc,
         description=meeting.description,
         status=meeting.status,
-        participants=participant_responses
+        participants=participant_responses,
+        rrule=meeting.rrule,
+        timezone=meeting.timezone,
+        participant_count=meeting.participant_count or 0,
+        confirmed_count=meeting.confirmed_count or 0,
+        declined_count=meeting.declined_count or 0
     )
 
+@router.post("/meetings/rsvp")
+async def batch_rsvp(
+    request: BatchRSVPRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Apply many (meeting, user, response) RSVPs with set-based updates.
+
+    Users answer for themselves only (admins for anyone); other rows are
+    skipped and reported in `missing`.
+    """
+    if len(request.rsvps) > MAX_RSVP_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_RSVP_BATCH} RSVPs per request")
+    
+    admin = is_admin(current_user)
+    allowed, rejected = [], []
+    for item in request.rsvps:
+        if admin or item.user_id == current_user.id:
+            allowed.append((item.meeting_id, item.user_id, item.response))
+        else:
+            rejected.append((item.meeting_id, item.user_id))
+    try:
+        result = apply_rsvps(db, allowed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "updated": result.updated,
+        "unchanged": result.unchanged,
+        "missing": [{"meeting_id": meeting_id, "user_id": user_id}
+                    for meeting_id, user_id in result.missing + rejected],
+        "meetings": result.meetings
+    }
+
 @router.post("/meetings/{meeting_id}/confirm")
 async def confirm_meeting(meeting_id: int, request: ConfirmRequest, db: Session = Depends(get_db)):
+    meeting = db.query(Meeting.id).filter(Meeting.id == meeting_id).first()
+    if not meeting:
+        raise HTTPException(status_code=404, detail="Meeting not found")
+    
+    result = apply_rsvps(db, [(meeting_id, request.user_id, "confirmed")])
+    if result.missing:
+        raise HTTPException(status_code=404, detail="Participant not found")
+    
+    return {"status": "confirmed", "message": "Meeting confirmed successfully",
+            "meeting_status": result.meetings[0]["status"]}
+
+@router.put("/meetings/{meeting_id}/recurrence")
+async def set_meeting_recurrence(
+    meeting_id: int,
+    request: RecurrenceRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
     meeting = db.query(Meeting).filter(Meeting.id == meeting_id).first()
     if not meeting:
         raise HTTPException(status_code=404, detail="Meeting not found")
     
-    participant = db.query(MeetingParticipant) \
-        .filter(MeetingParticipant.meeting_id == meeting_id) \
-        .filter(MeetingParticipant.user_id == request.user_id) \
-        .first()
+    if request.rrule:
+        try:
+            ends = series_end(request.rrule, meeting.start_utc, meeting.end_utc, request.timezone)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid recurrence rule: {e}")
+        meeting.rrule = request.rrule
+        meeting.timezone = request.timezone
+        meeting.series_end_utc = ends
+    else:
+        meeting.rrule = None
+        meeting.timezone = None
+        meeting.series_end_utc = None
+        meeting.exceptions.clear()
+    db.commit()
     
-    if not participant:
-        raise HTTPException(status_code=404, detail="Participant not found")
+    return {"status": "updated", "rrule": meeting.rrule, "timezone": meeting.timezone,
+            "series_end_utc": meeting.series_end_utc}
+
+@router.post("/meetings/{meeting_id}/exceptions")
+async def set_occurrence_exception(
+    meeting_id: int,
+    request: OccurrenceExceptionRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Cancel or move one occurrence of a recurring meeting"""
+    meeting = db.query(Meeting).filter(Meeting.id == meeting_id).first()
+    if not meeting:
+        raise HTTPException(status_code=404, detail="Meeting not found")
     
-    participant.response = "confirmed"
+    try:
+        exception = set_exception(db, meeting, request.original_start_utc, request.status,
+                                  request.start_utc, request.end_utc, request.title)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     db.commit()
     
-    return {"status": "confirmed", "message": "Meeting confirmed successfully"}
+    return {"status": exception.status, "meeting_id": meeting.id,
+            "original_start_utc": exception.original_start_utc,
+            "start_utc": exception.start_utc, "end_utc": exception.end_utc}
@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List
 from pydantic import BaseModel
 from datetime import datetime
+import asyncio
 
-from app.database import get_db
-from app.models import Message, User, Chat
+from app.database import get_db, get_read_db
+from app.models import Message, User, Chat, ChatMember
 from app.auth import get_current_active_user
+from app.services.message_archive import list_archive_months, read_archived_messages
+from app.services.message_search import search_messages
+from app.utils.chat_versions import chat_etag, not_modified_or_tag, tagged_read_factory
+from app.utils.fast_json import STREAM_BATCH_ROWS, stream_rows
 
 router = APIRouter()
 
@@ -26,6 +32,22 @@ class MessageResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class SearchResult(BaseModel):
+    id: int
+    user_id: int
+    user_name: str
+    text: str
+    snippet: str
+    rank: float
+    created_at: datetime
+
+class SearchResponse(BaseModel):
+    query: str
+    results: List[SearchResult]
+    limit: int
+    offset: int
+    has_more: bool
+
 @router.post("/messages", response_model=MessageResponse)
 async def create_message(
     message: MessageCreate, 
@@ -68,36 +90,101 @@ async def create_message(
 @router.get("/messages", response_model=List[MessageResponse])
 async def get_messages(
     chat_id: int, 
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
+    #nothing new since the client's last poll -> 304 without touching the db
+    not_modified = not_modified_or_tag(request, response, chat_etag(chat_id, "messages"))
+    if not_modified:
+        return not_modified
+    
     #verify chat exists or not?
     chat = db.query(Chat).filter(Chat.id == chat_id).first()
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
     
-    #get messages with user informations--
-    messages = db.query(Message, User.name.label('user_name')) \
-        .join(User, Message.user_id == User.id) \
-        .filter(Message.chat_id == chat_id) \
-        .order_by(Message.created_at.asc()) \
-        .all()
-    
-    response = []
-    for message, user_name in messages:
-        response.append(MessageResponse(
-            id=message.id,
-            chat_id=message.chat_id,
-            user_id=message.user_id,
-            text=message.text,
-            created_at=message.created_at,
-            user_name=user_name
-        ))
+    #only the columns the response needs, streamed and encoded straight to bytes;
+    #from the primary while a replica could still pair the previous body with this etag
+    session_factory = tagged_read_factory(chat_id, "messages")
     
-    return response
+    def message_rows():
+        # Own session: the stream outlives the request's dependencies
+        stream_db = session_factory()
+        try:
+            rows = stream_db.execute(
+                select(Message.id, Message.chat_id, Message.user_id, Message.text, Message.created_at,
+                       User.name.label("user_name"))
+                .join(User, Message.user_id == User.id)
+                .where(Message.chat_id == chat_id)
+                .order_by(Message.created_at.asc())
+                .execution_options(yield_per=STREAM_BATCH_ROWS)
+            )
+            for row in rows:
+                yield row._asdict()
+        finally:
+            stream_db.close()
+    
+    return stream_rows(request, message_rows(), response)
 
 @router.get("/chats/{chat_id}/participants")
 async def get_chat_participants(
+    chat_id: int,
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_active_user)
+):
+    not_modified = not_modified_or_tag(request, response, chat_etag(chat_id, "participants"))
+    if not_modified:
+        return not_modified
+    
+    #read where the etag can't outrun the data (see get_messages)
+    db = tagged_read_factory(chat_id, "participants")()
+    try:
+        # Verify chat exists
+        chat = db.query(Chat).filter(Chat.id == chat_id).first()
+        if not chat:
+            raise HTTPException(status_code=404, detail="Chat not found")
+        
+        # Participants come from chat_members, kept up to date on message insert
+        participants = db.query(User.id, User.name, User.email) \
+            .join(ChatMember, User.id == ChatMember.user_id) \
+            .filter(ChatMember.chat_id == chat_id) \
+            .order_by(ChatMember.first_message_at.asc(), User.id.asc()) \
+            .all()
+    finally:
+        db.close()
+    
+    return [{"id": p.id, "name": p.name, "email": p.email} for p in participants]
+
+@router.get("/chats/{chat_id}/search", response_model=SearchResponse)
+async def search_chat_messages(
+    chat_id: int,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    # Verify chat exists
+    chat = db.query(Chat).filter(Chat.id == chat_id).first()
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    
+    # Ranked matches with <mark>-highlighted snippets; one extra row tells us if there is a next page
+    hits = search_messages(db, chat_id, q, limit=limit + 1, offset=offset)
+    
+    return SearchResponse(
+        query=q,
+        results=[SearchResult(**vars(hit)) for hit in hits[:limit]],
+        limit=limit,
+        offset=offset,
+        has_more=len(hits) > limit
+    )
+
+@router.get("/chats/{chat_id}/archive")
+async def get_chat_archive_months(
     chat_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
@@ -107,11 +194,21 @@ async def get_chat_participants(
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
     
-    # Get unique participants from messages in this chat
-    participants = db.query(User.id, User.name, User.email) \
-        .join(Message, User.id == Message.user_id) \
-        .filter(Message.chat_id == chat_id) \
-        .distinct() \
-        .all()
+    months = await asyncio.to_thread(list_archive_months, chat_id)
+    return {"chat_id": chat_id, "months": months}
+
+@router.get("/chats/{chat_id}/archive/{month}", response_model=List[MessageResponse])
+async def get_archived_messages(
+    chat_id: int,
+    month: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    #old messages live in compressed files, not the database
+    try:
+        messages = await asyncio.to_thread(read_archived_messages, chat_id, month)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not messages:
+        raise HTTPException(status_code=404, detail="No archived messages for this month")
     
-    return [{"id": p.id, "name": p.name, "email": p.email} for p in participants]
+    return [MessageResponse(**message) for message in messages]
@@ -1,10 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import json
+import time
+import pytz
 
-from app.database import get_db
-from app.services.scheduling_agent import SchedulingAgent
+from app.database import get_db, SessionLocal
+from app.models import AvailabilitySlot, ChatMember
+from app.services.availability import majority_windows
+from app.services.availability_index import MIN_LEAD, AvailabilityChange, get_index
+from app.services.scheduling_agent import SchedulingAgent, get_speculation_stats, MEETING_DURATION
 
 router = APIRouter()
 
@@ -16,6 +26,28 @@ class ScheduleResponse(BaseModel):
     meeting: Optional[dict] = None
     ask: Optional[str] = None
     message: Optional[str] = None
+    models: Optional[dict] = None
+
+class AvailabilityChangeRequest(BaseModel):
+    user_id: int
+    start_utc: datetime
+    end_utc: datetime
+    kind: str = "unavailable"  # available, unavailable
+    remove: bool = False
+
+class WhatIfRequest(BaseModel):
+    changes: List[AvailabilityChangeRequest]
+    duration_minutes: Optional[int] = None
+
+def _meeting_duration(minutes: Optional[int]) -> timedelta:
+    if minutes is None:
+        return MEETING_DURATION
+    if not 15 <= minutes <= 8 * 60:
+        raise HTTPException(status_code=400, detail="duration_minutes must be between 15 and 480")
+    return timedelta(minutes=minutes)
+
+def _utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=pytz.UTC) if value.tzinfo is None else value.astimezone(pytz.UTC)
 
 @router.post("/schedule", response_model=ScheduleResponse)
 async def schedule_meeting(request: ScheduleRequest, db: Session = Depends(get_db)):
@@ -23,6 +55,105 @@ async def schedule_meeting(request: ScheduleRequest, db: Session = Depends(get_d
     
     try:
         result = await agent.process_chat_for_scheduling(request.chat_id)
-        return ScheduleResponse(**result)
+        return ScheduleResponse(**result, models=agent.stage_models)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/schedule/stream")
+async def schedule_meeting_stream(request: ScheduleRequest):
+    """Run the scheduling agent, streaming one NDJSON line per finished stage and a final result line"""
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def run_agent():
+        # Own session: the stream outlives the request's dependencies
+        db = SessionLocal()
+        try:
+            agent = SchedulingAgent(db)
+            result = await agent.process_chat_for_scheduling(request.chat_id, progress=events.put)
+            await events.put({"stage": "done", "result": result, "models": agent.stage_models})
+        except Exception as e:
+            await events.put({"stage": "error", "detail": str(e)})
+        finally:
+            db.close()
+            await events.put(None)
+
+    async def stream():
+        task = asyncio.create_task(run_agent())
+        try:
+            while (event := await events.get()) is not None:
+                yield json.dumps(jsonable_encoder(event)) + "\n"
+        finally:
+            # Client went away: stop spending LLM calls on it
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@router.get("/schedule/speculation/{chat_id}")
+async def get_schedule_speculation_stats(chat_id: int):
+    """Wasted speculative tokens vs. latency saved for a chat (SCHEDULING_SPECULATIVE mode)"""
+    return {"chat_id": chat_id, **get_speculation_stats(chat_id)}
+
+@router.get("/chats/{chat_id}/availability")
+async def get_chat_availability(chat_id: int, days: int = 14, db: Session = Depends(get_db)):
+    """Stored availability for a chat and the windows where a majority is free"""
+    now = datetime.now(pytz.UTC)
+    horizon = now + timedelta(days=max(1, min(days, 90)))
+    slots = db.query(AvailabilitySlot) \
+        .filter(AvailabilitySlot.chat_id == chat_id) \
+        .filter(AvailabilitySlot.end_utc > now, AvailabilitySlot.start_utc < horizon) \
+        .order_by(AvailabilitySlot.start_utc.asc()) \
+        .all()
+    members = db.query(ChatMember).filter(ChatMember.chat_id == chat_id).count()
+    needed = members // 2 + 1
+    
+    return {
+        "chat_id": chat_id,
+        "slots": [
+            {
+                "user_id": slot.user_id,
+                "start_utc": slot.start_utc,
+                "end_utc": slot.end_utc,
+                "kind": slot.kind,
+                "source_message_id": slot.source_message_id
+            }
+            for slot in slots
+        ],
+        "majority_needed": needed,
+        "majority_windows": [vars(window) for window in majority_windows(db, chat_id, needed, now, horizon)]
+    }
+
+@router.get("/chats/{chat_id}/availability/best")
+async def get_best_window(chat_id: int, duration_minutes: Optional[int] = None, db: Session = Depends(get_db)):
+    """Earliest window with the most participants free, from the chat's in-memory index"""
+    index = get_index(db, chat_id, _meeting_duration(duration_minutes))
+    best = index.best_window(not_before=datetime.now(pytz.UTC) + MIN_LEAD)
+    return {"chat_id": chat_id, "best": vars(best) if best else None}
+
+@router.post("/chats/{chat_id}/availability/what-if")
+async def what_if_reschedule(chat_id: int, request: WhatIfRequest, db: Session = Depends(get_db)):
+    """Best window if the given availability changes were made, without storing them"""
+    for change in request.changes:
+        if change.kind not in ("available", "unavailable"):
+            raise HTTPException(status_code=400, detail="kind must be 'available' or 'unavailable'")
+        if change.end_utc <= change.start_utc:
+            raise HTTPException(status_code=400, detail="end_utc must be after start_utc")
+    
+    index = get_index(db, chat_id, _meeting_duration(request.duration_minutes))
+    earliest = datetime.now(pytz.UTC) + MIN_LEAD
+    changes = [
+        AvailabilityChange(change.user_id, _utc(change.start_utc), _utc(change.end_utc), change.kind, change.remove)
+        for change in request.changes
+    ]
+    
+    start = time.perf_counter()
+    current = index.best_window(not_before=earliest)
+    proposed = index.what_if(changes, not_before=earliest)
+    elapsed_us = (time.perf_counter() - start) * 1_000_000
+    
+    return {
+        "chat_id": chat_id,
+        "current": vars(current) if current else None,
+        "what_if": vars(proposed) if proposed else None,
+        "elapsed_us": round(elapsed_us, 1)
+    }
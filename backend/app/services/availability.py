@@ -0,0 +1,267 @@
+"""Stored availability and database-side overlap search.
+
+The extraction stage's JSON is turned into availability_slots rows (one per
+participant, chat and time range). Finding when a majority is free then runs
+entirely in SQL: each user's free stretches (available minus unavailable, the
+same rule as availability_index) are computed with running counts, their
+boundaries are swept with a running sum, and only the resulting intervals
+(O(boundaries in the window), not O(slots)) come back to Python.
+On Postgres the window filter uses the GiST-indexed tstzrange column.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import pytz
+from sqlalchemy import DateTime, Integer, bindparam, insert, text
+from sqlalchemy.orm import Session
+
+from app.models import AvailabilitySlot
+
+logger = logging.getLogger(__name__)
+
+IST = pytz.timezone("Asia/Kolkata")
+
+# Slots written by the scheduling agent; a new run replaces them for the chat
+EXTRACTED_SOURCE = "llm"
+
+_WINDOW_FILTERS = {
+    "postgresql": "during && tstzrange(:window_start, :window_end, '[)')",
+}
+_DEFAULT_WINDOW_FILTER = "end_utc > :window_start AND start_utc < :window_end"
+
+# Each user's free stretches: inside one of their available slots and outside all
+# of their unavailable ones. Per user, a running count of open available and
+# unavailable slots is kept across that user's boundaries; `free` flips where
+# the user becomes (un)free, and each flip to 1 opens a stretch that the next
+# flip closes. Overlapping and adjacent slots need no separate merging.
+_FREE_CTE = """
+    WITH slots AS (
+        SELECT user_id, kind,
+               CASE WHEN start_utc < :window_start THEN :window_start ELSE start_utc END AS start_utc,
+               CASE WHEN end_utc > :window_end THEN :window_end ELSE end_utc END AS end_utc
+        FROM availability_slots
+        WHERE chat_id = :chat_id AND {window_filter}
+    ),
+    events AS (
+        SELECT user_id, at, SUM(available) AS available, SUM(unavailable) AS unavailable
+        FROM (
+            SELECT user_id, start_utc AS at,
+                   CASE WHEN kind = 'available' THEN 1 ELSE 0 END AS available,
+                   CASE WHEN kind = 'unavailable' THEN 1 ELSE 0 END AS unavailable
+            FROM slots
+            UNION ALL
+            SELECT user_id, end_utc AS at,
+                   CASE WHEN kind = 'available' THEN -1 ELSE 0 END AS available,
+                   CASE WHEN kind = 'unavailable' THEN -1 ELSE 0 END AS unavailable
+            FROM slots
+        ) AS edges
+        GROUP BY user_id, at
+    ),
+    depths AS (
+        SELECT user_id, at,
+               SUM(available) OVER (PARTITION BY user_id ORDER BY at ROWS UNBOUNDED PRECEDING) AS open_available,
+               SUM(unavailable) OVER (PARTITION BY user_id ORDER BY at ROWS UNBOUNDED PRECEDING) AS open_unavailable
+        FROM events
+    ),
+    flags AS (
+        SELECT user_id, at,
+               CASE WHEN open_available > 0 AND open_unavailable = 0 THEN 1 ELSE 0 END AS free
+        FROM depths
+    ),
+    flips AS (
+        SELECT user_id, at, free
+        FROM (
+            SELECT user_id, at, free,
+                   LAG(free, 1, 0) OVER (PARTITION BY user_id ORDER BY at) AS was_free
+            FROM flags
+        ) AS changes
+        WHERE free <> was_free
+    ),
+    merged AS (
+        SELECT user_id, start_utc, end_utc
+        FROM (
+            SELECT user_id, free, at AS start_utc,
+                   LEAD(at) OVER (PARTITION BY user_id ORDER BY at) AS end_utc
+            FROM flips
+        ) AS stretches
+        WHERE free = 1
+    )
+"""
+
+_COVERAGE_SQL = _FREE_CTE + """,
+    boundaries AS (
+        SELECT at, SUM(delta) AS delta
+        FROM (
+            SELECT start_utc AS at, 1 AS delta FROM merged
+            UNION ALL
+            SELECT end_utc AS at, -1 AS delta FROM merged
+        ) AS events
+        GROUP BY at
+    ),
+    coverage AS (
+        SELECT at AS start_utc,
+               LEAD(at) OVER (ORDER BY at) AS end_utc,
+               SUM(delta) OVER (ORDER BY at ROWS UNBOUNDED PRECEDING) AS available
+        FROM boundaries
+    )
+    SELECT start_utc, end_utc, available
+    FROM coverage
+    WHERE end_utc IS NOT NULL AND available >= :needed
+    ORDER BY start_utc
+"""
+
+# Users free for the whole interval
+_ATTENDEES_SQL = _FREE_CTE + """
+    SELECT DISTINCT user_id
+    FROM merged
+    WHERE start_utc <= :start_utc AND end_utc >= :end_utc
+    ORDER BY user_id
+"""
+
+_SLOT_COLUMNS = ("chat_id", "user_id", "start_utc", "end_utc", "kind", "source", "source_message_id")
+
+_TIME_PARAMS = ("window_start", "window_end", "start_utc", "end_utc")
+
+
+@dataclass
+class MajorityWindow:
+    start_utc: datetime
+    end_utc: datetime
+    available: int
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; everything stored is UTC
+    return value.replace(tzinfo=pytz.UTC) if value.tzinfo is None else value.astimezone(pytz.UTC)
+
+
+def _query(sql: str, **columns):
+    """Text query with timestamp binds typed, so SQLite compares them in its stored format"""
+    names = [name for name in _TIME_PARAMS if f":{name}" in sql]
+    statement = text(sql).bindparams(*(bindparam(name, type_=DateTime(timezone=True)) for name in names))
+    return statement.columns(**columns) if columns else statement
+
+
+def _window_filter(db: Session) -> str:
+    return _WINDOW_FILTERS.get(db.get_bind().dialect.name, _DEFAULT_WINDOW_FILTER)
+
+
+def _slot_range(slot: Dict) -> Optional[tuple]:
+    """(start_utc, end_utc) for one extracted {"date", "start_time", "end_time", "timezone"} slot"""
+    try:
+        zone = pytz.timezone(slot.get("timezone") or "Asia/Kolkata")
+    except pytz.UnknownTimeZoneError:
+        zone = IST
+    try:
+        start = zone.localize(datetime.strptime(f"{slot['date']} {slot['start_time']}", "%Y-%m-%d %H:%M"))
+        end = zone.localize(datetime.strptime(f"{slot['date']} {slot['end_time']}", "%Y-%m-%d %H:%M"))
+    except (KeyError, TypeError, ValueError):
+        return None
+    if end <= start:
+        return None
+    return start.astimezone(pytz.UTC), end.astimezone(pytz.UTC)
+
+
+def slots_from_extraction(chat_id: int, availability_result: Dict, participant_names: Dict[int, str],
+                          source_message_ids: Dict[int, int], source: str = EXTRACTED_SOURCE) -> List[AvailabilitySlot]:
+    """Rows for the extraction stage's JSON; participants are matched to users by name"""
+    user_ids = {name.strip().lower(): user_id for user_id, name in participant_names.items()}
+    rows = []
+    for name, info in (availability_result.get("participants") or {}).items():
+        user_id = user_ids.get(str(name).strip().lower())
+        if user_id is None or not isinstance(info, dict):
+            continue
+        for kind, key in (("available", "available_slots"), ("unavailable", "unavailable_slots")):
+            for slot in info.get(key) or []:
+                if not isinstance(slot, dict):
+                    continue
+                slot_range = _slot_range(slot)
+                if slot_range is None:
+                    continue
+                rows.append(AvailabilitySlot(
+                    chat_id=chat_id,
+                    user_id=user_id,
+                    start_utc=slot_range[0],
+                    end_utc=slot_range[1],
+                    kind=kind,
+                    source=source,
+                    source_message_id=source_message_ids.get(user_id),
+                ))
+    return rows
+
+
+def replace_extracted_slots(db: Session, chat_id: int, slots: List[AvailabilitySlot]):
+    """Swap a chat's previously extracted availability for a fresh extraction"""
+    db.query(AvailabilitySlot) \
+        .filter(AvailabilitySlot.chat_id == chat_id, AvailabilitySlot.source == EXTRACTED_SOURCE) \
+        .delete(synchronize_session=False)
+    if slots:
+        # One executemany instead of an INSERT per slot
+        db.execute(insert(AvailabilitySlot), [
+            {column: getattr(slot, column) for column in _SLOT_COLUMNS} for slot in slots
+        ])
+    db.commit()
+
+
+def majority_windows(db: Session, chat_id: int, needed: int,
+                     window_start: datetime, window_end: datetime) -> List[MajorityWindow]:
+    """Intervals inside the window where at least `needed` distinct users are available.
+
+    Adjacent intervals are merged, so each window is a maximal stretch of majority
+    availability; `available` is the smallest head count within it.
+    """
+    statement = _query(
+        _COVERAGE_SQL.format(window_filter=_window_filter(db)),
+        start_utc=DateTime(timezone=True), end_utc=DateTime(timezone=True), available=Integer,
+    )
+    rows = db.execute(statement, {
+        "chat_id": chat_id,
+        "needed": needed,
+        "window_start": _as_utc(window_start),
+        "window_end": _as_utc(window_end),
+    }).all()
+
+    windows: List[MajorityWindow] = []
+    for row in rows:
+        start, end = _as_utc(row.start_utc), _as_utc(row.end_utc)
+        if windows and windows[-1].end_utc == start:
+            windows[-1].end_utc = end
+            windows[-1].available = min(windows[-1].available, row.available)
+        else:
+            windows.append(MajorityWindow(start, end, row.available))
+    return windows
+
+
+def available_users(db: Session, chat_id: int, start_utc: datetime, end_utc: datetime) -> List[int]:
+    """Users who are available for the whole interval"""
+    statement = _query(_ATTENDEES_SQL.format(window_filter=_window_filter(db)))
+    return list(db.execute(statement, {
+        "chat_id": chat_id,
+        "window_start": _as_utc(start_utc),
+        "window_end": _as_utc(end_utc),
+        "start_utc": _as_utc(start_utc),
+        "end_utc": _as_utc(end_utc),
+    }).scalars())
+
+
+def earliest_majority_slot(db: Session, chat_id: int, needed: int, duration: timedelta,
+                           window_start: datetime, window_end: datetime,
+                           step: timedelta = timedelta(minutes=30)) -> Optional[MajorityWindow]:
+    """The earliest `duration`-long interval when a majority is free, or None.
+
+    Starts fall on `step` boundaries (UTC), so a window that is already open
+    is booked from the next boundary rather than from window_start itself.
+    """
+    for window in majority_windows(db, chat_id, needed, window_start, window_end):
+        start = _ceil_to(window.start_utc, step)
+        if window.end_utc - start >= duration:
+            return MajorityWindow(start, start + duration, window.available)
+    return None
+
+
+def _ceil_to(moment: datetime, step: timedelta) -> datetime:
+    epoch = datetime(1970, 1, 1, tzinfo=pytz.UTC)
+    steps = -((epoch - _as_utc(moment)) // step)
+    return epoch + steps * step
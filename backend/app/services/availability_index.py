@@ -0,0 +1,367 @@
+"""In-memory availability index for incremental and what-if rescheduling.
+
+Time from now to the scheduling horizon is cut into AVAILABILITY_SLOT_MINUTES
+slots. For a meeting of k slots, a segment tree holds, for every possible
+start slot, how many participants are free for the whole k-slot window: each
+of a user's free stretches [s, e) adds 1 to the starts [s, e - k]. Changing
+one person's range is a couple of range adds (O(log n)), and the best window
+is the root's max/argmax, earliest first.
+
+Indexes are built from availability_slots and kept in a bounded LRU of
+active chats, keyed by (chat_id, meeting length). The scheduling agent pushes
+each fresh extraction into any cached index for the chat; what_if() applies
+hypothetical changes, reads the best window and undoes them.
+"""
+import math
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pytz
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+
+from app.models import AvailabilitySlot
+from app.utils.metrics import AVAILABILITY_INDEX_LOOKUPS
+
+load_dotenv()
+
+SLOT_MINUTES = int(os.getenv("AVAILABILITY_SLOT_MINUTES", "30"))
+INDEX_MAX_CHATS = int(os.getenv("AVAILABILITY_INDEX_MAX_CHATS", "256"))
+INDEX_HORIZON = timedelta(days=14)
+# Nothing is offered to start sooner than this; best_window() rounds up to the next slot
+MIN_LEAD = timedelta(minutes=int(os.getenv("SCHEDULING_MIN_LEAD_MINUTES", "30")))
+
+_NEG = float("-inf")
+
+Range = Tuple[int, int]
+
+
+class SegmentTree:
+    """Range add and range max (with leftmost argmax) over n integer cells"""
+
+    def __init__(self, n: int):
+        self.n = n
+        size = 1
+        while size < n:
+            size *= 2
+        self.size = size
+        self._max = [0.0] * (2 * size)
+        self._arg = [0] * (2 * size)
+        # Pending adds that apply to a whole subtree; a node's max already includes its own
+        self._lazy = [0] * (2 * size)
+        for i in range(size):
+            self._arg[size + i] = i
+            if i >= n:
+                self._max[size + i] = _NEG
+        for node in range(size - 1, 0, -1):
+            self._pull(node)
+
+    def _pull(self, node: int):
+        left, right = 2 * node, 2 * node + 1
+        child = left if self._max[left] >= self._max[right] else right
+        self._max[node] = self._max[child] + self._lazy[node]
+        self._arg[node] = self._arg[child]
+
+    def add(self, start: int, end: int, value: int):
+        """Add value to cells [start, end)"""
+        start, end = max(start, 0), min(end, self.n)
+        if start < end:
+            self._add(1, 0, self.size, start, end, value)
+
+    def _add(self, node: int, lo: int, hi: int, start: int, end: int, value: int):
+        if end <= lo or hi <= start:
+            return
+        if start <= lo and hi <= end:
+            self._max[node] += value
+            self._lazy[node] += value
+            return
+        mid = (lo + hi) // 2
+        self._add(2 * node, lo, mid, start, end, value)
+        self._add(2 * node + 1, mid, hi, start, end, value)
+        self._pull(node)
+
+    def max(self, start: int = 0, end: Optional[int] = None) -> Tuple[float, int]:
+        """(max value, leftmost index holding it) over [start, end)"""
+        end = self.n if end is None else min(end, self.n)
+        if max(start, 0) >= end:
+            return _NEG, -1
+        return self._max_in(1, 0, self.size, max(start, 0), end)
+
+    def _max_in(self, node: int, lo: int, hi: int, start: int, end: int) -> Tuple[float, int]:
+        if end <= lo or hi <= start:
+            return _NEG, -1
+        if start <= lo and hi <= end:
+            return self._max[node], self._arg[node]
+        mid = (lo + hi) // 2
+        left = self._max_in(2 * node, lo, mid, start, end)
+        right = self._max_in(2 * node + 1, mid, hi, start, end)
+        best = left if left[0] >= right[0] else right
+        return best[0] + self._lazy[node], best[1]
+
+
+def _union(ranges: Iterable[Range]) -> List[Range]:
+    merged: List[Range] = []
+    for start, end in sorted(r for r in ranges if r[0] < r[1]):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _subtract(ranges: List[Range], cuts: List[Range]) -> List[Range]:
+    """Parts of the (merged) ranges not covered by the (merged) cuts"""
+    result = []
+    for start, end in ranges:
+        for cut_start, cut_end in cuts:
+            if cut_end <= start or cut_start >= end:
+                continue
+            if cut_start > start:
+                result.append((start, cut_start))
+            start = max(start, cut_end)
+            if start >= end:
+                break
+        if start < end:
+            result.append((start, end))
+    return result
+
+
+@dataclass
+class BestWindow:
+    start_utc: datetime
+    end_utc: datetime
+    available: int
+    user_ids: List[int]
+
+
+@dataclass
+class AvailabilityChange:
+    """One hypothetical (or real) edit: user_id is free / busy over [start_utc, end_utc)"""
+    user_id: int
+    start_utc: datetime
+    end_utc: datetime
+    kind: str = "available"  # available, unavailable
+    remove: bool = False  # take the range back out instead of adding it
+
+
+class AvailabilityIndex:
+    """Segment tree over meeting start slots for one chat and meeting length"""
+
+    def __init__(self, origin: datetime, duration: timedelta,
+                 horizon: timedelta = INDEX_HORIZON, slot_minutes: int = SLOT_MINUTES):
+        self.origin = origin
+        self.slot = timedelta(minutes=slot_minutes)
+        self.n_slots = int(horizon / self.slot)
+        self.duration_slots = max(1, math.ceil(duration / self.slot))
+        self.tree = SegmentTree(self.n_slots)
+        # Raw ranges per user and kind, in slot numbers, and the free stretches last applied
+        self._ranges: Dict[int, Dict[str, List[Range]]] = {}
+        self._free: Dict[int, List[Range]] = {}
+        self._lock = threading.Lock()
+
+    def _slots(self, start_utc: datetime, end_utc: datetime, kind: str) -> Range:
+        start = (start_utc - self.origin) / self.slot
+        end = (end_utc - self.origin) / self.slot
+        # Free only for slots fully inside the range; busy for any slot it touches
+        if kind == "available":
+            return max(math.ceil(start), 0), min(math.floor(end), self.n_slots)
+        return max(math.floor(start), 0), min(math.ceil(end), self.n_slots)
+
+    def _slot_time(self, slot: int) -> datetime:
+        return self.origin + slot * self.slot
+
+    def _free_ranges(self, user_id: int) -> List[Range]:
+        ranges = self._ranges.get(user_id, {})
+        return _subtract(_union(ranges.get("available", [])), _union(ranges.get("unavailable", [])))
+
+    def _contribute(self, free: Range, value: int):
+        # Window starts that keep the whole meeting inside the free stretch
+        start, end = free
+        self.tree.add(start, end - self.duration_slots + 1, value)
+
+    def _apply(self, user_id: int):
+        """Bring the tree in line with the user's ranges, touching only stretches that changed"""
+        old = set(self._free.get(user_id, []))
+        new = self._free_ranges(user_id)
+        for free in old.difference(new):
+            self._contribute(free, -1)
+        for free in set(new).difference(old):
+            self._contribute(free, 1)
+        if new:
+            self._free[user_id] = new
+        else:
+            self._free.pop(user_id, None)
+
+    def set_user(self, user_id: int, available: Iterable[Tuple[datetime, datetime]],
+                 unavailable: Iterable[Tuple[datetime, datetime]] = ()):
+        """Replace everything known about one user's availability"""
+        with self._lock:
+            self._ranges[user_id] = {
+                "available": [self._slots(start, end, "available") for start, end in available],
+                "unavailable": [self._slots(start, end, "unavailable") for start, end in unavailable],
+            }
+            self._apply(user_id)
+
+    def _change(self, change: AvailabilityChange):
+        ranges = self._ranges.setdefault(change.user_id, {"available": [], "unavailable": []})
+        slots = self._slots(change.start_utc, change.end_utc, change.kind)
+        kind_ranges = ranges.setdefault(change.kind, [])
+        if change.remove:
+            if slots in kind_ranges:
+                kind_ranges.remove(slots)
+        else:
+            kind_ranges.append(slots)
+        self._apply(change.user_id)
+
+    def apply(self, change: AvailabilityChange):
+        """Add or remove one range for one user, O(log n) per free stretch it changes"""
+        with self._lock:
+            self._change(change)
+
+    def _best(self, not_before: Optional[datetime]) -> Optional[BestWindow]:
+        first = 0
+        if not_before is not None:
+            first = max(0, math.ceil((not_before - self.origin) / self.slot))
+        available, slot = self.tree.max(first)
+        if slot < 0 or available <= 0:
+            return None
+        end_slot = slot + self.duration_slots
+        user_ids = sorted(
+            user_id for user_id, free in self._free.items()
+            if any(start <= slot and end_slot <= end for start, end in free)
+        )
+        return BestWindow(self._slot_time(slot), self._slot_time(end_slot), int(available), user_ids)
+
+    def best_window(self, not_before: Optional[datetime] = None) -> Optional[BestWindow]:
+        """The earliest window with the most participants free for all of it"""
+        with self._lock:
+            return self._best(not_before)
+
+    def what_if(self, changes: List[AvailabilityChange],
+                not_before: Optional[datetime] = None) -> Optional[BestWindow]:
+        """Best window if the changes were made; the index is left as it was"""
+        with self._lock:
+            saved = {
+                change.user_id: {kind: list(ranges) for kind, ranges in self._ranges.get(change.user_id, {}).items()}
+                for change in changes
+            }
+            try:
+                for change in changes:
+                    self._change(change)
+                return self._best(not_before)
+            finally:
+                for user_id, ranges in saved.items():
+                    if ranges:
+                        self._ranges[user_id] = ranges
+                    else:
+                        self._ranges.pop(user_id, None)
+                    self._apply(user_id)
+
+    def user_ids(self) -> List[int]:
+        with self._lock:
+            return list(self._ranges)
+
+    def is_stale(self, now: datetime) -> bool:
+        """Past half the horizon the index no longer reaches far enough ahead"""
+        return now - self.origin > self.n_slots * self.slot / 2
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; everything stored is UTC
+    return value.replace(tzinfo=pytz.UTC) if value.tzinfo is None else value.astimezone(pytz.UTC)
+
+
+def _slot_floor(moment: datetime) -> datetime:
+    moment = _as_utc(moment).replace(second=0, microsecond=0)
+    return moment - timedelta(minutes=moment.minute % SLOT_MINUTES)
+
+
+def load_user_ranges(slots: Iterable[AvailabilitySlot]) -> Dict[int, Dict[str, List[Tuple[datetime, datetime]]]]:
+    """{user_id: {"available": [...], "unavailable": [...]}} from availability_slots rows"""
+    by_user: Dict[int, Dict[str, List[Tuple[datetime, datetime]]]] = {}
+    for slot in slots:
+        ranges = by_user.setdefault(slot.user_id, {"available": [], "unavailable": []})
+        ranges.setdefault(slot.kind, []).append((_as_utc(slot.start_utc), _as_utc(slot.end_utc)))
+    return by_user
+
+
+def build_index(db: Session, chat_id: int, duration: timedelta,
+                now: Optional[datetime] = None) -> AvailabilityIndex:
+    """Index of a chat's stored availability from now to the horizon"""
+    origin = _slot_floor(now or datetime.now(pytz.UTC))
+    index = AvailabilityIndex(origin, duration)
+    rows = db.query(AvailabilitySlot).filter(
+        AvailabilitySlot.chat_id == chat_id,
+        AvailabilitySlot.end_utc > origin,
+        AvailabilitySlot.start_utc < origin + INDEX_HORIZON,
+    ).all()
+    for user_id, ranges in load_user_ranges(rows).items():
+        index.set_user(user_id, ranges["available"], ranges["unavailable"])
+    return index
+
+
+# Bounded LRU of active chats' indexes
+_indexes: "OrderedDict[Tuple[int, int], AvailabilityIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _duration_key(duration: timedelta) -> int:
+    return int(duration.total_seconds() // 60)
+
+
+def cached_index(chat_id: int, duration: timedelta) -> Optional[AvailabilityIndex]:
+    """The chat's cached index if it is still fresh; never touches the database"""
+    key = (chat_id, _duration_key(duration))
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None and not index.is_stale(datetime.now(pytz.UTC)):
+            _indexes.move_to_end(key)
+            AVAILABILITY_INDEX_LOOKUPS.labels("hit").inc()
+            return index
+    AVAILABILITY_INDEX_LOOKUPS.labels("miss" if index is None else "stale").inc()
+    return None
+
+
+def get_index(db: Session, chat_id: int, duration: timedelta) -> AvailabilityIndex:
+    """The cached index for a chat and meeting length, built from the database on a miss"""
+    index = cached_index(chat_id, duration)
+    if index is not None:
+        return index
+
+    index = build_index(db, chat_id, duration)
+    with _indexes_lock:
+        key = (chat_id, _duration_key(duration))
+        _indexes[key] = index
+        _indexes.move_to_end(key)
+        while len(_indexes) > INDEX_MAX_CHATS:
+            _indexes.popitem(last=False)
+    return index
+
+
+def update_cached_users(chat_id: int, user_ranges: Dict[int, Dict[str, List[Tuple[datetime, datetime]]]],
+                        replace_all: bool = True):
+    """Push new availability for a chat into its cached indexes (if any) without a rebuild.
+
+    With replace_all, users missing from user_ranges are cleared, matching a
+    fresh extraction that replaced every stored slot.
+    """
+    with _indexes_lock:
+        cached = [index for (cached_chat, _), index in _indexes.items() if cached_chat == chat_id]
+    for index in cached:
+        users = set(user_ranges)
+        if replace_all:
+            users |= set(index.user_ids())
+        for user_id in users:
+            ranges = user_ranges.get(user_id, {})
+            index.set_user(user_id, ranges.get("available", []), ranges.get("unavailable", []))
+
+
+def invalidate(chat_id: Optional[int] = None):
+    """Drop cached indexes for one chat, or all of them"""
+    with _indexes_lock:
+        for key in [key for key in _indexes if chat_id is None or key[0] == chat_id]:
+            del _indexes[key]
@@ -0,0 +1,448 @@
+"""Streaming export and import of whole chats.
+
+Export writes gzip-compressed NDJSON, one typed record per line, parents
+before children, so the file can be imported in a single pass:
+
+    {"type": "user", "id", "name", "email", "is_active", "created_at"}
+    {"type": "chat", "id", "title", "created_at"}
+    {"type": "meeting", "id", "chat_id", "title", "start_utc", ...}
+    {"type": "participant", "meeting_id", "user_id", "response"}
+    {"type": "meeting_exception", "meeting_id", "original_start_utc", ...}
+    {"type": "message", "id", "chat_id", "user_id", "text", "created_at"}
+
+or, for analytics, gzip-compressed CSV of a single entity. Every table is
+read with yield_per (a server-side cursor on Postgres) and compressed as it
+streams, so memory stays flat however many messages a chat has. Password
+hashes are never exported; archived message months (message_archive.py) are
+already files and are not included.
+
+Import reads the same NDJSON and inserts in IMPORT_BATCH_ROWS batches with
+executemany, remapping every id: users are matched by email (created when
+missing, without a password), chats and meetings get new ids. Each batch is
+committed as it is written, so a failed import keeps the batches before the
+failing one; the error names the offending line and carries the new ids of the
+chats already written, so they can be inspected or deleted. chat_members is
+rebuilt for the imported chats at the end, or when the import fails.
+"""
+import asyncio
+import csv
+import io
+import logging
+import os
+import zlib
+from datetime import datetime, timezone
+from typing import AsyncIterable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import orjson
+from dotenv import load_dotenv
+from sqlalchemy import func, insert, select, union
+from sqlalchemy.orm import Session
+
+from app.models import Chat, ChatMember, Meeting, MeetingException, MeetingParticipant, Message, User
+from app.models.chat_member import rebuild_chat_members
+from app.utils.chat_versions import mark_changed
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "5000"))
+IMPORT_BATCH_ROWS = int(os.getenv("IMPORT_BATCH_ROWS", "5000"))
+# Longest NDJSON line an import accepts (decompressed)
+IMPORT_MAX_LINE_BYTES = int(os.getenv("IMPORT_MAX_LINE_BYTES", str(1024 * 1024)))
+# Uncompressed bytes gathered before each compress call, and the most one decompress call may inflate
+CHUNK_BYTES = 256 * 1024
+
+_USER_COLUMNS = (User.id, User.name, User.email, User.is_active, User.created_at)
+_CHAT_COLUMNS = (Chat.id, Chat.title, Chat.created_at)
+_MESSAGE_COLUMNS = (Message.id, Message.chat_id, Message.user_id, Message.text, Message.created_at)
+_MEETING_COLUMNS = (
+    Meeting.id, Meeting.chat_id, Meeting.title, Meeting.start_utc, Meeting.end_utc, Meeting.description,
+    Meeting.status, Meeting.created_at, Meeting.rrule, Meeting.timezone, Meeting.series_end_utc,
+    Meeting.participant_count, Meeting.confirmed_count, Meeting.declined_count,
+)
+_PARTICIPANT_COLUMNS = (MeetingParticipant.meeting_id, MeetingParticipant.user_id, MeetingParticipant.response)
+_EXCEPTION_COLUMNS = (
+    MeetingException.meeting_id, MeetingException.original_start_utc, MeetingException.status,
+    MeetingException.start_utc, MeetingException.end_utc, MeetingException.title, MeetingException.created_at,
+)
+
+# Entity name -> (record type, columns, ordering); also the CSV entities
+ENTITIES = {
+    "users": ("user", _USER_COLUMNS, (User.id,)),
+    "chats": ("chat", _CHAT_COLUMNS, (Chat.id,)),
+    "meetings": ("meeting", _MEETING_COLUMNS, (Meeting.id,)),
+    "participants": ("participant", _PARTICIPANT_COLUMNS, (MeetingParticipant.id,)),
+    "meeting_exceptions": ("meeting_exception", _EXCEPTION_COLUMNS, (MeetingException.id,)),
+    "messages": ("message", _MESSAGE_COLUMNS, (Message.chat_id, Message.created_at, Message.id)),
+}
+# Parents first, so an import never meets an id it can't map yet
+EXPORT_ORDER = ("users", "chats", "meetings", "participants", "meeting_exceptions", "messages")
+
+class BulkImportError(ValueError):
+    """A record that can't be imported; `line` is its 1-based line number"""
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+        # What the batches committed before the failure left behind (set by the importer)
+        self.chat_ids: List[int] = []
+        self.imported: Dict[str, int] = {}
+
+
+# --- Export ---
+
+def _scoped(entity: str, statement, chat_ids: Optional[Sequence[int]]):
+    if not chat_ids:
+        return statement
+    if entity == "users":
+        # Everyone who posted in, or was invited to a meeting of, the exported chats
+        members = select(ChatMember.user_id).where(ChatMember.chat_id.in_(chat_ids))
+        invited = select(MeetingParticipant.user_id) \
+            .join(Meeting, Meeting.id == MeetingParticipant.meeting_id) \
+            .where(Meeting.chat_id.in_(chat_ids))
+        return statement.where(User.id.in_(union(members, invited)))
+    if entity == "chats":
+        return statement.where(Chat.id.in_(chat_ids))
+    if entity in ("meetings", "messages"):
+        model = Meeting if entity == "meetings" else Message
+        return statement.where(model.chat_id.in_(chat_ids))
+    model = MeetingParticipant if entity == "participants" else MeetingException
+    return statement.where(model.meeting_id.in_(select(Meeting.id).where(Meeting.chat_id.in_(chat_ids))))
+
+
+def iter_entity(db: Session, entity: str, chat_ids: Optional[Sequence[int]] = None) -> Iterator[Dict]:
+    """Rows of one entity as dicts, fetched EXPORT_BATCH_ROWS at a time"""
+    _, columns, ordering = ENTITIES[entity]
+    statement = _scoped(entity, select(*columns), chat_ids).order_by(*ordering)
+    result = db.execute(statement.execution_options(yield_per=EXPORT_BATCH_ROWS))
+    for row in result:
+        yield row._asdict()
+
+
+def iter_records(db: Session, chat_ids: Optional[Sequence[int]] = None) -> Iterator[Dict]:
+    """Every exported record, typed and in import order; call on a fresh session"""
+    if db.get_bind().dialect.name == "postgresql":
+        # One snapshot for all tables, so no message refers to a chat created mid-export
+        db.connection(execution_options={"isolation_level": "REPEATABLE READ", "postgresql_readonly": True})
+    for entity in EXPORT_ORDER:
+        record_type = ENTITIES[entity][0]
+        for row in iter_entity(db, entity, chat_ids):
+            yield {"type": record_type, **row}
+
+
+def gzip_chunks(pieces: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """gzip-compress a byte stream, emitting output whenever the compressor has some"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    buffer = bytearray()
+    for piece in pieces:
+        buffer += piece
+        if len(buffer) >= CHUNK_BYTES:
+            compressed = compressor.compress(bytes(buffer))
+            buffer.clear()
+            if compressed:
+                yield compressed
+    yield compressor.compress(bytes(buffer)) + compressor.flush()
+
+
+def ndjson_lines(records: Iterable[Dict]) -> Iterator[bytes]:
+    for record in records:
+        yield orjson.dumps(record) + b"\n"
+
+
+def csv_lines(entity: str, rows: Iterable[Dict]) -> Iterator[bytes]:
+    _, columns, _ = ENTITIES[entity]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.key for column in columns])
+    for row in rows:
+        writer.writerow([value.isoformat() if isinstance(value, datetime) else value for value in row.values()])
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def export_ndjson_gz(db: Session, chat_ids: Optional[Sequence[int]] = None) -> Iterator[bytes]:
+    return gzip_chunks(ndjson_lines(iter_records(db, chat_ids)))
+
+
+def export_csv_gz(db: Session, entity: str, chat_ids: Optional[Sequence[int]] = None) -> Iterator[bytes]:
+    if entity not in ENTITIES:
+        raise ValueError(f"Unknown entity {entity!r}; expected one of {', '.join(EXPORT_ORDER)}")
+    return gzip_chunks(csv_lines(entity, iter_entity(db, entity, chat_ids)))
+
+
+# --- Import ---
+
+def _created_at(record: Dict) -> datetime:
+    # An explicit NULL would bypass the server default
+    return _parse_datetime(record.get("created_at")) or datetime.now(timezone.utc)
+
+
+def _parse_datetime(value) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    parsed = datetime.fromisoformat(value)
+    # Naive timestamps were exported from SQLite, which stores UTC
+    return parsed.replace(tzinfo=timezone.utc) if parsed.tzinfo is None else parsed
+
+
+class Importer:
+    """Single-pass loader for exported NDJSON records; feed() lines, then finish()"""
+
+    def __init__(self, db: Session, batch_rows: int = IMPORT_BATCH_ROWS):
+        self.db = db
+        self.batch_rows = batch_rows
+        self.user_ids: Dict[int, int] = {}
+        self.chat_ids: Dict[int, int] = {}
+        self.meeting_ids: Dict[int, int] = {}
+        # New meeting id -> new chat id
+        self.meeting_chats: Dict[int, int] = {}
+        self.counts: Dict[str, int] = {"users_matched": 0}
+        self.line = 0
+        self._pending: Dict[str, List] = {record_type: [] for record_type, _, _ in ENTITIES.values()}
+
+    # Rows wait in per-type buffers; a type's parents are always written before it
+    _PARENTS = {
+        "user": (),
+        "chat": (),
+        "meeting": ("chat",),
+        "participant": ("user", "meeting"),
+        "meeting_exception": ("meeting",),
+        "message": ("user", "chat"),
+    }
+
+    def feed(self, raw: bytes):
+        self.line += 1
+        if not raw.strip():
+            return
+        try:
+            record = orjson.loads(raw)
+            record_type = record.pop("type")
+        except (orjson.JSONDecodeError, KeyError, AttributeError):
+            raise BulkImportError(self.line, "not a typed JSON record")
+        if record_type not in self._PARENTS:
+            raise BulkImportError(self.line, f"unknown record type {record_type!r}")
+        for parent in self._PARENTS[record_type]:
+            if self._pending[parent]:
+                self._flush(parent)
+        self._pending[record_type].append((self.line, record))
+        if len(self._pending[record_type]) >= self.batch_rows:
+            self._flush(record_type)
+
+    def finish(self) -> Dict[str, int]:
+        for record_type in ("user", "chat", "meeting", "participant", "meeting_exception", "message"):
+            if self._pending[record_type]:
+                self._flush(record_type)
+        rebuild_chat_members(self.db, self.chat_ids.values())
+        self.db.commit()
+        return self.counts
+
+    def fail(self, error: BulkImportError) -> BulkImportError:
+        """Finish off the batches already committed and record them on `error`"""
+        rebuild_chat_members(self.db, self.chat_ids.values())
+        self.db.commit()
+        error.chat_ids = sorted(self.chat_ids.values())
+        error.imported = dict(self.counts)
+        return error
+
+    def _map(self, mapping: Dict[int, int], old_id, line: int, what: str) -> int:
+        try:
+            return mapping[old_id]
+        except KeyError:
+            raise BulkImportError(line, f"{what} {old_id} is not in the import")
+
+    def _flush(self, record_type: str):
+        batch, self._pending[record_type] = self._pending[record_type], []
+        try:
+            getattr(self, f"_write_{record_type}")(batch)
+        except BulkImportError:
+            self.db.rollback()
+            raise
+        except (KeyError, TypeError, ValueError) as e:
+            self.db.rollback()
+            raise BulkImportError(batch[0][0], f"invalid {record_type} record in this batch: {e}")
+        self.db.commit()
+        self.counts[f"{record_type}s"] = self.counts.get(f"{record_type}s", 0) + len(batch)
+
+    def _mark(self, chat_ids: Iterable[int], messages: bool = False, meetings: bool = False):
+        # Core inserts skip the flush hook that bumps the chats' conditional-GET versions
+        for chat_id in set(chat_ids):
+            mark_changed(self.db, chat_id, messages=messages, meetings=meetings)
+
+    def _insert_returning(self, model, rows: List[Dict]) -> List[int]:
+        result = self.db.execute(insert(model).returning(model.id, sort_by_parameter_order=True), rows)
+        return [row.id for row in result]
+
+    def _write_user(self, batch):
+        emails = {record["email"].strip().lower() for _, record in batch}
+        existing = dict(self.db.execute(
+            select(func.lower(User.email), User.id).where(func.lower(User.email).in_(emails))
+        ).all())
+        new: Dict[str, Dict] = {}
+        for _, record in batch:
+            email = record["email"].strip().lower()
+            if email in existing:
+                self.counts["users_matched"] += 1
+            else:
+                # The same email twice in a batch creates one user
+                new.setdefault(email, record)
+        if new:
+            ids = self._insert_returning(User, [{
+                "name": record["name"], "email": record["email"], "hashed_password": None,
+                "is_active": record.get("is_active", True), "created_at": _created_at(record),
+            } for record in new.values()])
+            existing.update(zip(new, ids))
+        for _, record in batch:
+            self.user_ids[record["id"]] = existing[record["email"].strip().lower()]
+
+    def _write_chat(self, batch):
+        ids = self._insert_returning(Chat, [
+            {"title": record.get("title"), "created_at": _created_at(record)}
+            for _, record in batch
+        ])
+        for (_, record), new_id in zip(batch, ids):
+            self.chat_ids[record["id"]] = new_id
+
+    def _write_meeting(self, batch):
+        rows = []
+        for line, record in batch:
+            row = {key: record.get(key) for key in (
+                "title", "description", "status", "rrule", "timezone",
+                "participant_count", "confirmed_count", "declined_count")}
+            row.update({key: _parse_datetime(record.get(key))
+                        for key in ("start_utc", "end_utc", "series_end_utc")})
+            row["created_at"] = _created_at(record)
+            row["chat_id"] = self._map(self.chat_ids, record["chat_id"], line, "chat")
+            for key in ("participant_count", "confirmed_count", "declined_count"):
+                row[key] = row[key] or 0
+            rows.append(row)
+        ids = self._insert_returning(Meeting, rows)
+        for (_, record), row, new_id in zip(batch, rows, ids):
+            self.meeting_ids[record["id"]] = new_id
+            self.meeting_chats[new_id] = row["chat_id"]
+        self._mark((row["chat_id"] for row in rows), meetings=True)
+
+    def _write_participant(self, batch):
+        rows = [{
+            "meeting_id": self._map(self.meeting_ids, record["meeting_id"], line, "meeting"),
+            "user_id": self._map(self.user_ids, record["user_id"], line, "user"),
+            "response": record.get("response") or "invited",
+        } for line, record in batch]
+        self.db.execute(insert(MeetingParticipant), rows)
+        self._mark((self.meeting_chats[row["meeting_id"]] for row in rows), meetings=True)
+
+    def _write_meeting_exception(self, batch):
+        rows = [{
+            "meeting_id": self._map(self.meeting_ids, record["meeting_id"], line, "meeting"),
+            "original_start_utc": _parse_datetime(record["original_start_utc"]),
+            "status": record.get("status") or "cancelled",
+            "start_utc": _parse_datetime(record.get("start_utc")),
+            "end_utc": _parse_datetime(record.get("end_utc")),
+            "title": record.get("title"),
+            "created_at": _created_at(record),
+        } for line, record in batch]
+        self.db.execute(insert(MeetingException), rows)
+        self._mark((self.meeting_chats[row["meeting_id"]] for row in rows), meetings=True)
+
+    def _write_message(self, batch):
+        # Core executemany: no ORM events, so chat_members is rebuilt in finish()
+        rows = [{
+            "chat_id": self._map(self.chat_ids, record["chat_id"], line, "chat"),
+            "user_id": self._map(self.user_ids, record["user_id"], line, "user"),
+            "text": record["text"],
+            "created_at": _created_at(record),
+        } for line, record in batch]
+        self.db.execute(insert(Message), rows)
+        self._mark((row["chat_id"] for row in rows), messages=True)
+
+
+
+class LineSplitter:
+    """Splits a gzip-compressed or plain byte stream into lines, chunk by chunk.
+
+    feed() inflates at most CHUNK_BYTES at a time and yields the lines found
+    so far, so a small gzip body can't expand all at once; a line longer than
+    max_line_bytes raises BulkImportError.
+    """
+
+    def __init__(self, max_line_bytes: int = IMPORT_MAX_LINE_BYTES):
+        self.max_line_bytes = max_line_bytes
+        self.lines = 0
+        self._decompressor = None
+        self._buffer = b""
+
+    def feed(self, chunk: bytes) -> Iterator[bytes]:
+        if not chunk:
+            return
+        if self._decompressor is None:
+            # Sniff the gzip magic on the first chunk; plain NDJSON passes through
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if chunk[:2] == b"\x1f\x8b" else False
+        if not self._decompressor:
+            yield from self._split(chunk)
+            return
+        data = self._decompressor.decompress(chunk, CHUNK_BYTES)
+        yield from self._split(data)
+        # A full slice may leave input (unconsumed_tail) or output still inside zlib
+        while self._decompressor.unconsumed_tail or len(data) == CHUNK_BYTES:
+            data = self._decompressor.decompress(self._decompressor.unconsumed_tail, CHUNK_BYTES)
+            yield from self._split(data)
+
+    def close(self) -> List[bytes]:
+        if self._decompressor:
+            self._buffer += self._decompressor.flush()
+        lines = self._buffer.split(b"\n") if self._buffer else []
+        self._buffer = b""
+        for line in lines:
+            self._check(line)
+        return lines
+
+    def _split(self, data: bytes) -> Iterator[bytes]:
+        lines = (self._buffer + data).split(b"\n")
+        self._buffer = lines.pop()
+        for line in lines:
+            self._check(line)
+            self.lines += 1
+            yield line
+        self._check(self._buffer)
+
+    def _check(self, line: bytes):
+        if len(line) > self.max_line_bytes:
+            raise BulkImportError(self.lines + 1, f"line is longer than {self.max_line_bytes} bytes")
+
+
+def import_records(db: Session, chunks: Iterable[bytes], batch_rows: int = IMPORT_BATCH_ROWS) -> Dict[str, int]:
+    """Import an export file given as byte chunks; returns counts per record type"""
+    importer = Importer(db, batch_rows)
+    splitter = LineSplitter()
+    try:
+        for chunk in chunks:
+            for line in splitter.feed(chunk):
+                importer.feed(line)
+        for line in splitter.close():
+            importer.feed(line)
+        return importer.finish()
+    except BulkImportError as e:
+        raise importer.fail(e)
+
+
+async def import_records_async(db: Session, chunks: AsyncIterable[bytes],
+                               batch_rows: int = IMPORT_BATCH_ROWS) -> Dict[str, int]:
+    """import_records() for a request body; inserts run off the event loop"""
+    importer = Importer(db, batch_rows)
+    splitter = LineSplitter()
+
+    def feed(lines: Iterable[bytes]):
+        for line in lines:
+            importer.feed(line)
+
+    try:
+        async for chunk in chunks:
+            # Decompression happens in the thread too, as the lines are consumed
+            await asyncio.to_thread(feed, splitter.feed(chunk))
+        await asyncio.to_thread(feed, splitter.close())
+        return await asyncio.to_thread(importer.finish)
+    except BulkImportError as e:
+        raise await asyncio.to_thread(importer.fail, e)
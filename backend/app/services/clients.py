@@ -0,0 +1,101 @@
+"""Lazily constructed clients for external services.
+
+The OpenAI and SendGrid SDKs together take over half a second to import, so
+they are loaded on first scheduling or email use rather than when app.main is
+imported. Each client is built once per process and shared; the time spent is
+recorded in the lazy_load_duration_seconds metric. set_clients() replaces them
+(load tests, stand-ins).
+
+Environment:
+    WARM_CLIENTS     load the SDKs in a background thread right after startup (default True),
+                     so the first scheduling request doesn't pay for the imports either
+    LLM_TRANSPORT    live (default), record, replay or synthetic; see app.services.transports
+    EMAIL_TRANSPORT  the same for SendGrid. Replay and synthetic never import the SDK
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+from app.services.transports import build_openai_client, build_sendgrid_client
+from app.utils.metrics import LAZY_LOAD_LATENCY
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+WARM_CLIENTS = os.getenv("WARM_CLIENTS", "True").lower() in ("1", "true", "yes")
+
+_openai_client = None
+_sendgrid_client = None
+_lock = threading.Lock()
+
+
+@contextmanager
+def _timed_load(component: str):
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    LAZY_LOAD_LATENCY.labels(component).observe(elapsed)
+    logger.info("Loaded deferred client", extra={"component": component, "duration_ms": round(elapsed * 1000, 1)})
+
+
+def _live_openai_client():
+    from openai import AsyncOpenAI
+
+    # Retries, timeouts and hedging are handled by llm_resilience, not the SDK
+    return AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+
+
+def _live_sendgrid_client():
+    from sendgrid import SendGridAPIClient
+
+    return SendGridAPIClient(api_key=os.getenv("SENDGRID_API_KEY"))
+
+
+def get_openai_client():
+    global _openai_client
+    if _openai_client is None:
+        with _lock:
+            if _openai_client is None:
+                with _timed_load("openai"):
+                    _openai_client = build_openai_client(_live_openai_client)
+    return _openai_client
+
+
+def get_sendgrid_client():
+    global _sendgrid_client
+    if _sendgrid_client is None:
+        with _lock:
+            if _sendgrid_client is None:
+                with _timed_load("sendgrid"):
+                    _sendgrid_client = build_sendgrid_client(_live_sendgrid_client)
+    return _sendgrid_client
+
+
+def set_clients(openai=None, sendgrid=None):
+    """Use these clients instead of building the real ones"""
+    global _openai_client, _sendgrid_client
+    with _lock:
+        if openai is not None:
+            _openai_client = openai
+        if sendgrid is not None:
+            _sendgrid_client = sendgrid
+
+
+def warm_clients():
+    """Import the deferred SDKs ahead of their first use; meant for a background thread"""
+    for load in (get_openai_client, get_sendgrid_client):
+        try:
+            load()
+        except Exception as e:
+            # e.g. no API key configured; the SDK import itself has still been paid for
+            logger.warning("Warming client failed", extra={"client": load.__name__, "error": str(e)})
+    import sendgrid.helpers.mail  # noqa: F401
+    # Auth helpers defer jose/passlib the same way
+    from app.auth import warm_auth
+
+    warm_auth()
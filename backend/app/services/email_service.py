@@ -1,21 +1,32 @@
+import logging
 import os
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+import time
 from datetime import datetime
+from typing import Optional
 import pytz
 from dotenv import load_dotenv
 
+from app.services.clients import get_sendgrid_client
+from app.utils.metrics import EMAIL_SEND_LATENCY
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 class EmailService:
-    def __init__(self):
-        self.sg = SendGridAPIClient(api_key=os.getenv("SENDGRID_API_KEY"))
+    def __init__(self, client=None):
         self.from_email = os.getenv("FROM_EMAIL", "meetings@propvivo.com")
+        self._client = client
+    
+    @property
+    def sg(self):
+        # Shared per process and only built (and the SDK imported) on first send
+        return self._client or get_sendgrid_client()
     
     async def send_meeting_confirmation(self, to_email: str, user_name: str, 
                                       meeting_title: str, meeting_time: datetime, 
-                                      meeting_id: int):
-        """Send meeting confirmation email"""
+                                      meeting_id: int, idempotency_key: Optional[str] = None):
+        """Send meeting confirmation email; returns whether SendGrid accepted it"""
         
         # Convert UTC to IST for display
         ist = pytz.timezone('Asia/Kolkata')
@@ -64,29 +75,41 @@ class EmailService:
         </html>
         """
         
+        from sendgrid.helpers.mail import CustomArg, Mail
         message = Mail(
             from_email=self.from_email,
             to_emails=to_email,
             subject=subject,
             html_content=html_content
         )
+        if idempotency_key:
+            # Echoed back in SendGrid event webhooks, so a repeated delivery can be recognised
+            message.custom_arg = CustomArg("idempotency_key", idempotency_key)
         
+        start = time.perf_counter()
         try:
             response = self.sg.send(message)
-            print(f"📧 Email sent to {to_email}")
-            print(f"   Status: {response.status_code}")
-            print(f"   Message ID: {response.headers.get('X-Message-Id', 'N/A')}")
-            print(f"   Subject: {subject}")
+            EMAIL_SEND_LATENCY.labels("confirmation", "success").observe(time.perf_counter() - start)
+            fields = {
+                "kind": "confirmation",
+                "to": to_email,
+                "meeting_id": meeting_id,
+                "status_code": response.status_code,
+                "message_id": response.headers.get('X-Message-Id', 'N/A'),
+            }
             
             if response.status_code == 202:
-                print(f"   ✅ Successfully queued for delivery")
+                logger.info("Email queued for delivery", extra=fields)
             else:
-                print(f"   ⚠️  Unexpected status code: {response.status_code}")
+                logger.warning("Email sent with unexpected status code", extra=fields)
                 
             return True
         except Exception as e:
-            print(f"❌ Error sending email to {to_email}: {e}")
-            print(f"   Error type: {type(e).__name__}")
+            EMAIL_SEND_LATENCY.labels("confirmation", "error").observe(time.perf_counter() - start)
+            logger.error("Error sending email", extra={
+                "kind": "confirmation", "to": to_email, "meeting_id": meeting_id,
+                "error": str(e), "error_type": type(e).__name__,
+            })
             return False
     
     async def send_follow_up_request(self, to_email: str, user_name: str, 
@@ -119,6 +142,7 @@ class EmailService:
         </html>
         """
         
+        from sendgrid.helpers.mail import Mail
         message = Mail(
             from_email=self.from_email,
             to_emails=to_email,
@@ -126,10 +150,17 @@ class EmailService:
             html_content=html_content
         )
         
+        start = time.perf_counter()
         try:
             response = self.sg.send(message)
-            print(f"Follow-up email sent to {to_email}: {response.status_code}")
+            EMAIL_SEND_LATENCY.labels("follow_up", "success").observe(time.perf_counter() - start)
+            logger.info("Follow-up email sent", extra={
+                "kind": "follow_up", "to": to_email, "status_code": response.status_code
+            })
             return True
         except Exception as e:
-            print(f"Error sending follow-up email: {e}")
+            EMAIL_SEND_LATENCY.labels("follow_up", "error").observe(time.perf_counter() - start)
+            logger.error("Error sending follow-up email", extra={
+                "kind": "follow_up", "to": to_email, "error": str(e), "error_type": type(e).__name__
+            })
             return False
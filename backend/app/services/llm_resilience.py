@@ -0,0 +1,241 @@
+"""Deadlines, bounded retries, hedging and a circuit breaker for LLM calls.
+
+call_with_resilience() wraps one LLM attempt (a coroutine factory) so that:
+- every attempt has a per-stage timeout, capped by the request's deadline
+- transient provider errors (timeouts, connection errors, 408/409/429/5xx) are
+  retried with full-jitter exponential backoff, a bounded number of times
+- optionally, a duplicate request is fired once the first has run longer than
+  the recent p95 latency for that stage/model; the first answer wins
+- after repeated transient failures the circuit opens and calls fail fast with
+  CircuitOpenError, so stages drop straight to their local fallbacks
+
+Environment:
+    LLM_TIMEOUT_SECONDS          per-attempt timeout for every stage (default 20)
+    LLM_TIMEOUT_<STAGE>          per-stage override, e.g. LLM_TIMEOUT_INTENT=5
+    LLM_MAX_RETRIES              retries after the first attempt (default 2)
+    LLM_RETRY_BASE_DELAY         first backoff step in seconds (default 0.25)
+    LLM_RETRY_MAX_DELAY          backoff cap in seconds (default 4)
+    LLM_HEDGE                    enable hedged requests (default False)
+    LLM_HEDGE_DELAY_SECONDS      hedge delay until enough latency samples exist (default 2)
+    LLM_CIRCUIT_FAILURES         consecutive transient failures that open the circuit (default 5)
+    LLM_CIRCUIT_RESET_SECONDS    how long the circuit stays open before a trial call (default 30)
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from dotenv import load_dotenv
+from prometheus_client import Counter
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_TIMEOUT = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.25"))
+RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "4"))
+HEDGE_ENABLED = os.getenv("LLM_HEDGE", "False").lower() in ("1", "true", "yes")
+HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DELAY_SECONDS", "2"))
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+TRANSIENT_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+LLM_RESILIENCE_EVENTS = Counter(
+    "llm_resilience_events_total",
+    "LLM timeouts, retries, hedges and circuit-breaker short circuits",
+    ["stage", "event"],
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the provider while the circuit is open"""
+
+
+class LLMDeadlineExceeded(asyncio.TimeoutError):
+    """The request's latency budget left no time for another attempt"""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            # Let exactly one trial call through to probe the provider
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def release_trial(self):
+        """The trial call ended with no verdict (e.g. it was cancelled): let the next call probe"""
+        self._trial_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning("LLM circuit opened", extra={"failures": self.failures})
+            self.opened_at = time.monotonic()
+
+
+breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv("LLM_CIRCUIT_FAILURES", "5")),
+    reset_timeout=float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30")),
+)
+
+# Recent successful latencies per "stage:model", used to place the hedge
+_latencies: Dict[str, Deque[float]] = {}
+
+
+def stage_timeout(stage: str) -> float:
+    return float(os.getenv(f"LLM_TIMEOUT_{stage.upper()}", DEFAULT_TIMEOUT))
+
+
+def record_latency(key: str, seconds: float):
+    _latencies.setdefault(key, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+
+def hedge_delay(key: str) -> float:
+    """p95 of recent latencies, or the configured default until there are enough samples"""
+    samples = _latencies.get(key)
+    if not samples or len(samples) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY
+    ordered = sorted(samples)
+    return ordered[int(0.95 * (len(ordered) - 1))]
+
+
+def is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError)):
+        return True
+    # Imported here: by the time a call has failed the SDK is loaded anyway
+    import openai
+
+    if isinstance(exc, openai.APIConnectionError):
+        return True
+    return getattr(exc, "status_code", None) in TRANSIENT_STATUS_CODES
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff"""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+async def hedged(factory: Callable[[], Awaitable[T]], delay: float, stage: str) -> T:
+    """Run factory(); if it hasn't finished after `delay`, race it against a second copy"""
+    first = asyncio.ensure_future(factory())
+    pending = {first}
+    error: Optional[BaseException] = None
+    # Everything inside the try, so a cancellation during the hedge delay cancels `first` too
+    try:
+        done, _ = await asyncio.wait(pending, timeout=delay)
+        if done:
+            return first.result()
+
+        LLM_RESILIENCE_EVENTS.labels(stage, "hedge_fired").inc()
+        second = asyncio.ensure_future(factory())
+        pending = {first, second}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is second:
+                        LLM_RESILIENCE_EVENTS.labels(stage, "hedge_won").inc()
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def call_with_resilience(stage: str, model: str, factory: Callable[[], Awaitable[T]],
+                               deadline: Optional[float] = None) -> T:
+    """Run one LLM attempt factory with timeout, retries, optional hedging and the circuit breaker.
+
+    `deadline` is a time.perf_counter() value after which no new attempt starts.
+    Non-transient errors (bad request, unparseable answer) are raised immediately.
+    """
+    probing = breaker.state == "half_open"
+    if not breaker.allow():
+        LLM_RESILIENCE_EVENTS.labels(stage, "short_circuit").inc()
+        raise CircuitOpenError("LLM provider circuit is open")
+
+    try:
+        return await _call_with_retries(stage, model, factory, deadline)
+    finally:
+        # Exits that record neither success nor failure (cancelled, deadline already spent)
+        # must hand the trial back, or the circuit stays shut for good; after a verdict
+        # the trial is already released and this is a no-op
+        if probing:
+            breaker.release_trial()
+
+
+async def _call_with_retries(stage: str, model: str, factory: Callable[[], Awaitable[T]],
+                             deadline: Optional[float]) -> T:
+    key = f"{stage}:{model}"
+    for attempt in range(MAX_RETRIES + 1):
+        timeout = stage_timeout(stage)
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.perf_counter())
+        if timeout <= 0:
+            LLM_RESILIENCE_EVENTS.labels(stage, "deadline_exceeded").inc()
+            raise LLMDeadlineExceeded(f"No time left in the request budget for {stage}")
+
+        start = time.perf_counter()
+        try:
+            if HEDGE_ENABLED:
+                result = await asyncio.wait_for(hedged(factory, hedge_delay(key), stage), timeout)
+            else:
+                result = await asyncio.wait_for(factory(), timeout)
+        except Exception as e:
+            if not is_transient(e):
+                # The provider answered (bad request, unparseable JSON): it is not degraded
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            event = "timeout" if isinstance(e, (asyncio.TimeoutError, TimeoutError)) else "transient_error"
+            LLM_RESILIENCE_EVENTS.labels(stage, event).inc()
+
+            delay = backoff_delay(attempt)
+            out_of_time = deadline is not None and time.perf_counter() + delay >= deadline
+            if attempt == MAX_RETRIES or out_of_time or not breaker.allow():
+                raise
+            LLM_RESILIENCE_EVENTS.labels(stage, "retry").inc()
+            logger.info("Retrying LLM call", extra={
+                "stage": stage, "model": model, "attempt": attempt + 1, "delay_ms": round(delay * 1000), "error": str(e)
+            })
+            await asyncio.sleep(delay)
+            continue
+
+        breaker.record_success()
+        record_latency(key, time.perf_counter() - start)
+        return result
@@ -0,0 +1,97 @@
+"""Cold storage for old chat messages.
+
+Messages older than MESSAGE_ARCHIVE_AFTER_DAYS are moved out of the database
+by scripts/partition_messages.py into gzip-compressed NDJSON files, one per
+chat and month:
+
+    <MESSAGE_ARCHIVE_DIR>/chat_<chat_id>/<YYYY-MM>.ndjson.gz
+
+Each line is one message (id, chat_id, user_id, user_name, text, created_at),
+with the sender's name stored alongside so reads need no database at all.
+The API reads these files on demand through list_archive_months() and
+read_archived_messages().
+"""
+import gzip
+import json
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ARCHIVE_DIR = os.getenv("MESSAGE_ARCHIVE_DIR", "archives")
+ARCHIVE_AFTER_DAYS = int(os.getenv("MESSAGE_ARCHIVE_AFTER_DAYS", "365"))
+
+_MONTH = re.compile(r"^\d{4}-\d{2}$")
+
+
+def archive_cutoff(days: Optional[int] = None) -> datetime:
+    """Messages created before this moment belong in the archive"""
+    days = ARCHIVE_AFTER_DAYS if days is None else days
+    return datetime.now(timezone.utc) - timedelta(days=days)
+
+
+def _chat_dir(chat_id: int, base_dir: Optional[str] = None) -> str:
+    return os.path.join(base_dir or ARCHIVE_DIR, f"chat_{chat_id}")
+
+
+def archive_path(chat_id: int, month: str, base_dir: Optional[str] = None) -> str:
+    if not _MONTH.match(month):
+        raise ValueError(f"Invalid archive month: {month!r} (expected YYYY-MM)")
+    return os.path.join(_chat_dir(chat_id, base_dir), f"{month}.ndjson.gz")
+
+
+def _read_lines(path: str) -> Iterator[Dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as archive:
+        for line in archive:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_archive(chat_id: int, month: str, messages: Iterable[Dict], base_dir: Optional[str] = None) -> int:
+    """Add messages to a chat's archive for one month, merging with what is already there.
+
+    The file is written to a temporary name and renamed into place, so readers
+    never see a partial archive and a failed run leaves the old file intact.
+    """
+    path = archive_path(chat_id, month, base_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    by_id = {}
+    if os.path.exists(path):
+        by_id = {message["id"]: message for message in _read_lines(path)}
+    for message in messages:
+        if isinstance(message.get("created_at"), datetime):
+            message = {**message, "created_at": message["created_at"].isoformat()}
+        by_id[message["id"]] = message
+
+    ordered = sorted(by_id.values(), key=lambda message: (message["created_at"], message["id"]))
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as archive:
+            for message in ordered:
+                archive.write((json.dumps(message, default=str) + "\n").encode("utf-8"))
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(temporary, path)
+    return len(ordered)
+
+
+def list_archive_months(chat_id: int, base_dir: Optional[str] = None) -> List[str]:
+    """Archived months for a chat, oldest first"""
+    directory = _chat_dir(chat_id, base_dir)
+    if not os.path.isdir(directory):
+        return []
+    months = [name[:-len(".ndjson.gz")] for name in os.listdir(directory) if name.endswith(".ndjson.gz")]
+    return sorted(month for month in months if _MONTH.match(month))
+
+
+def read_archived_messages(chat_id: int, month: str, base_dir: Optional[str] = None) -> List[Dict]:
+    """All archived messages of a chat for one month, in chronological order"""
+    path = archive_path(chat_id, month, base_dir)
+    if not os.path.exists(path):
+        return []
+    return list(_read_lines(path))
@@ -0,0 +1,144 @@
+"""Pick the messages worth sending to the LLM.
+
+Every message in the loaded history gets a local scheduling-relevance score,
+with no model call involved:
+
+  - time expressions: weekdays, dates, clock times and ranges ("2-5",
+    "after 4pm"), relative days ("tomorrow", "next week")
+  - availability language: free, busy, can't, works for me, ...
+  - TF-IDF weight of scheduling vocabulary, with IDF computed over this chat,
+    so words that appear in every message (a project name, say) count for less
+  - mentions of other participants ("Priya, does 3 work?")
+
+The prompt then contains the last few messages for conversational context,
+each participant's latest relevant statements, and as many of the
+highest-scoring remaining messages as the budget allows, in chat order.
+Greetings and off-topic chatter score zero and drop out.
+"""
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+from app.services.message_search import TIME_TERMS
+
+load_dotenv()
+
+# Messages sent to the LLM at most, including the always-kept ones
+PROMPT_MESSAGE_BUDGET = int(os.getenv("PROMPT_MESSAGE_BUDGET", "40"))
+# Most recent messages always kept for context
+PROMPT_RECENT_MESSAGES = int(os.getenv("PROMPT_RECENT_MESSAGES", "5"))
+# Latest relevant statements always kept per participant
+PROMPT_LATEST_PER_PARTICIPANT = 2
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+_WEEKDAY = re.compile(
+    r"\b(mon|tue|tues|wed|thu|thur|thurs|fri|sat|sun)(day|nesday|sday|rsday|urday)?s?\b", re.IGNORECASE
+)
+_CLOCK = re.compile(r"\b\d{1,2}(:\d{2})?\s*(am|pm|ist|utc|hrs?)\b|\b\d{1,2}:\d{2}\b", re.IGNORECASE)
+_RANGE = re.compile(r"\b\d{1,2}(:\d{2})?\s*(-|–|to|till|until)\s*\d{1,2}(:\d{2})?\b", re.IGNORECASE)
+_DATE = re.compile(
+    r"\b\d{1,2}[/-]\d{1,2}([/-]\d{2,4})?\b|\b\d{4}-\d{2}-\d{2}\b|"
+    r"\b\d{1,2}(st|nd|rd|th)?\s+(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\b|"
+    r"\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\s+\d{1,2}(st|nd|rd|th)?\b",
+    re.IGNORECASE,
+)
+_RELATIVE = re.compile(
+    r"\b(today|tomorrow|tonight|tmrw|tmr|weekend|next week|this week|morning|afternoon|evening|"
+    r"noon|midday|eod|after (lunch|work)|(before|after|around|by) \d{1,2})\b",
+    re.IGNORECASE,
+)
+_AVAILABILITY = re.compile(
+    r"\b(free|available|availability|busy|booked|occupied|can't|cannot|can not|won't|unable|"
+    r"doesn't work|does not work|not work|"
+    r"works for me|work for me|works|ok with|okay with|fine with|prefer|reschedul\w*|schedul\w*|"
+    r"meet|meeting|call|sync|slot|clash|conflict|out of office|ooo|leave|vacation|travell?ing)\b",
+    re.IGNORECASE,
+)
+
+# "Good morning" is a greeting, not a time of day
+_GREETING = re.compile(r"\bgood\s+(morning|afternoon|evening|night)\b", re.IGNORECASE)
+
+_SIGNALS = (
+    (_WEEKDAY, 2.0),
+    (_CLOCK, 2.0),
+    (_RANGE, 2.0),
+    (_DATE, 2.0),
+    (_RELATIVE, 1.5),
+    (_AVAILABILITY, 1.5),
+)
+
+ScoredMessage = Tuple[object, object]
+
+
+def _tokens(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def _is_schedule_term(token: str) -> bool:
+    return any(token.startswith(term) for term in TIME_TERMS)
+
+
+def has_time_expression(text: str) -> bool:
+    """Whether the text names a day, date, clock time or time range"""
+    return any(pattern.search(text) for pattern in (_WEEKDAY, _CLOCK, _RANGE, _DATE, _RELATIVE))
+
+
+def score_messages(texts: Sequence[str], participant_names: Sequence[str]) -> List[float]:
+    """Relevance score per message text (0 = nothing scheduling-related)"""
+    texts = [_GREETING.sub(" ", text) for text in texts]
+    documents = [_tokens(text) for text in texts]
+    document_frequency = Counter(token for tokens in documents for token in set(tokens))
+    total = max(len(documents), 1)
+    names = {name.lower() for name in participant_names if name}
+    first_names = {name.split()[0] for name in names if name.split()}
+
+    scores = []
+    for text, tokens in zip(texts, documents):
+        score = sum(weight for pattern, weight in _SIGNALS if pattern.search(text))
+        if tokens:
+            counts = Counter(tokens)
+            # TF-IDF mass of scheduling vocabulary in this message, against this chat's IDF
+            score += sum(
+                (count / len(tokens)) * math.log((1 + total) / (1 + document_frequency[token]))
+                for token, count in counts.items() if _is_schedule_term(token)
+            ) * 4
+            if score > 0 and any(token in first_names for token in counts):
+                score += 0.5
+        scores.append(round(score, 4))
+    return scores
+
+
+def select_relevant(messages: List[ScoredMessage], participant_names: Dict[int, str],
+                    budget: int = PROMPT_MESSAGE_BUDGET,
+                    recent: int = PROMPT_RECENT_MESSAGES) -> List[ScoredMessage]:
+    """The (message, user) pairs to put in the prompt, in their original order"""
+    if len(messages) <= budget:
+        return list(messages)
+
+    scores = score_messages([message.text or "" for message, _ in messages], list(participant_names.values()))
+    keep = set(range(max(len(messages) - recent, 0), len(messages)))
+
+    # Each participant's latest relevant statements, newest first
+    latest: Dict[int, int] = Counter()
+    for index in range(len(messages) - 1, -1, -1):
+        user_id = messages[index][1].id
+        if scores[index] > 0 and latest[user_id] < PROMPT_LATEST_PER_PARTICIPANT:
+            keep.add(index)
+            latest[user_id] += 1
+
+    ranked = sorted(
+        (index for index in range(len(messages)) if index not in keep and scores[index] > 0),
+        key=lambda index: (scores[index], index),
+        reverse=True,
+    )
+    for index in ranked:
+        if len(keep) >= budget:
+            break
+        keep.add(index)
+
+    return [messages[index] for index in sorted(keep)]
@@ -0,0 +1,155 @@
+"""Full-text search over chat messages.
+
+Postgres uses the generated messages.search_vector column and its GIN index;
+SQLite uses the messages_fts FTS5 table (both set up in app/models/message.py).
+Other backends fall back to a LIKE scan so the endpoint still works.
+"""
+import html
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import DateTime, Float, Integer, String, Text, text
+from sqlalchemy.orm import Session
+
+# Placeholder highlight markers, swapped for <mark> after the text is escaped
+_START, _STOP = "\x02", "\x03"
+
+# Word prefixes that show up when people talk about when they can meet
+TIME_TERMS = [
+    "mon", "tue", "wed", "thu", "fri", "sat", "sun", "today", "tomorrow", "tonight",
+    "week", "morning", "afternoon", "evening", "noon", "free", "avail", "busy",
+    "meet", "schedul", "call", "sync", "time", "slot", "pm", "ist", "utc",
+]
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+_POSTGRES_SEARCH = """
+    SELECT hit.id, hit.user_id, hit.user_name, hit.created_at, hit.text, hit.rank,
+           ts_headline('english', hit.text, hit.query, :headline_options) AS snippet
+    FROM (
+        SELECT m.id, m.user_id, u.name AS user_name, m.created_at, m.text, query,
+               ts_rank_cd(m.search_vector, query) AS rank
+        FROM messages m
+        JOIN app_users u ON u.id = m.user_id,
+             {tsquery} AS query
+        WHERE m.chat_id = :chat_id AND m.search_vector @@ query
+        ORDER BY rank DESC, m.id DESC
+        LIMIT :limit OFFSET :offset
+    ) AS hit
+    ORDER BY hit.rank DESC, hit.id DESC
+"""
+
+_SQLITE_SEARCH = """
+    SELECT m.id, m.user_id, u.name AS user_name, m.created_at, m.text,
+           -bm25(messages_fts) AS rank,
+           snippet(messages_fts, 0, :start, :stop, '…', 16) AS snippet
+    FROM messages_fts
+    JOIN messages m ON m.id = messages_fts.rowid
+    JOIN app_users u ON u.id = m.user_id
+    WHERE messages_fts MATCH :query AND m.chat_id = :chat_id
+    ORDER BY rank DESC, m.id DESC
+    LIMIT :limit OFFSET :offset
+"""
+
+_LIKE_SEARCH = """
+    SELECT m.id, m.user_id, u.name AS user_name, m.created_at, m.text,
+           0.0 AS rank, m.text AS snippet
+    FROM messages m
+    JOIN app_users u ON u.id = m.user_id
+    WHERE m.chat_id = :chat_id AND {conditions}
+    ORDER BY m.id DESC
+    LIMIT :limit OFFSET :offset
+"""
+
+_RESULT_TYPES = dict(
+    id=Integer, user_id=Integer, user_name=String, created_at=DateTime(timezone=True),
+    text=Text, rank=Float, snippet=Text,
+)
+
+
+@dataclass
+class SearchHit:
+    id: int
+    user_id: int
+    user_name: str
+    created_at: datetime
+    text: str
+    rank: float
+    snippet: str
+
+
+def _highlight(snippet: Optional[str]) -> str:
+    """Escape message text, then turn the highlight markers into <mark> tags"""
+    escaped = html.escape(snippet or "")
+    return escaped.replace(_START, "<mark>").replace(_STOP, "</mark>")
+
+
+def _dialect(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def _run(db: Session, sql: str, params: dict) -> List[SearchHit]:
+    rows = db.execute(text(sql).columns(**_RESULT_TYPES), params).all()
+    return [
+        SearchHit(
+            id=row.id,
+            user_id=row.user_id,
+            user_name=row.user_name,
+            created_at=row.created_at,
+            text=row.text,
+            rank=float(row.rank or 0.0),
+            snippet=_highlight(row.snippet),
+        )
+        for row in rows
+    ]
+
+
+def _search(db: Session, chat_id: int, words: List[str], match_any: bool, prefix: bool,
+            limit: int, offset: int) -> List[SearchHit]:
+    params = {"chat_id": chat_id, "limit": limit, "offset": offset}
+    dialect = _dialect(db)
+
+    if dialect == "postgresql":
+        if match_any or prefix:
+            operator = " | " if match_any else " & "
+            params["query"] = operator.join(f"{word}:*" if prefix else word for word in words)
+            tsquery = "to_tsquery('english', :query)"
+        else:
+            # websearch syntax understands quotes, "or" and -exclusions from the user's text
+            params["query"] = " ".join(words)
+            tsquery = "websearch_to_tsquery('english', :query)"
+        params["headline_options"] = f"StartSel={_START}, StopSel={_STOP}, MaxFragments=2, MaxWords=24"
+        return _run(db, _POSTGRES_SEARCH.format(tsquery=tsquery), params)
+
+    if dialect == "sqlite":
+        # Quote every term so user input can't inject FTS5 query syntax
+        terms = ['"{}"{}'.format(word.replace('"', '""'), "*" if prefix else "") for word in words]
+        params["query"] = (" OR " if match_any else " ").join(terms)
+        params["start"], params["stop"] = _START, _STOP
+        return _run(db, _SQLITE_SEARCH, params)
+
+    conditions = []
+    for index, word in enumerate(words):
+        params[f"word{index}"] = f"%{word}%"
+        conditions.append(f"lower(m.text) LIKE lower(:word{index})")
+    joined = (" OR " if match_any else " AND ").join(conditions)
+    return _run(db, _LIKE_SEARCH.format(conditions=f"({joined})"), params)
+
+
+def search_messages(db: Session, chat_id: int, query: str, limit: int = 20, offset: int = 0) -> List[SearchHit]:
+    """Messages in a chat matching every word of `query`, best match first"""
+    words = _WORD.findall(query)
+    if not words:
+        return []
+    if _dialect(db) == "postgresql":
+        # Keep the raw text so websearch_to_tsquery sees quotes and operators
+        words = [query]
+    return _search(db, chat_id, words, match_any=False, prefix=False, limit=limit, offset=offset)
+
+
+def time_related_message_ids(db: Session, chat_id: int, limit: int) -> List[int]:
+    """Ids of the most relevant messages that talk about dates, times or availability"""
+    hits = _search(db, chat_id, TIME_TERMS, match_any=True, prefix=True, limit=limit, offset=0)
+    return [hit.id for hit in hits]
@@ -0,0 +1,125 @@
+"""Per-stage model selection for the scheduling agent.
+
+Each stage gets an ordered list of model tiers, fastest/cheapest first. The
+agent asks the first tier and only escalates to the next one when the answer
+fails validation or reports low confidence, and only while the request's
+latency budget allows another round trip.
+
+Environment:
+    LLM_MODEL_TIERS                   default tiers for every stage, e.g. "gpt-4o-mini,gpt-4o"
+    LLM_MODEL_TIERS_<STAGE>           per-stage override (INTENT, EXTRACTION, MISSING_INFO, OPTIMAL_TIME)
+    LLM_ESCALATION_CONFIDENCE         escalate when "confidence" is below this (default 0.6)
+    SCHEDULING_LATENCY_BUDGET_SECONDS per-request budget for all LLM stages (default 30)
+"""
+import os
+import time
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+STAGES = ("intent", "extraction", "missing_info", "optimal_time")
+
+# Trivial classification stages start on the small model; extraction and
+# time-finding need the stronger one from the start
+DEFAULT_STAGE_TIERS = {
+    "intent": ["gpt-4o-mini", "gpt-4o"],
+    "extraction": ["gpt-4o"],
+    "missing_info": ["gpt-4o-mini", "gpt-4o"],
+    "optimal_time": ["gpt-4o"],
+}
+
+# Minimal shape each stage's answer must have: field -> accepted types
+STAGE_REQUIRED_FIELDS = {
+    "intent": {"has_intent": (bool,)},
+    "extraction": {"participants": (dict,)},
+    "missing_info": {"needs_followup": (bool,)},
+    "optimal_time": {"found_time": (bool,)},
+}
+
+# Stages whose prompt asks for a "confidence" the router escalates on
+CONFIDENCE_STAGES = ("intent",)
+
+
+def _parse_tiers(raw: Optional[str]) -> Optional[List[str]]:
+    if not raw:
+        return None
+    tiers = [model.strip() for model in raw.split(",") if model.strip()]
+    return tiers or None
+
+
+def validate_stage_result(stage: str, result) -> bool:
+    """Check that a parsed answer has the fields the pipeline reads next"""
+    if not isinstance(result, dict):
+        return False
+    for field, types in STAGE_REQUIRED_FIELDS.get(stage, {}).items():
+        if not isinstance(result.get(field), types):
+            return False
+    if stage == "optimal_time" and result["found_time"]:
+        meeting_time = result.get("meeting_time")
+        if not isinstance(meeting_time, dict) or not all(
+            meeting_time.get(key) for key in ("date", "start_time", "end_time")
+        ):
+            return False
+    return True
+
+
+class ModelRouter:
+    def __init__(self, stage_tiers: Dict[str, List[str]], confidence_threshold: float = 0.6,
+                 latency_budget: float = 30.0):
+        self.stage_tiers = stage_tiers
+        self.confidence_threshold = confidence_threshold
+        self.latency_budget = latency_budget
+
+    @classmethod
+    def from_env(cls) -> "ModelRouter":
+        default = _parse_tiers(os.getenv("LLM_MODEL_TIERS"))
+        stage_tiers = {}
+        for stage in STAGES:
+            stage_tiers[stage] = (
+                _parse_tiers(os.getenv(f"LLM_MODEL_TIERS_{stage.upper()}"))
+                or default
+                or DEFAULT_STAGE_TIERS[stage]
+            )
+        return cls(
+            stage_tiers,
+            confidence_threshold=float(os.getenv("LLM_ESCALATION_CONFIDENCE", "0.6")),
+            latency_budget=float(os.getenv("SCHEDULING_LATENCY_BUDGET_SECONDS", "30")),
+        )
+
+    def tiers(self, stage: str) -> List[str]:
+        return self.stage_tiers.get(stage) or DEFAULT_STAGE_TIERS.get(stage, ["gpt-4o"])
+
+    def start_budget(self) -> float:
+        """Deadline (perf_counter time) for one scheduling request"""
+        return time.perf_counter() + self.latency_budget
+
+    def escalation_reason(self, stage: str, result) -> Optional[str]:
+        """Why an answer should go to the next tier ("invalid", "low_confidence"), or None to accept it"""
+        if not validate_stage_result(stage, result):
+            return "invalid"
+        confidence = result.get("confidence")
+        if isinstance(confidence, (int, float)) and confidence < self.confidence_threshold:
+            return "low_confidence"
+        return None
+
+    def accepts_early(self, stage: str, fields: Dict) -> bool:
+        """Whether the fields streamed so far are an answer escalation_reason would accept.
+
+        Stages that report a confidence are only accepted once it has arrived,
+        so a low-confidence answer still reaches the next tier.
+        """
+        if stage in CONFIDENCE_STAGES and not isinstance(fields.get("confidence"), (int, float)):
+            return False
+        return self.escalation_reason(stage, fields) is None
+
+
+_default_router: Optional[ModelRouter] = None
+
+
+def get_model_router() -> ModelRouter:
+    global _default_router
+    if _default_router is None:
+        _default_router = ModelRouter.from_env()
+    return _default_router
@@ -0,0 +1,308 @@
+"""Transactional outbox for notifications.
+
+Notifications are rows in the `outbox` table, added in the same transaction
+as the change they announce (see enqueue_meeting_confirmations()), so a
+meeting and its confirmation emails are committed together or not at all and
+no request waits for email I/O. A pool of worker threads drains the table:
+
+  - claim up to OUTBOX_BATCH_SIZE due rows (FOR UPDATE SKIP LOCKED on
+    Postgres, plus a conditional UPDATE so concurrent workers and processes
+    never claim the same row); a claim expires after OUTBOX_LEASE_SECONDS,
+    so rows held by a crashed worker are picked up again
+  - skip rows whose meeting was replaced or moved since they were queued
+  - send, then record every outcome of the batch in one commit; failures are
+    retried with exponential backoff and jitter, and after OUTBOX_MAX_ATTEMPTS
+    the row is dead-lettered (status "dead", see scripts/outbox.py requeue)
+
+Delivery is at least once: a crash between sending and recording repeats the
+send, which carries the row's idempotency key for deduplication downstream.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import Meeting, OutboxMessage, User
+from app.services.email_service import EmailService
+from app.utils.metrics import OUTBOX_DELIVERIES, OUTBOX_DELIVERY_DELAY
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "2"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "20"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "1"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_SECONDS = float(os.getenv("OUTBOX_BACKOFF_SECONDS", "5"))
+OUTBOX_BACKOFF_MAX_SECONDS = float(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", "3600"))
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "120"))
+
+MEETING_CONFIRMATION = "meeting_confirmation"
+
+# Set after a commit that queued rows, so idle workers in this process start at once
+_wakeup = threading.Event()
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; everything stored is UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def wake_workers():
+    _wakeup.set()
+
+
+# --- Writing (inside the caller's transaction; nothing here commits) ---
+
+def enqueue(db: Session, kind: str, recipient: str, payload: Dict, idempotency_key: str,
+            meeting_id: Optional[int] = None) -> Optional[OutboxMessage]:
+    """Queue one notification; returns None if one with the same key was already queued"""
+    queued = enqueue_all(db, [_message(kind, recipient, payload, idempotency_key, meeting_id)])
+    return queued[0] if queued else None
+
+
+def enqueue_all(db: Session, messages: List[OutboxMessage]) -> List[OutboxMessage]:
+    """Queue the messages whose keys aren't queued yet, looking all the keys up in one query"""
+    keys = {message.idempotency_key for message in messages}
+    seen = {
+        key for (key,) in db.query(OutboxMessage.idempotency_key)
+        .filter(OutboxMessage.idempotency_key.in_(keys))
+    } if keys else set()
+    queued = []
+    for message in messages:
+        if message.idempotency_key not in seen:
+            seen.add(message.idempotency_key)
+            queued.append(message)
+    db.add_all(queued)
+    return queued
+
+
+def _message(kind: str, recipient: str, payload: Dict, idempotency_key: str,
+             meeting_id: Optional[int] = None) -> OutboxMessage:
+    return OutboxMessage(
+        kind=kind,
+        meeting_id=meeting_id,
+        recipient=recipient,
+        payload=json.dumps(payload),
+        idempotency_key=idempotency_key,
+        status="pending",
+        next_attempt_at=_utcnow(),
+    )
+
+
+def enqueue_meeting_confirmations(db: Session, meeting: Meeting, users: Iterable[User]) -> int:
+    """Queue a confirmation email per participant; the meeting must have been flushed (it needs an id)"""
+    start_utc = _as_utc(meeting.start_utc).isoformat()
+    messages = [
+        _message(MEETING_CONFIRMATION, user.email, {
+            "to_email": user.email,
+            "user_name": user.name,
+            "meeting_title": meeting.title,
+            "meeting_id": meeting.id,
+            "start_utc": start_utc,
+        }, f"{MEETING_CONFIRMATION}:{meeting.id}:{user.id}:{start_utc}", meeting_id=meeting.id)
+        for user in users
+    ]
+    return len(enqueue_all(db, messages))
+
+
+def cancel_for_meeting(db: Session, meeting_id: int) -> int:
+    """Cancel a meeting's undelivered notifications (it is being replaced or removed)"""
+    return db.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.meeting_id == meeting_id, OutboxMessage.status == "pending")
+        .values(status="cancelled", last_error="superseded")
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+# --- Delivery ---
+
+async def _send_meeting_confirmation(email_service: EmailService, payload: Dict, idempotency_key: str) -> bool:
+    return await email_service.send_meeting_confirmation(
+        to_email=payload["to_email"],
+        user_name=payload["user_name"],
+        meeting_title=payload["meeting_title"],
+        meeting_time=datetime.fromisoformat(payload["start_utc"]),
+        meeting_id=payload["meeting_id"],
+        idempotency_key=idempotency_key,
+    )
+
+
+SENDERS: Dict[str, Callable[[EmailService, Dict, str], Awaitable[bool]]] = {
+    MEETING_CONFIRMATION: _send_meeting_confirmation,
+}
+
+
+def _backoff(attempts: int) -> timedelta:
+    delay = min(OUTBOX_BACKOFF_MAX_SECONDS, OUTBOX_BACKOFF_SECONDS * 2 ** max(0, attempts - 1))
+    # Jitter so a burst of failures doesn't retry in lockstep
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def _due(now: datetime):
+    return or_(
+        and_(OutboxMessage.status == "pending", OutboxMessage.next_attempt_at <= now),
+        and_(OutboxMessage.status == "sending", OutboxMessage.locked_until < now),
+    )
+
+
+def claim_batch(db: Session, limit: int = OUTBOX_BATCH_SIZE) -> List[OutboxMessage]:
+    """Mark up to `limit` due rows as ours and return them"""
+    now = _utcnow()
+    candidates = [row.id for row in db.query(OutboxMessage.id)
+                  .filter(_due(now))
+                  .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+                  .limit(limit)
+                  .with_for_update(skip_locked=True)]
+    if not candidates:
+        db.rollback()
+        return []
+    token = uuid.uuid4().hex
+    db.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id.in_(candidates), _due(now))
+        .values(status="sending", claim_token=token, locked_until=now + timedelta(seconds=OUTBOX_LEASE_SECONDS),
+                attempts=OutboxMessage.attempts + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return db.query(OutboxMessage) \
+        .filter(OutboxMessage.claim_token == token, OutboxMessage.status == "sending") \
+        .order_by(OutboxMessage.id) \
+        .all()
+
+
+def _superseded(db: Session, rows: List[OutboxMessage]) -> set:
+    """Ids of rows whose meeting no longer exists or no longer starts when the row says"""
+    meeting_ids = {row.meeting_id for row in rows if row.meeting_id is not None}
+    starts = {
+        meeting_id: _as_utc(start_utc).isoformat()
+        for meeting_id, start_utc in db.query(Meeting.id, Meeting.start_utc).filter(Meeting.id.in_(meeting_ids))
+    } if meeting_ids else {}
+    stale = set()
+    for row in rows:
+        if row.meeting_id is None:
+            continue
+        if starts.get(row.meeting_id) != json.loads(row.payload).get("start_utc"):
+            stale.add(row.id)
+    return stale
+
+
+def _finish(row: OutboxMessage, status: str, error: Optional[str] = None):
+    row.status = status
+    row.claim_token = None
+    row.locked_until = None
+    row.last_error = error
+
+
+async def process_batch(email_service: EmailService,
+                        session_factory: Callable[[], Session] = SessionLocal,
+                        limit: int = OUTBOX_BATCH_SIZE) -> int:
+    """Claim and deliver one batch; returns how many rows it handled"""
+    db = session_factory()
+    try:
+        rows = claim_batch(db, limit)
+        if not rows:
+            return 0
+        stale = _superseded(db, rows)
+        now = _utcnow()
+        for row in rows:
+            if row.id in stale:
+                _finish(row, "cancelled", "superseded")
+                OUTBOX_DELIVERIES.labels(row.kind, "cancelled").inc()
+                continue
+            sender = SENDERS.get(row.kind)
+            try:
+                if sender is None:
+                    raise ValueError(f"No sender for outbox kind {row.kind!r}")
+                delivered = await sender(email_service, json.loads(row.payload), row.idempotency_key)
+                error = None if delivered else "send failed"
+            except Exception as e:
+                delivered, error = False, f"{type(e).__name__}: {e}"
+            if delivered:
+                _finish(row, "sent")
+                row.sent_at = _utcnow()
+                OUTBOX_DELIVERIES.labels(row.kind, "sent").inc()
+                if row.created_at is not None:
+                    OUTBOX_DELIVERY_DELAY.labels(row.kind).observe((row.sent_at - _as_utc(row.created_at)).total_seconds())
+            elif row.attempts >= OUTBOX_MAX_ATTEMPTS:
+                _finish(row, "dead", error)
+                OUTBOX_DELIVERIES.labels(row.kind, "dead").inc()
+                logger.error("Outbox message dead-lettered", extra={
+                    "outbox_id": row.id, "kind": row.kind, "attempts": row.attempts, "error": error
+                })
+            else:
+                _finish(row, "pending", error)
+                row.next_attempt_at = now + _backoff(row.attempts)
+                OUTBOX_DELIVERIES.labels(row.kind, "retry").inc()
+                logger.warning("Outbox delivery failed, will retry", extra={
+                    "outbox_id": row.id, "kind": row.kind, "attempts": row.attempts, "error": error
+                })
+        db.commit()
+        return len(rows)
+    finally:
+        db.close()
+
+
+def start_outbox_workers(stop: threading.Event, workers: int = OUTBOX_WORKERS,
+                         email_service: Optional[EmailService] = None) -> List[threading.Thread]:
+    """Drain the outbox on `workers` daemon threads until `stop` is set"""
+    email_service = email_service or EmailService()
+
+    def run():
+        # Sends are blocking SDK calls, so each worker has its own thread and event loop
+        loop = asyncio.new_event_loop()
+        try:
+            while not stop.is_set():
+                try:
+                    handled = loop.run_until_complete(process_batch(email_service))
+                except Exception as e:
+                    logger.error("Outbox batch failed", extra={"error": str(e), "error_type": type(e).__name__})
+                    handled = 0
+                if not handled and _wakeup.wait(OUTBOX_POLL_SECONDS):
+                    _wakeup.clear()
+        finally:
+            loop.close()
+
+    threads = []
+    for index in range(workers):
+        thread = threading.Thread(target=run, name=f"outbox-worker-{index}", daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
+
+
+# --- Operations ---
+
+def status_counts(db: Session) -> Dict[str, int]:
+    rows = db.query(OutboxMessage.status, func.count(OutboxMessage.id)).group_by(OutboxMessage.status).all()
+    return {status: count for status, count in rows}
+
+
+def requeue_dead(db: Session, ids: Optional[List[int]] = None) -> int:
+    """Give dead-lettered rows (all, or the given ids) a fresh set of attempts; commits"""
+    statement = update(OutboxMessage).where(OutboxMessage.status == "dead")
+    if ids:
+        statement = statement.where(OutboxMessage.id.in_(ids))
+    count = db.execute(
+        statement.values(status="pending", attempts=0, next_attempt_at=_utcnow(), last_error=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return count
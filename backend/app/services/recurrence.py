@@ -0,0 +1,212 @@
+"""Recurring meetings, expanded lazily.
+
+A recurring meeting is one `meetings` row with an RRULE; its occurrences are
+never stored. iter_occurrences() walks every series that can touch a window
+with dateutil's rrule iterator, starting at the window instead of at the
+series start, and merges them (plus single meetings and moved occurrences)
+into one stream ordered by start time. Memory is O(series in the window),
+not O(occurrences), however long a series runs.
+
+Cancelled or moved occurrences live in meeting_exceptions, keyed by the start
+the rule gave them.
+"""
+import heapq
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+import pytz
+from dateutil import tz
+from dateutil.rrule import rrule, rrulestr, DAILY, WEEKLY, MONTHLY, YEARLY
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.models import Meeting, MeetingException
+
+# Finer rules (hourly and below) would turn a small window into thousands of occurrences
+ALLOWED_FREQUENCIES = (DAILY, WEEKLY, MONTHLY, YEARLY)
+
+# Rows fetched per round trip while streaming single meetings
+STREAM_BATCH_SIZE = 500
+
+
+@dataclass
+class Occurrence:
+    meeting_id: int
+    chat_id: int
+    title: Optional[str]
+    start_utc: datetime
+    end_utc: datetime
+    status: str
+    recurring: bool = False
+    # Start the rule gave this occurrence (differs from start_utc when it was moved)
+    original_start_utc: Optional[datetime] = None
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; everything stored is UTC
+    return value.replace(tzinfo=pytz.UTC) if value.tzinfo is None else value.astimezone(pytz.UTC)
+
+
+def _zone(name: Optional[str]):
+    return tz.gettz(name or "UTC") or tz.UTC
+
+
+def parse_rule(rule: str, start_utc: datetime, timezone: Optional[str] = None):
+    """The dateutil rrule for a meeting, anchored at its first start in its own timezone.
+
+    Raises ValueError for rules that don't parse or recur more than daily.
+    """
+    text = rule.strip()
+    if text.upper().startswith("RRULE:"):
+        text = text[len("RRULE:"):]
+    if "DTSTART" in text.upper():
+        raise ValueError("RRULE must not contain DTSTART; the meeting's start is used")
+    parsed = rrulestr(text, dtstart=_as_utc(start_utc).astimezone(_zone(timezone)))
+    if not isinstance(parsed, rrule):
+        raise ValueError("Only a single RRULE is supported; use exceptions for skipped dates")
+    if parsed._freq not in ALLOWED_FREQUENCIES:
+        raise ValueError("Only DAILY, WEEKLY, MONTHLY and YEARLY rules are supported")
+    return parsed
+
+
+def series_end(rule: str, start_utc: datetime, end_utc: datetime,
+               timezone: Optional[str] = None) -> Optional[datetime]:
+    """End of a series' last occurrence (UTC), or None if it recurs forever"""
+    parsed = parse_rule(rule, start_utc, timezone)
+    if parsed._count is None and parsed._until is None:
+        return None
+    # Walk to the last occurrence keeping only one in memory
+    last = deque(parsed, maxlen=1)
+    if not last:
+        return _as_utc(end_utc)
+    return last[0].astimezone(pytz.UTC) + (_as_utc(end_utc) - _as_utc(start_utc))
+
+
+def is_occurrence(meeting: Meeting, start_utc: datetime) -> bool:
+    """Whether the meeting's rule produces an occurrence starting exactly at start_utc"""
+    if not meeting.rrule:
+        return _as_utc(meeting.start_utc) == _as_utc(start_utc)
+    parsed = parse_rule(meeting.rrule, meeting.start_utc, meeting.timezone)
+    local = _as_utc(start_utc).astimezone(_zone(meeting.timezone))
+    found = parsed.after(local, inc=True)
+    return found is not None and found.astimezone(pytz.UTC) == _as_utc(start_utc)
+
+
+def _single(meeting: Meeting) -> Occurrence:
+    start = _as_utc(meeting.start_utc)
+    return Occurrence(meeting.id, meeting.chat_id, meeting.title, start, _as_utc(meeting.end_utc),
+                      meeting.status, False, start)
+
+
+def _moved(exception: MeetingException, meeting: Meeting) -> Occurrence:
+    return Occurrence(meeting.id, meeting.chat_id, exception.title or meeting.title,
+                      _as_utc(exception.start_utc), _as_utc(exception.end_utc), meeting.status, True,
+                      _as_utc(exception.original_start_utc))
+
+
+def expand(meeting: Meeting, window_start: datetime, window_end: datetime,
+           skip: Optional[set] = None) -> Iterator[Occurrence]:
+    """Occurrences of one series overlapping [window_start, window_end), in order.
+
+    `skip` holds original starts (UTC) of cancelled or moved occurrences.
+    """
+    skip = skip or set()
+    window_start, window_end = _as_utc(window_start), _as_utc(window_end)
+    duration = _as_utc(meeting.end_utc) - _as_utc(meeting.start_utc)
+    parsed = parse_rule(meeting.rrule, meeting.start_utc, meeting.timezone)
+    # First occurrence that can still overlap the window; the rule is not walked from its start
+    after = (window_start - duration).astimezone(_zone(meeting.timezone))
+    for local_start in parsed.xafter(after, inc=False):
+        start = local_start.astimezone(pytz.UTC)
+        if start >= window_end:
+            return
+        if start in skip:
+            continue
+        yield Occurrence(meeting.id, meeting.chat_id, meeting.title, start, start + duration,
+                         meeting.status, True, start)
+
+
+def iter_occurrences(db: Session, window_start: datetime, window_end: datetime,
+                     chat_id: Optional[int] = None,
+                     meeting_ids: Optional[List[int]] = None) -> Iterator[Occurrence]:
+    """Every meeting occurrence overlapping the window, ordered by start.
+
+    Single meetings are streamed from the database in batches; each recurring
+    series contributes a lazy generator. Nothing beyond the window is expanded.
+    """
+    window_start, window_end = _as_utc(window_start), _as_utc(window_end)
+
+    def scoped(query):
+        if chat_id is not None:
+            query = query.filter(Meeting.chat_id == chat_id)
+        if meeting_ids is not None:
+            query = query.filter(Meeting.id.in_(meeting_ids))
+        return query
+
+    series: List[Meeting] = scoped(db.query(Meeting)).filter(
+        Meeting.rrule.isnot(None),
+        Meeting.start_utc < window_end,
+        or_(Meeting.series_end_utc.is_(None), Meeting.series_end_utc > window_start),
+    ).all()
+    by_id: Dict[int, Meeting] = {meeting.id: meeting for meeting in series}
+
+    skips: Dict[int, set] = {meeting_id: set() for meeting_id in by_id}
+    moved: List[Occurrence] = []
+    if series:
+        longest = max(_as_utc(meeting.end_utc) - _as_utc(meeting.start_utc) for meeting in series)
+        exceptions = db.query(MeetingException).filter(
+            MeetingException.meeting_id.in_(list(by_id)),
+            or_(
+                and_(MeetingException.original_start_utc > window_start - longest,
+                     MeetingException.original_start_utc < window_end),
+                and_(MeetingException.status == "moved",
+                     MeetingException.start_utc < window_end,
+                     MeetingException.end_utc > window_start),
+            ),
+        ).all()
+        for exception in exceptions:
+            skips[exception.meeting_id].add(_as_utc(exception.original_start_utc))
+            if (exception.status == "moved" and _as_utc(exception.start_utc) < window_end
+                    and _as_utc(exception.end_utc) > window_start):
+                moved.append(_moved(exception, by_id[exception.meeting_id]))
+        moved.sort(key=lambda occurrence: occurrence.start_utc)
+
+    singles = scoped(db.query(Meeting)).filter(
+        Meeting.rrule.is_(None),
+        Meeting.start_utc < window_end,
+        Meeting.end_utc > window_start,
+    ).order_by(Meeting.start_utc, Meeting.id).yield_per(STREAM_BATCH_SIZE)
+
+    streams = [(_single(meeting) for meeting in singles), iter(moved)]
+    streams += [expand(meeting, window_start, window_end, skips[meeting.id]) for meeting in series]
+    yield from heapq.merge(*streams, key=lambda occurrence: (occurrence.start_utc, occurrence.meeting_id))
+
+
+def set_exception(db: Session, meeting: Meeting, original_start_utc: datetime, status: str,
+                  start_utc: Optional[datetime] = None, end_utc: Optional[datetime] = None,
+                  title: Optional[str] = None) -> MeetingException:
+    """Cancel or move one occurrence of a recurring meeting (replacing any earlier change to it)"""
+    if not meeting.rrule:
+        raise ValueError("Meeting is not recurring")
+    if status not in ("cancelled", "moved"):
+        raise ValueError("status must be 'cancelled' or 'moved'")
+    if status == "moved" and (start_utc is None or end_utc is None or end_utc <= start_utc):
+        raise ValueError("A moved occurrence needs start_utc before end_utc")
+    original = _as_utc(original_start_utc)
+    if not is_occurrence(meeting, original):
+        raise ValueError("No occurrence of this meeting starts at that time")
+
+    exception = db.query(MeetingException).filter(
+        MeetingException.meeting_id == meeting.id,
+        MeetingException.original_start_utc == original,
+    ).first()
+    if exception is None:
+        exception = MeetingException(meeting_id=meeting.id, original_start_utc=original)
+        db.add(exception)
+    exception.status = status
+    exception.start_utc = _as_utc(start_utc) if status == "moved" else None
+    exception.end_utc = _as_utc(end_utc) if status == "moved" else None
+    exception.title = title
+    return exception
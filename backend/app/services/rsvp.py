@@ -0,0 +1,171 @@
+"""Set-based RSVPs and denormalized attendance counters.
+
+apply_rsvps() takes any number of (meeting_id, user_id, response) tuples and
+applies them with a fixed number of statements, whatever the batch size:
+
+  1. lock the affected meeting_participants rows (FOR UPDATE on Postgres)
+  2. one UPDATE per target response for the rows that actually change
+  3. one executemany adding the per-meeting deltas to confirmed_count /
+     declined_count (increments, so concurrent batches don't lose updates)
+  4. one UPDATE flipping meetings to "confirmed" once a majority accepted
+
+Quorum checks then read three integers from `meetings` instead of every
+participant row.
+"""
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from app.models import Meeting, MeetingParticipant
+from app.utils.chat_versions import mark_changed
+
+logger = logging.getLogger(__name__)
+
+RESPONSES = ("invited", "confirmed", "declined")
+
+# Meetings in these states are promoted to "confirmed" on a majority
+PROMOTABLE_STATUSES = ("scheduled",)
+
+RSVP = Tuple[int, int, str]
+
+
+@dataclass
+class RSVPResult:
+    updated: int = 0
+    unchanged: int = 0
+    missing: List[Tuple[int, int]] = field(default_factory=list)
+    meetings: List[Dict] = field(default_factory=list)
+
+
+def _counter_delta(old: str, new: str) -> Tuple[int, int]:
+    """(confirmed, declined) change for one participant moving from old to new"""
+    return (
+        (new == "confirmed") - (old == "confirmed"),
+        (new == "declined") - (old == "declined"),
+    )
+
+
+def apply_rsvps(db: Session, rsvps: Iterable[RSVP]) -> RSVPResult:
+    """Apply a batch of RSVPs and commit; the last response wins for repeated (meeting, user) pairs"""
+    wanted: Dict[Tuple[int, int], str] = {}
+    for meeting_id, user_id, response in rsvps:
+        if response not in RESPONSES:
+            raise ValueError(f"Invalid response {response!r}; expected one of {', '.join(RESPONSES)}")
+        wanted[(meeting_id, user_id)] = response
+
+    result = RSVPResult()
+    if not wanted:
+        return result
+
+    keys = list(wanted)
+    current = db.query(MeetingParticipant.meeting_id, MeetingParticipant.user_id, MeetingParticipant.response) \
+        .filter(tuple_(MeetingParticipant.meeting_id, MeetingParticipant.user_id).in_(keys)) \
+        .with_for_update() \
+        .all()
+    found = {(meeting_id, user_id): response or "invited" for meeting_id, user_id, response in current}
+    result.missing = [key for key in keys if key not in found]
+
+    changes: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+    deltas: Dict[int, List[int]] = defaultdict(lambda: [0, 0])
+    for key, old in found.items():
+        new = wanted[key]
+        if new == old:
+            result.unchanged += 1
+            continue
+        changes[new].append(key)
+        confirmed, declined = _counter_delta(old, new)
+        deltas[key[0]][0] += confirmed
+        deltas[key[0]][1] += declined
+    result.updated = sum(len(pairs) for pairs in changes.values())
+    changed_meetings = {meeting_id for pairs in changes.values() for meeting_id, _ in pairs}
+
+    for response, pairs in changes.items():
+        db.execute(
+            update(MeetingParticipant)
+            .where(tuple_(MeetingParticipant.meeting_id, MeetingParticipant.user_id).in_(pairs))
+            .values(response=response)
+            .execution_options(synchronize_session=False)
+        )
+
+    touched = sorted({meeting_id for meeting_id, _ in found})
+    counter_rows = [
+        {"meeting_id": meeting_id, "confirmed": confirmed, "declined": declined}
+        for meeting_id, (confirmed, declined) in deltas.items()
+        if confirmed or declined
+    ]
+    if counter_rows:
+        table = Meeting.__table__
+        db.execute(
+            table.update()
+            .where(table.c.id == bindparam("meeting_id"))
+            .values(
+                confirmed_count=table.c.confirmed_count + bindparam("confirmed"),
+                declined_count=table.c.declined_count + bindparam("declined"),
+            ),
+            counter_rows,
+        )
+        db.execute(
+            update(Meeting)
+            .where(
+                Meeting.id.in_([row["meeting_id"] for row in counter_rows]),
+                Meeting.status.in_(PROMOTABLE_STATUSES),
+                Meeting.confirmed_count * 2 > Meeting.participant_count,
+            )
+            .values(status="confirmed")
+            .execution_options(synchronize_session=False)
+        )
+
+    if touched:
+        meetings = db.query(Meeting.id, Meeting.chat_id, Meeting.status, Meeting.participant_count,
+                            Meeting.confirmed_count, Meeting.declined_count) \
+            .filter(Meeting.id.in_(touched)) \
+            .all()
+        for meeting in meetings:
+            if meeting.id in changed_meetings:
+                mark_changed(db, meeting.chat_id, meetings=True)
+            result.meetings.append({
+                "id": meeting.id,
+                "status": meeting.status,
+                "participant_count": meeting.participant_count,
+                "confirmed_count": meeting.confirmed_count,
+                "declined_count": meeting.declined_count,
+            })
+    db.commit()
+    # Rows touched by the Core statements may be cached on this session with stale values
+    db.expire_all()
+
+    logger.info("Applied RSVPs", extra={
+        "updated": result.updated, "unchanged": result.unchanged, "missing": len(result.missing)
+    })
+    return result
+
+
+def recount(db: Session, meeting_ids: Optional[List[int]] = None) -> int:
+    """Recompute the counters from meeting_participants (repair / backfill); returns meetings updated"""
+    participants = MeetingParticipant.__table__
+    table = Meeting.__table__
+
+    def count_where(condition=None):
+        query = select(func.count()).select_from(participants).where(participants.c.meeting_id == table.c.id)
+        if condition is not None:
+            query = query.where(condition)
+        return query.scalar_subquery()
+
+    statement = table.update().values(
+        participant_count=count_where(),
+        confirmed_count=count_where(participants.c.response == "confirmed"),
+        declined_count=count_where(participants.c.response == "declined"),
+    )
+    chats = select(table.c.chat_id).distinct()
+    if meeting_ids is not None:
+        statement = statement.where(table.c.id.in_(meeting_ids))
+        chats = chats.where(table.c.id.in_(meeting_ids))
+    updated = db.execute(statement).rowcount
+    for chat_id in db.execute(chats).scalars():
+        mark_changed(db, chat_id, meetings=True)
+    db.commit()
+    return updated
@@ -1,33 +1,167 @@
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import Dict, List, Optional, Tuple
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
+from collections import OrderedDict
+import asyncio
 import json
+import logging
 import os
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
-from openai import OpenAI
 import pytz
 
-from app.models import Message, User, Meeting, MeetingParticipant, Chat
-from app.services.email_service import EmailService
+from app.models import Message, User, Meeting, MeetingParticipant, Chat, ChatMember
+from app.services.clients import get_openai_client
+from app.services.outbox import cancel_for_meeting, enqueue_meeting_confirmations, wake_workers
+from app.services.model_router import get_model_router
+from app.services.llm_resilience import call_with_resilience
+from app.services.message_search import time_related_message_ids
+from app.services.message_relevance import select_relevant
+from app.services.recurrence import iter_occurrences, set_exception
+from app.services.availability_index import (
+    MIN_LEAD,
+    SLOT_MINUTES,
+    cached_index,
+    load_user_ranges,
+    update_cached_users,
+)
+from app.services.availability import (
+    available_users,
+    earliest_majority_slot,
+    replace_extracted_slots,
+    slots_from_extraction,
+)
+from app.utils.metrics import (
+    SCHEDULING_STAGE_LATENCY,
+    LLM_CALL_LATENCY,
+    LLM_STAGE_MODEL,
+    LLM_ESCALATIONS,
+    SPECULATION_RUNS,
+    SPECULATION_WASTED_TOKENS,
+    SPECULATION_SAVED_SECONDS,
+    PROMPT_MESSAGES,
+    record_llm_usage,
+)
+from app.utils.log import bind_chat_id, log_payload
+from app.utils.profiling import record_span
+from app.utils.json_stream import IncrementalJSONObjectParser
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Stream completions and parse them incrementally so stages can decide early
+LLM_STREAMING = os.getenv("LLM_STREAMING", "False").lower() in ("1", "true", "yes")
+
+# Run availability extraction concurrently with intent detection, cancelling it on no intent
+SPECULATIVE_EXTRACTION = os.getenv("SCHEDULING_SPECULATIVE", "False").lower() in ("1", "true", "yes")
+
+# Process-wide cap on in-flight LLM requests; a cancelled request gives its slot back immediately
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+_llm_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+# Find the meeting time from the stored availability, only asking the LLM when
+# no window has a majority free: the chat's cached index answers when it is warm,
+# otherwise the SQL majority-overlap query runs in the database
+SQL_OVERLAP = os.getenv("SCHEDULING_SQL_OVERLAP", "True").lower() in ("1", "true", "yes")
+# Default length and title when the extraction doesn't say what the meeting is
+MEETING_DURATION = timedelta(minutes=int(os.getenv("SCHEDULING_MEETING_MINUTES", "60")))
+DEFAULT_MEETING_TITLE = "Team Meeting"
+SCHEDULING_HORIZON = timedelta(days=14)
+
+# Chats longer than this send only their time-related messages (via full-text search) to the LLM
+SCHEDULING_HISTORY_LIMIT = int(os.getenv("SCHEDULING_HISTORY_LIMIT", "200"))
+
+# Build prompts from the locally highest-scoring messages instead of the whole history
+RELEVANCE_SELECTION = os.getenv("SCHEDULING_RELEVANCE_SELECTION", "True").lower() in ("1", "true", "yes")
+
+# Per-chat speculation statistics, bounded to the most recently scheduled chats
+SPECULATION_STATS_MAX_CHATS = 10000
+_speculation_stats: "OrderedDict[int, Dict]" = OrderedDict()
+
+ProgressCallback = Callable[[Dict], Awaitable[None]]
+
+JSON_SYSTEM_PROMPT = "You are a helpful assistant that always responds with valid JSON. Do not include any text outside the JSON object."
+
+@contextmanager
+def stage_timer(stage: str):
+    """Record a pipeline stage's duration as a metric and a structured log line"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        SCHEDULING_STAGE_LATENCY.labels(stage).observe(duration)
+        record_span(stage, start, duration)
+        logger.info("Scheduling stage finished", extra={"stage": stage, "duration_ms": round(duration * 1000, 2)})
+
+def _meeting_details(availability_result: Dict) -> Tuple[str, timedelta]:
+    """Title and length the extraction found for the meeting, with defaults"""
+    meeting = availability_result.get("meeting")
+    meeting = meeting if isinstance(meeting, dict) else {}
+    title = meeting.get("title")
+    title = title.strip() if isinstance(title, str) and title.strip() else DEFAULT_MEETING_TITLE
+    try:
+        minutes = int(meeting.get("duration_minutes") or 0)
+    except (TypeError, ValueError):
+        minutes = 0
+    # Keep it to whole 15-minute steps between 15 minutes and 8 hours
+    duration = timedelta(minutes=min(max(15, round(minutes / 15) * 15), 480)) if minutes > 0 else MEETING_DURATION
+    return title, duration
+
+def get_speculation_stats(chat_id: int) -> Dict:
+    """Speculative extraction statistics for a chat (zeros if it never ran speculatively)"""
+    return dict(_speculation_stats.get(chat_id) or {
+        "runs": 0, "hits": 0, "misses": 0, "wasted_tokens": 0, "saved_seconds": 0.0
+    })
+
+def _record_speculation(chat_id: int, hit: bool, wasted_tokens: int = 0, saved_seconds: float = 0.0):
+    stats = _speculation_stats.pop(chat_id, None) or get_speculation_stats(chat_id)
+    stats["runs"] += 1
+    stats["hits" if hit else "misses"] += 1
+    stats["wasted_tokens"] += wasted_tokens
+    stats["saved_seconds"] += saved_seconds
+    _speculation_stats[chat_id] = stats
+    while len(_speculation_stats) > SPECULATION_STATS_MAX_CHATS:
+        _speculation_stats.popitem(last=False)
+    
+    SPECULATION_RUNS.labels("hit" if hit else "miss").inc()
+    SPECULATION_WASTED_TOKENS.inc(wasted_tokens)
+    SPECULATION_SAVED_SECONDS.inc(saved_seconds)
+
 class SchedulingAgent:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, client=None):
         self.db = db
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.email_service = EmailService()
+        # An explicit client (e.g. a transports stand-in) overrides the shared one
+        self._client = client
         self.ist_timezone = pytz.timezone('Asia/Kolkata')
+        self._progress: Optional[ProgressCallback] = None
+        # Tokens spent per stage (estimated for requests cancelled before usage was reported)
+        self.stage_tokens: Dict[str, int] = {}
+        # Model tier that produced each stage's answer
+        self.router = get_model_router()
+        self.stage_models: Dict[str, str] = {}
+        self._deadline: Optional[float] = None
+    
+    @property
+    def client(self):
+        # Shared per process and only built (and the SDK imported) on first use
+        return self._client or get_openai_client()
     
-    async def process_chat_for_scheduling(self, chat_id: int) -> Dict:
-        """Main method to process chat for meeting scheduling using GPT-4o"""
+    async def process_chat_for_scheduling(self, chat_id: int, progress: Optional[ProgressCallback] = None) -> Dict:
+        """Main method to process chat for meeting scheduling using GPT-4o.
+        
+        If `progress` is given it is awaited with a small dict after each stage,
+        which /schedule/stream forwards to the client.
+        """
+        bind_chat_id(chat_id)
+        self._progress = progress
+        self._deadline = self.router.start_budget()
         
         # Get chat messages with users
-        messages = self.db.query(Message, User) \
-            .join(User, Message.user_id == User.id) \
-            .filter(Message.chat_id == chat_id) \
-            .order_by(Message.created_at.asc()) \
-            .all()
+        messages = self._load_chat_messages(chat_id)
         
         if not messages:
             return {
@@ -35,29 +169,77 @@ class SchedulingAgent:
                 "message": "No messages found in chat"
             }
         
-        # Get unique participants
-        participants = list(set(user.id for _, user in messages))
-        participant_names = {user.id: user.name for _, user in messages}
+        # Participants from chat_members instead of scanning every message
+        members = self.db.query(User.id, User.name) \
+            .join(ChatMember, User.id == ChatMember.user_id) \
+            .filter(ChatMember.chat_id == chat_id) \
+            .order_by(ChatMember.first_message_at.asc(), User.id.asc()) \
+            .all()
+        participants = [member.id for member in members]
+        participant_names = {member.id: member.name for member in members}
+        
+        # Only scheduling-relevant messages (plus recent context) go into the prompts
+        if RELEVANCE_SELECTION:
+            selected = select_relevant(messages, participant_names)
+            PROMPT_MESSAGES.labels("kept").inc(len(selected))
+            PROMPT_MESSAGES.labels("dropped").inc(len(messages) - len(selected))
+            logger.info("Selected relevant messages", extra={
+                "messages_total": len(messages), "messages_selected": len(selected)
+            })
+            messages = selected
         
         # Format chat history for LLM
         chat_history = self._format_chat_for_llm(messages)
         
+        # Step 2 may start speculatively: extraction only needs the chat history too
+        speculation = None
+        if SPECULATIVE_EXTRACTION:
+            speculation = {}
+            speculation["task"] = asyncio.create_task(
+                self._speculative_extraction(chat_history, participant_names, speculation)
+            )
+        
         # Step 1: Detect meeting intent using GPT-4o
-        intent_result = await self._detect_meeting_intent_llm(chat_history)
+        intent_started = time.perf_counter()
+        try:
+            with stage_timer("intent"):
+                intent_result = await self._detect_meeting_intent_llm(chat_history)
+        except BaseException:
+            if speculation is not None:
+                speculation["task"].cancel()
+            raise
+        intent_duration = time.perf_counter() - intent_started
+        await self._report_progress("intent", has_intent=intent_result["has_intent"],
+                                    confidence=intent_result.get("confidence"))
         
         if not intent_result["has_intent"]:
+            if speculation is not None:
+                await self._cancel_speculation(chat_id, speculation)
             return {
                 "status": "no_intent",
                 "message": "No meeting scheduling intent detected in the chat"
             }
         
         # Step 2: Extract availability using GPT-4o
-        availability_result = await self._extract_availability_llm(chat_history, participant_names)
+        with stage_timer("extraction"):
+            if speculation is not None:
+                availability_result = await speculation["task"]
+                # Sequential cost would have been intent + extraction; overlapped it is the max of the two
+                saved = min(intent_duration, speculation["duration"])
+                _record_speculation(chat_id, hit=True, saved_seconds=saved)
+            else:
+                availability_result = await self._extract_availability_llm(chat_history, participant_names)
+        # Keep the extracted availability: reused by the overlap query and other features
+        latest_message_ids = {user.id: message.id for message, user in messages}
+        self._store_availability(chat_id, availability_result, participant_names, latest_message_ids)
+        await self._report_progress("extraction", participants=len(availability_result.get("participants", {})))
         
         # Step 3: Check if we have enough information
-        missing_info_result = await self._check_missing_info_llm(
-            availability_result, participant_names, chat_history
-        )
+        with stage_timer("missing_info"):
+            missing_info_result = await self._check_missing_info_llm(
+                availability_result, participant_names, chat_history
+            )
+        await self._report_progress("missing_info", needs_followup=missing_info_result["needs_followup"])
         
         if missing_info_result["needs_followup"]:
             return {
@@ -66,9 +248,17 @@ class SchedulingAgent:
             }
         
         # Step 4: Find optimal meeting time using GPT-4o
-        optimal_time_result = await self._find_optimal_time_llm(
-            availability_result, participants, participant_names
-        )
+        with stage_timer("optimal_time"):
+            optimal_time_result = (
+                self._find_optimal_time_stored(chat_id, participants, participant_names, availability_result)
+                if SQL_OVERLAP else None
+            )
+            if optimal_time_result is None:
+                optimal_time_result = await self._find_optimal_time_llm(
+                    availability_result, participants, participant_names
+                )
+        await self._report_progress("optimal_time", found_time=optimal_time_result["found_time"],
+                                    meeting_time=optimal_time_result.get("meeting_time"))
         
         if not optimal_time_result["found_time"]:
             return {
@@ -77,15 +267,18 @@ class SchedulingAgent:
             }
         
         # Step 5: Create meeting in database
-        meeting = self._create_meeting(
-            chat_id, 
-            optimal_time_result["meeting_time"], 
-            participants,
-            optimal_time_result["title"]
-        )
+        with stage_timer("db_write"):
+            meeting = self._create_meeting(
+                chat_id, 
+                optimal_time_result["meeting_time"], 
+                participants,
+                optimal_time_result["title"]
+            )
+        await self._report_progress("db_write", meeting_id=meeting.id)
         
-        # Step 6: Send confirmation emails
-        await self._send_confirmation_emails(meeting, participants)
+        # Step 6: Confirmation emails were queued with the meeting; the outbox workers send them
+        wake_workers()
+        await self._report_progress("email", recipients=len(participants), queued=True)
         
         return {
             "status": "scheduled",
@@ -98,6 +291,30 @@ class SchedulingAgent:
             }
         }
     
+    def _load_chat_messages(self, chat_id: int) -> List[Tuple[Message, User]]:
+        """Chat history for the LLM: everything for short chats, time-related messages for long ones"""
+        query = self.db.query(Message, User) \
+            .join(User, Message.user_id == User.id) \
+            .filter(Message.chat_id == chat_id)
+        
+        total = self.db.query(func.coalesce(func.sum(ChatMember.message_count), 0)) \
+            .filter(ChatMember.chat_id == chat_id) \
+            .scalar()
+        if total > SCHEDULING_HISTORY_LIMIT:
+            message_ids = time_related_message_ids(self.db, chat_id, SCHEDULING_HISTORY_LIMIT)
+            logger.info("Using time-related chat history", extra={
+                "messages_total": total, "messages_selected": len(message_ids)
+            })
+            if message_ids:
+                query = query.filter(Message.id.in_(message_ids))
+            else:
+                query = query.filter(Message.id.in_(
+                    self.db.query(Message.id).filter(Message.chat_id == chat_id)
+                    .order_by(Message.id.desc()).limit(SCHEDULING_HISTORY_LIMIT)
+                ))
+        
+        return query.order_by(Message.created_at.asc(), Message.id.asc()).all()
+    
     def _format_chat_for_llm(self, messages: List[Tuple[Message, User]]) -> str:
         """Format chat messages for LLM processing"""
         formatted_messages = []
@@ -107,6 +324,167 @@ class SchedulingAgent:
         
         return "\n".join(formatted_messages)
     
+    async def _speculative_extraction(self, chat_history: str, participant_names: Dict[int, str],
+                                      speculation: Dict) -> Dict:
+        start = time.perf_counter()
+        try:
+            return await self._extract_availability_llm(chat_history, participant_names)
+        finally:
+            speculation["duration"] = time.perf_counter() - start
+    
+    async def _cancel_speculation(self, chat_id: int, speculation: Dict):
+        """Cancel a speculative extraction after negative intent and record what it cost"""
+        task = speculation["task"]
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # Extraction errors are irrelevant once intent is negative
+            pass
+        _record_speculation(chat_id, hit=False, wasted_tokens=self.stage_tokens.get("extraction", 0))
+    
+    def _account_tokens(self, stage: str, usage=None, estimate: int = 0):
+        record_llm_usage(stage, usage)
+        tokens = (getattr(usage, "total_tokens", 0) or 0) if usage is not None else estimate
+        self.stage_tokens[stage] = self.stage_tokens.get(stage, 0) + tokens
+    
+    async def _report_progress(self, stage: str, **details):
+        if self._progress is not None:
+            model = self.stage_models.get(stage)
+            await self._progress({"stage": stage, **({"model": model} if model else {}), **details})
+    
+    async def _complete_json(self, stage: str, prompt: str, max_tokens: int,
+                             early_exit: Optional[Callable[[Dict], bool]] = None) -> Dict:
+        """Run a JSON-only completion for one pipeline stage, escalating through the stage's model tiers.
+        
+        The next tier is only tried when the answer is unparseable, fails
+        validation or reports low confidence, and the request's latency budget
+        still has room for another call at least as long as the last one.
+        Raises ValueError when no tier produced a usable answer.
+        """
+        tiers = self.router.tiers(stage)
+        for index, model in enumerate(tiers):
+            call_started = time.perf_counter()
+            try:
+                result = await call_with_resilience(
+                    stage, model,
+                    lambda: self._complete_json_once(stage, model, prompt, max_tokens, early_exit),
+                    self._deadline
+                )
+                reason = self.router.escalation_reason(stage, result)
+            except ValueError:
+                result, reason = None, "invalid"
+            
+            if reason is None:
+                self._served_by(stage, model)
+                return result
+            
+            last_call = time.perf_counter() - call_started
+            has_next = index + 1 < len(tiers)
+            within_budget = self._deadline is None or time.perf_counter() + last_call <= self._deadline
+            if not (has_next and within_budget):
+                if reason == "low_confidence":
+                    # Best answer we can afford; a low-confidence answer is still a valid one
+                    self._served_by(stage, model)
+                    return result
+                raise ValueError(f"No valid {stage} answer from model tiers {tiers[:index + 1]}")
+            
+            LLM_ESCALATIONS.labels(stage, reason).inc()
+            logger.info("Escalating stage to next model tier", extra={
+                "stage": stage, "model": model, "next_model": tiers[index + 1], "reason": reason
+            })
+    
+    def _served_by(self, stage: str, model: str):
+        self.stage_models[stage] = model
+        LLM_STAGE_MODEL.labels(stage, model).inc()
+    
+    async def _complete_json_once(self, stage: str, model: str, prompt: str, max_tokens: int,
+                                  early_exit: Optional[Callable[[Dict], bool]] = None) -> Dict:
+        """Run a JSON-only completion on one model and parse the result.
+        
+        With LLM_STREAMING enabled, `early_exit` is checked against the fields
+        parsed so far and the partial result is returned as soon as it says so.
+        """
+        start = time.perf_counter()
+        request = dict(
+            model=model,
+            messages=[
+                {"role": "system", "content": JSON_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=max_tokens,
+            temperature=0.1
+        )
+        try:
+            async with _llm_slots:
+                if LLM_STREAMING:
+                    content, early_result = await self._stream_completion(stage, request, early_exit)
+                else:
+                    try:
+                        response = await self.client.chat.completions.create(**request)
+                    except asyncio.CancelledError:
+                        # The prompt has been sent, so count it (roughly 4 characters per token)
+                        self._account_tokens(stage, estimate=len(prompt) // 4)
+                        raise
+                    self._account_tokens(stage, getattr(response, "usage", None))
+                    content, early_result = response.choices[0].message.content.strip(), None
+        except Exception:
+            LLM_CALL_LATENCY.labels(stage, "fallback").observe(time.perf_counter() - start)
+            raise
+        
+        if early_result is not None:
+            LLM_CALL_LATENCY.labels(stage, "early_exit").observe(time.perf_counter() - start)
+            logger.info("LLM stream decided early", extra={
+                "stage": stage, "duration_ms": round((time.perf_counter() - start) * 1000, 2)
+            })
+            return early_result
+        
+        log_payload(logger, "LLM raw response", content, stage=stage)
+        
+        # Try to extract JSON if wrapped in markdown
+        if "```json" in content:
+            content = content.split("```json")[1].split("```")[0].strip()
+        elif "```" in content:
+            content = content.split("```")[1].strip()
+        
+        try:
+            result = json.loads(content)
+        except ValueError:
+            LLM_CALL_LATENCY.labels(stage, "json_error").observe(time.perf_counter() - start)
+            raise
+        
+        LLM_CALL_LATENCY.labels(stage, "success").observe(time.perf_counter() - start)
+        return result
+    
+    async def _stream_completion(self, stage: str, request: Dict,
+                                 early_exit: Optional[Callable[[Dict], bool]]) -> Tuple[str, Optional[Dict]]:
+        """Consume a streamed completion; returns (full text, partial result if it exited early)"""
+        parser = IncrementalJSONObjectParser()
+        prompt_estimate = sum(len(m["content"]) for m in request["messages"]) // 4
+        chunks = 0
+        usage = None
+        try:
+            stream = await self.client.chat.completions.create(
+                **request, stream=True, stream_options={"include_usage": True}
+            )
+            try:
+                async for chunk in stream:
+                    if getattr(chunk, "usage", None):
+                        usage = chunk.usage
+                    if not chunk.choices or not chunk.choices[0].delta.content:
+                        continue
+                    chunks += 1
+                    if parser.feed(chunk.choices[0].delta.content) and early_exit and early_exit(parser.fields):
+                        return parser.text, dict(parser.fields)
+            finally:
+                await stream.close()
+        finally:
+            # Usage arrives on the final chunk, so estimate it after an early exit or cancellation
+            self._account_tokens(stage, usage, estimate=prompt_estimate + chunks)
+        return parser.text.strip(), None
+    
     async def _detect_meeting_intent_llm(self, chat_history: str) -> Dict:
         """Use GPT-4o to detect meeting scheduling intent"""
         prompt = f"""
@@ -123,38 +501,20 @@ class SchedulingAgent:
 
         Respond with a JSON object containing:
         {{
-            "has_intent": boolean,
             "confidence": float (0.0 to 1.0),
+            "has_intent": boolean,
             "reasoning": "Brief explanation of your decision"
         }}
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that always responds with valid JSON. Do not include any text outside the JSON object."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=200,
-                temperature=0.1
+            return await self._complete_json(
+                "intent", prompt, max_tokens=200,
+                early_exit=lambda fields: fields.get("has_intent") is False and self.router.accepts_early("intent", fields)
             )
             
-            content = response.choices[0].message.content.strip()
-            print(f"Intent detection raw response: {content}")
-            
-            # Try to extract JSON if wrapped in markdown
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].strip()
-            
-            result = json.loads(content)
-            return result
-            
         except Exception as e:
-            print(f"LLM Intent Detection Error: {e}")
-            print(f"Raw response: {response.choices[0].message.content if 'response' in locals() else 'No response'}")
+            logger.warning("LLM intent detection failed, using fallback", extra={"stage": "intent", "error": str(e)})
             # Fallback to keyword-based detection
             return self._fallback_intent_detection(chat_history)
     
@@ -174,6 +534,8 @@ class SchedulingAgent:
         - Preferences or constraints
         - Time zone (assume IST/Asia/Kolkata if not specified)
 
+        Also note what the meeting is about and how long it should be.
+
         Current date context: Today is {datetime.now().strftime('%Y-%m-%d')}
 
         Parse relative dates like "Thursday", "tomorrow", "this week" into specific dates.
@@ -195,35 +557,19 @@ class SchedulingAgent:
                     "has_availability": boolean,
                     "constraints": "Any specific constraints mentioned"
                 }}
+            }},
+            "meeting": {{
+                "title": "Short title for what the meeting is about",
+                "duration_minutes": integer (60 unless the chat says otherwise)
             }}
         }}
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that always responds with valid JSON. Do not include any text outside the JSON object."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=800,
-                temperature=0.1
-            )
-            
-            content = response.choices[0].message.content.strip()
-            print(f"Availability extraction raw response: {content[:200]}...")
-            
-            # Try to extract JSON if wrapped in markdown
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].strip()
-            
-            result = json.loads(content)
-            return result
+            return await self._complete_json("extraction", prompt, max_tokens=800)
             
         except Exception as e:
-            print(f"LLM Availability Extraction Error: {e}")
+            logger.warning("LLM availability extraction failed, using fallback", extra={"stage": "extraction", "error": str(e)})
             # Fallback to basic parsing
             return self._fallback_availability_extraction(chat_history, participant_names)
     
@@ -255,31 +601,81 @@ class SchedulingAgent:
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that always responds with valid JSON. Do not include any text outside the JSON object."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=300,
-                temperature=0.1
+            return await self._complete_json(
+                "missing_info", prompt, max_tokens=300,
+                early_exit=lambda fields: (
+                    fields.get("needs_followup") is False and self.router.accepts_early("missing_info", fields)
+                )
             )
             
-            content = response.choices[0].message.content.strip()
-            
-            # Try to extract JSON if wrapped in markdown
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].strip()
-            
-            result = json.loads(content)
-            return result
-            
         except Exception as e:
-            print(f"LLM Missing Info Check Error: {e}")
+            logger.warning("LLM missing info check failed, using fallback", extra={"stage": "missing_info", "error": str(e)})
             return {"needs_followup": False, "followup_message": ""}
     
+    def _store_availability(self, chat_id: int, availability_result: Dict, participant_names: Dict[int, str],
+                            source_message_ids: Dict[int, int]):
+        """Replace the chat's extracted availability_slots with this run's extraction"""
+        slots = slots_from_extraction(chat_id, availability_result, participant_names, source_message_ids)
+        user_ranges = load_user_ranges(slots)
+        try:
+            replace_extracted_slots(self.db, chat_id, slots)
+        except Exception as e:
+            # Storage is an optimisation; the LLM path still has the JSON in memory
+            self.db.rollback()
+            logger.warning("Storing availability failed", extra={"error": str(e)})
+            return
+        # Cached what-if indexes for this chat take the new ranges in place, no rebuild
+        update_cached_users(chat_id, user_ranges)
+        logger.info("Stored availability", extra={"slots": len(slots)})
+    
+    def _find_optimal_time_stored(self, chat_id: int, participants: List[int], participant_names: Dict[int, str],
+                                  availability_result: Dict) -> Optional[Dict]:
+        """A window where a majority is free, from the stored availability; None if there isn't one.
+
+        A warm cached index (kept current by _store_availability) answers in memory; on a
+        miss the SQL overlap search runs instead, so slot rows are never loaded here.
+        """
+        needed = len(participants) // 2 + 1
+        title, duration = _meeting_details(availability_result)
+        earliest = datetime.now(pytz.UTC) + MIN_LEAD
+        try:
+            index = cached_index(chat_id, duration)
+            if index is not None:
+                best = index.best_window(not_before=earliest)
+                if best is None or best.available < needed:
+                    return None
+                source, start_utc, end_utc = "index", best.start_utc, best.end_utc
+                available, attending = best.available, best.user_ids
+            else:
+                slot = earliest_majority_slot(
+                    self.db, chat_id, needed, duration, earliest, earliest + SCHEDULING_HORIZON,
+                    step=timedelta(minutes=SLOT_MINUTES)
+                )
+                if slot is None:
+                    return None
+                source, start_utc, end_utc, available = "sql", slot.start_utc, slot.end_utc, slot.available
+                attending = available_users(self.db, chat_id, start_utc, end_utc)
+        except Exception as e:
+            self.db.rollback()
+            logger.warning("Stored availability lookup failed, asking the LLM", extra={"stage": "optimal_time", "error": str(e)})
+            return None
+        
+        self._served_by("optimal_time", source)
+        start_ist = start_utc.astimezone(self.ist_timezone)
+        end_ist = end_utc.astimezone(self.ist_timezone)
+        return {
+            "found_time": True,
+            "meeting_time": {
+                "date": start_ist.strftime("%Y-%m-%d"),
+                "start_time": start_ist.strftime("%H:%M"),
+                "end_time": end_ist.strftime("%H:%M"),
+                "timezone": "Asia/Kolkata"
+            },
+            "attending_participants": [participant_names.get(user_id, str(user_id)) for user_id in attending],
+            "title": title,
+            "reason": f"{available} of {len(participants)} participants are free"
+        }
+    
     async def _find_optimal_time_llm(self, availability_result: Dict, participants: List[int], participant_names: Dict[int, str]) -> Dict:
         """Use GPT-4o to find the optimal meeting time"""
         prompt = f"""
@@ -314,29 +710,10 @@ class SchedulingAgent:
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that always responds with valid JSON. Do not include any text outside the JSON object."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=400,
-                temperature=0.1
-            )
-            
-            content = response.choices[0].message.content.strip()
-            
-            # Try to extract JSON if wrapped in markdown
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].strip()
-            
-            result = json.loads(content)
-            return result
+            return await self._complete_json("optimal_time", prompt, max_tokens=400)
             
         except Exception as e:
-            print(f"LLM Optimal Time Finding Error: {e}")
+            logger.warning("LLM optimal time finding failed, using fallback", extra={"stage": "optimal_time", "error": str(e)})
             return {"found_time": False, "reason": "Error processing availability"}
     
     def _create_meeting(self, chat_id: int, meeting_time: Dict, participants: List[int], title: str) -> Meeting:
@@ -359,23 +736,36 @@ class SchedulingAgent:
         start_utc = start_ist.astimezone(pytz.UTC)
         end_utc = end_ist.astimezone(pytz.UTC)
         
-        # Smart replacement logic: Check for existing meetings on the same date
+        # Smart replacement logic: Check for existing meetings on the same date.
+        # Recurring series are expanded for that day only; a clashing occurrence is
+        # cancelled instead of deleting the whole series.
         meeting_date = start_utc.date()
-        existing_meetings = self.db.query(Meeting).filter(
-            Meeting.chat_id == chat_id,
-            Meeting.start_utc >= datetime.combine(meeting_date, datetime.min.time()).replace(tzinfo=pytz.UTC),
-            Meeting.start_utc < datetime.combine(meeting_date + timedelta(days=1), datetime.min.time()).replace(tzinfo=pytz.UTC)
-        ).all()
-        
-        # Delete existing meetings on the same date
-        for existing_meeting in existing_meetings:
+        day_start = datetime.combine(meeting_date, datetime.min.time()).replace(tzinfo=pytz.UTC)
+        day_end = day_start + timedelta(days=1)
+        existing_occurrences = [
+            occurrence for occurrence in iter_occurrences(self.db, day_start, day_end, chat_id=chat_id)
+            if occurrence.start_utc >= day_start
+        ]
+        
+        for occurrence in existing_occurrences:
+            existing_meeting = self.db.get(Meeting, occurrence.meeting_id)
+            if occurrence.recurring:
+                set_exception(self.db, existing_meeting, occurrence.original_start_utc, "cancelled")
+                logger.info("Cancelled clashing occurrence", extra={
+                    "meeting_id": existing_meeting.id, "date": str(meeting_date), "title": existing_meeting.title
+                })
+                continue
+            # Its confirmations haven't gone out yet and shouldn't
+            cancel_for_meeting(self.db, existing_meeting.id)
             # Delete participants first (foreign key constraint)
             self.db.query(MeetingParticipant).filter(
                 MeetingParticipant.meeting_id == existing_meeting.id
             ).delete()
             # Delete the meeting
             self.db.delete(existing_meeting)
-            print(f"🗑️ Replaced existing meeting on {meeting_date}: {existing_meeting.title}")
+            logger.info("Replaced existing meeting", extra={
+                "meeting_id": existing_meeting.id, "date": str(meeting_date), "title": existing_meeting.title
+            })
         
         # Create new meeting
         meeting = Meeting(
@@ -383,41 +773,31 @@ class SchedulingAgent:
             title=title or "Team Meeting",
             start_utc=start_utc,
             end_utc=end_utc,
-            description="Scheduled via AI agent"
+            description="Scheduled via AI agent",
+            participant_count=len(set(participants))
         )
         
         self.db.add(meeting)
-        self.db.commit()
-        self.db.refresh(meeting)
+        self.db.flush()
         
-        # Add participants
-        for participant_id in participants:
+        # Add participants (once each, so participant_count matches the rows)
+        for participant_id in dict.fromkeys(participants):
             participant = MeetingParticipant(
                 meeting_id=meeting.id,
                 user_id=participant_id
             )
             self.db.add(participant)
         
-        self.db.commit()
-        print(f"✅ Created new meeting for {meeting_date}: {meeting.title}")
-        
-        return meeting
-    
-    async def _send_confirmation_emails(self, meeting: Meeting, participants: List[int]):
-        """Send confirmation emails to participants"""
+        # Confirmation emails go out through the outbox, committed together with the meeting
         users = self.db.query(User).filter(User.id.in_(participants)).all()
+        enqueue_meeting_confirmations(self.db, meeting, users)
         
-        # Convert UTC back to IST for email display
-        start_ist = meeting.start_utc.replace(tzinfo=pytz.UTC).astimezone(self.ist_timezone)
+        self.db.commit()
+        logger.info("Created new meeting", extra={
+            "meeting_id": meeting.id, "date": str(meeting_date), "title": meeting.title
+        })
         
-        for user in users:
-            await self.email_service.send_meeting_confirmation(
-                to_email=user.email,
-                user_name=user.name,
-                meeting_title=meeting.title,
-                meeting_time=start_ist,
-                meeting_id=meeting.id
-            )
+        return meeting
     
     # Fallback methods for error cases
     def _fallback_intent_detection(self, chat_history: str) -> Dict:
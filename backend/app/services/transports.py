@@ -0,0 +1,553 @@
+"""Record, replay and synthetic stand-ins for the OpenAI and SendGrid clients.
+
+get_openai_client() and get_sendgrid_client() build one of these instead of
+(or around) the real SDK client, so the scheduling pipeline can be run and
+profiled without network access or API keys:
+
+    live       the real client (default)
+    record     the real client; every request/response pair is appended to a cassette
+    replay     answers come from the cassette, in recorded order; nothing is sent
+    synthetic  answers are generated from the JSON template in each stage's prompt
+
+Cassettes are NDJSON files, <TRANSPORT_CASSETTE_DIR>/openai.ndjson and
+sendgrid.ndjson, one request per line with its response and how long it took.
+Replay first looks for the exact request; with TRANSPORT_REPLAY_MATCH=stage
+(default) it falls back to any recording of the same stage, so a replay still
+works when chat timestamps or dates in the prompt have changed.
+
+Latency is simulated per service (LLM_TRANSPORT_LATENCY, EMAIL_TRANSPORT_LATENCY):
+    none | recorded | fixed:S | uniform:LO,HI | normal:MEAN,SD | lognormal:MEDIAN,SIGMA
+Samples come from one generator seeded with TRANSPORT_SEED, when set.
+"""
+import ast
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from app.utils.metrics import STAND_IN_REQUESTS
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MODES = ("live", "record", "replay", "synthetic")
+
+LLM_TRANSPORT = os.getenv("LLM_TRANSPORT", "live").lower()
+EMAIL_TRANSPORT = os.getenv("EMAIL_TRANSPORT", "live").lower()
+CASSETTE_DIR = os.getenv("TRANSPORT_CASSETTE_DIR", "cassettes")
+REPLAY_MATCH = os.getenv("TRANSPORT_REPLAY_MATCH", "stage").lower()
+LLM_LATENCY = os.getenv("LLM_TRANSPORT_LATENCY", "none")
+EMAIL_LATENCY = os.getenv("EMAIL_TRANSPORT_LATENCY", "none")
+TRANSPORT_SEED = os.getenv("TRANSPORT_SEED")
+
+_rng = random.Random(int(TRANSPORT_SEED) if TRANSPORT_SEED else None)
+
+# Only the prompt's date context changes from day to day for the same chat
+_TODAY = re.compile(r"Today is \d{4}-\d{2}-\d{2}")
+
+
+class CassetteMiss(LookupError):
+    """Replay found no recording for a request"""
+
+
+# --- Latency ---
+
+class Latency:
+    """Simulated response time, parsed from a spec such as "uniform:0.5,1.5" (seconds)"""
+
+    def __init__(self, spec: str = "none"):
+        self.spec = (spec or "none").strip().lower()
+        kind, _, args = self.spec.partition(":")
+        try:
+            self.params = [float(value) for value in args.split(",")] if args else []
+        except ValueError:
+            raise ValueError(f"Invalid latency spec: {spec!r}")
+        expected = {"none": 0, "recorded": 0, "fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if expected.get(kind) != len(self.params):
+            raise ValueError(f"Invalid latency spec: {spec!r}")
+        self.kind = kind
+
+    def sample(self, recorded: Optional[float] = None) -> float:
+        if self.kind == "recorded":
+            return recorded or 0.0
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return _rng.uniform(*self.params)
+        if self.kind == "normal":
+            return max(0.0, _rng.gauss(*self.params))
+        if self.kind == "lognormal":
+            median, sigma = self.params
+            return _rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        return 0.0
+
+
+# --- Cassettes ---
+
+class Cassette:
+    """Recorded request/response pairs for one service, appended to as they happen"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._by_key: Dict[str, List[Dict]] = defaultdict(list)
+        self._by_stage: Dict[str, List[Dict]] = defaultdict(list)
+        self._cursors: Dict[str, int] = defaultdict(int)
+        self._loaded = False
+
+    def _load(self):
+        if self._loaded:
+            return
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as cassette:
+                for line in cassette:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._by_key[entry["key"]].append(entry)
+                        self._by_stage[entry["stage"]].append(entry)
+        self._loaded = True
+
+    def append(self, entry: Dict):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as cassette:
+                cassette.write(json.dumps(entry, default=str) + "\n")
+
+    def next(self, key: str, stage: str, match: str = REPLAY_MATCH):
+        """(entry, how it matched); repeated requests cycle through their recordings in order"""
+        with self._lock:
+            self._load()
+            for name, entries, kind in ((f"key:{key}", self._by_key.get(key), "exact"),
+                                        (f"stage:{stage}", self._by_stage.get(stage) if match == "stage" else None,
+                                         "stage")):
+                if entries:
+                    index = self._cursors[name]
+                    self._cursors[name] = index + 1
+                    return entries[index % len(entries)], kind
+        raise CassetteMiss(f"No recording for {stage} request {key[:12]} in {self.path}")
+
+
+def _hash(payload) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _llm_request_key(request: Dict):
+    """(key, stage) for a completion request; streaming and non-streaming requests share recordings"""
+    messages = [{**message, "content": _TODAY.sub("Today is <date>", message["content"])}
+                for message in request.get("messages", [])]
+    payload = {name: request.get(name) for name in ("model", "max_tokens", "temperature")}
+    prompt = messages[-1]["content"] if messages else ""
+    # The instruction on the prompt's first line identifies the pipeline stage
+    first_line = next((line.strip() for line in prompt.splitlines() if line.strip()), "")
+    return _hash({**payload, "messages": messages}), f"{request.get('model')}:{first_line}"
+
+
+def _usage(prompt_tokens: int, completion_tokens: int):
+    return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                           total_tokens=prompt_tokens + completion_tokens)
+
+
+# --- OpenAI stand-ins ---
+
+class TextStream:
+    """Async iterator over completion chunks, shaped like openai.AsyncStream"""
+
+    def __init__(self, content: str, usage, latency: float, chunk_size: int = 8):
+        self.content = content
+        self.usage = usage
+        self.latency = latency
+        self.chunk_size = chunk_size
+
+    async def _chunks(self):
+        pieces = [self.content[i:i + self.chunk_size] for i in range(0, len(self.content), self.chunk_size)]
+        # Spread the completion time over the chunks, like tokens arriving
+        delay = self.latency / max(1, len(pieces))
+        for piece in pieces:
+            await asyncio.sleep(delay)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))], usage=None)
+        yield SimpleNamespace(choices=[], usage=self.usage)
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def close(self):
+        pass
+
+
+async def _respond(content: str, usage, latency: float, stream: bool):
+    if stream:
+        return TextStream(content, usage, latency)
+    await asyncio.sleep(latency)
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+
+class _RecordingCompletions:
+    def __init__(self, completions, cassette: Cassette):
+        self.completions = completions
+        self.cassette = cassette
+
+    async def create(self, stream: bool = False, stream_options: Optional[Dict] = None, **request):
+        # Always ask for the whole answer, so an early exit can't leave a truncated recording
+        start = time.perf_counter()
+        response = await self.completions.create(**request)
+        duration = time.perf_counter() - start
+        content = response.choices[0].message.content or ""
+        usage = getattr(response, "usage", None)
+        tokens = {
+            "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+            "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        }
+        key, stage = _llm_request_key(request)
+        self.cassette.append({
+            "key": key,
+            "stage": stage,
+            "request": request,
+            "response": {"content": content, "usage": tokens},
+            "duration_s": round(duration, 4),
+            "recorded_at": datetime.utcnow().isoformat(),
+        })
+        STAND_IN_REQUESTS.labels("openai", "record", "exact").inc()
+        if stream:
+            return TextStream(content, _usage(**tokens), 0.0)
+        return response
+
+
+class _ReplayCompletions:
+    def __init__(self, cassette: Cassette, latency: Latency):
+        self.cassette = cassette
+        self.latency = latency
+
+    async def create(self, stream: bool = False, stream_options: Optional[Dict] = None, **request):
+        key, stage = _llm_request_key(request)
+        try:
+            entry, match = self.cassette.next(key, stage)
+        except CassetteMiss:
+            STAND_IN_REQUESTS.labels("openai", "replay", "miss").inc()
+            raise
+        STAND_IN_REQUESTS.labels("openai", "replay", match).inc()
+        response = entry["response"]
+        return await _respond(response["content"], _usage(**response["usage"]),
+                              self.latency.sample(entry.get("duration_s")), stream)
+
+
+class _SyntheticCompletions:
+    def __init__(self, latency: Latency):
+        self.latency = latency
+
+    async def create(self, stream: bool = False, stream_options: Optional[Dict] = None, **request):
+        prompt = request["messages"][-1]["content"]
+        content = json.dumps(synthesize_response(prompt))
+        STAND_IN_REQUESTS.labels("openai", "synthetic", "exact").inc()
+        # Roughly 4 characters per token
+        usage = _usage(sum(len(m["content"]) for m in request["messages"]) // 4, len(content) // 4)
+        return await _respond(content, usage, self.latency.sample(), stream)
+
+
+class StandInOpenAI:
+    """Exposes client.chat.completions.create like the async OpenAI SDK"""
+
+    def __init__(self, completions):
+        self.chat = SimpleNamespace(completions=completions)
+
+
+class RecordingOpenAI(StandInOpenAI):
+    def __init__(self, client, cassette: Cassette):
+        super().__init__(_RecordingCompletions(client.chat.completions, cassette))
+
+
+class ReplayOpenAI(StandInOpenAI):
+    def __init__(self, cassette: Cassette, latency: Optional[Latency] = None):
+        super().__init__(_ReplayCompletions(cassette, latency or Latency()))
+
+
+class SyntheticOpenAI(StandInOpenAI):
+    def __init__(self, latency: Optional[Latency] = None):
+        super().__init__(_SyntheticCompletions(latency or Latency()))
+
+
+# --- Synthetic answers from the prompt's JSON template ---
+
+_PARTICIPANTS = re.compile(r"Participants: (\[.*?\])")
+_TODAY_DATE = re.compile(r"Today is (\d{4}-\d{2}-\d{2})")
+_NAME_PLACEHOLDER = re.compile(r"^ParticipantName\d*$")
+_RANGE = re.compile(r"\(\s*([\d.]+)\s*to\s*([\d.]+)\s*\)")
+# Flags and lists that would stop the pipeline early are answered negatively
+_NEGATIVE_KEY = re.compile(r"^(needs|missing)_")
+
+SYNTHETIC_START = "16:00"
+SYNTHETIC_END = "17:00"
+
+
+def _template_text(prompt: str) -> Optional[str]:
+    """The {...} block following "Respond with" in a stage prompt"""
+    start = prompt.find("{", max(0, prompt.rfind("Respond with")))
+    if start < 0:
+        return None
+    depth = 0
+    for index in range(start, len(prompt)):
+        if prompt[index] == "{":
+            depth += 1
+        elif prompt[index] == "}":
+            depth -= 1
+            if depth == 0:
+                return prompt[start:index + 1]
+    return None
+
+
+class _TemplateParser:
+    """Parses the prompts' pseudo-JSON: quoted placeholders, bare type hints and "..." elisions"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+
+    def _skip(self):
+        while self.pos < len(self.text) and self.text[self.pos] in " \t\r\n,":
+            self.pos += 1
+
+    def _peek(self) -> str:
+        self._skip()
+        return self.text[self.pos] if self.pos < len(self.text) else ""
+
+    def value(self):
+        char = self._peek()
+        if char == "{":
+            return self._object()
+        if char == "[":
+            return self._array()
+        if char == '"':
+            return ("str", self._string())
+        return ("bare", self._bare())
+
+    def _string(self) -> str:
+        end = self.text.index('"', self.pos + 1)
+        value = self.text[self.pos + 1:end]
+        self.pos = end + 1
+        return value
+
+    def _bare(self) -> str:
+        start, depth = self.pos, 0
+        while self.pos < len(self.text):
+            char = self.text[self.pos]
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+            elif depth == 0 and char in ",}]":
+                break
+            self.pos += 1
+        return self.text[start:self.pos].strip()
+
+    def _object(self):
+        self.pos += 1
+        fields = []
+        while self._peek() not in ("}", ""):
+            if self._peek() != '"':
+                self._bare()
+                continue
+            key = self._string()
+            self._skip()
+            if self.text[self.pos:self.pos + 1] == ":":
+                self.pos += 1
+            fields.append((key, self.value()))
+        self.pos += 1
+        return ("obj", fields)
+
+    def _array(self):
+        self.pos += 1
+        items = []
+        while self._peek() not in ("]", ""):
+            item = self.value()
+            if item != ("bare", "...") and item != ("bare", ""):
+                items.append(item)
+        self.pos += 1
+        return ("arr", items)
+
+
+def _next_weekday(today: date) -> date:
+    day = today + timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day
+
+
+def _generate(node, key: str, context: Dict):
+    kind, value = node
+    if kind == "obj":
+        result = {}
+        for field, child in value:
+            if _NAME_PLACEHOLDER.match(field) and context["participants"]:
+                for name in context["participants"]:
+                    result[name] = _generate(child, field, context)
+            else:
+                result[field] = _generate(child, field, context)
+        return result
+    if kind == "arr":
+        if _NEGATIVE_KEY.match(key):
+            return []
+        items = []
+        for item in value:
+            if item[0] == "str" and _NAME_PLACEHOLDER.match(item[1]):
+                items.extend(context["participants"])
+            else:
+                items.append(_generate(item, key, context))
+        return items
+    if kind == "str":
+        if value == "YYYY-MM-DD":
+            return context["date"]
+        if value == "HH:MM":
+            return SYNTHETIC_END if key.startswith("end") else SYNTHETIC_START
+        if _NAME_PLACEHOLDER.match(value):
+            return context["participants"][0] if context["participants"] else value
+        return value
+    hint = value.lower()
+    if hint.startswith("bool"):
+        return not _NEGATIVE_KEY.match(key)
+    if hint.startswith(("float", "number")):
+        bounds = _RANGE.search(hint)
+        return round(float(bounds.group(2)) * 0.9, 2) if bounds else 0.9
+    if hint.startswith("int"):
+        # "integer (60 unless ...)": the template's example value if it gives one
+        example = re.search(r"\d+", hint)
+        return int(example.group()) if example else 1
+    return value
+
+
+def synthesize_response(prompt: str) -> Dict:
+    """A well-formed answer for a stage prompt: every field of its JSON template filled in.
+
+    Participant placeholders expand to the names listed in the prompt, dates to the
+    next weekday after the prompt's "Today is", and booleans are true except
+    needs_*/missing_* ones, so a synthetic run goes through every pipeline stage.
+    """
+    template = _template_text(prompt)
+    if template is None:
+        return {}
+    participants = []
+    found = _PARTICIPANTS.search(prompt)
+    if found:
+        try:
+            participants = [str(name) for name in ast.literal_eval(found.group(1))]
+        except (ValueError, SyntaxError):
+            participants = []
+    today = _TODAY_DATE.search(prompt)
+    today = datetime.strptime(today.group(1), "%Y-%m-%d").date() if today else date.today()
+    context = {"participants": participants, "date": _next_weekday(today).isoformat()}
+    return _generate(_TemplateParser(template).value(), "", context)
+
+
+# --- SendGrid stand-ins ---
+
+def _email_request(message) -> Dict:
+    """Recipients and subject of a Mail; the body carries ids that differ between runs"""
+    payload = message.get() if hasattr(message, "get") else {}
+    recipients = [to.get("email") for personalization in payload.get("personalizations", [])
+                  for to in personalization.get("to", [])]
+    return {"to": recipients, "subject": payload.get("subject")}
+
+
+def _email_response(status_code: int, headers: Dict):
+    return SimpleNamespace(status_code=status_code, headers=headers, body=b"")
+
+
+class RecordingSendGrid:
+    def __init__(self, client, cassette: Cassette):
+        self.client = client
+        self.cassette = cassette
+
+    def send(self, message):
+        start = time.perf_counter()
+        response = self.client.send(message)
+        request = _email_request(message)
+        self.cassette.append({
+            "key": _hash(request),
+            "stage": "send",
+            "request": request,
+            "response": {"status_code": response.status_code, "headers": dict(response.headers or {})},
+            "duration_s": round(time.perf_counter() - start, 4),
+            "recorded_at": datetime.utcnow().isoformat(),
+        })
+        STAND_IN_REQUESTS.labels("sendgrid", "record", "exact").inc()
+        return response
+
+
+class ReplaySendGrid:
+    def __init__(self, cassette: Cassette, latency: Optional[Latency] = None):
+        self.cassette = cassette
+        self.latency = latency or Latency()
+
+    def send(self, message):
+        try:
+            entry, match = self.cassette.next(_hash(_email_request(message)), "send")
+        except CassetteMiss:
+            STAND_IN_REQUESTS.labels("sendgrid", "replay", "miss").inc()
+            raise
+        STAND_IN_REQUESTS.labels("sendgrid", "replay", match).inc()
+        # EmailService.send is synchronous, like the SDK call it stands in for
+        time.sleep(self.latency.sample(entry.get("duration_s")))
+        return _email_response(entry["response"]["status_code"], entry["response"]["headers"])
+
+
+class SyntheticSendGrid:
+    def __init__(self, latency: Optional[Latency] = None):
+        self.latency = latency or Latency()
+        self._ids = itertools.count(1)
+
+    def send(self, message):
+        STAND_IN_REQUESTS.labels("sendgrid", "synthetic", "exact").inc()
+        time.sleep(self.latency.sample())
+        return _email_response(202, {"X-Message-Id": f"synthetic-{next(self._ids)}"})
+
+
+# --- Construction from configuration ---
+
+def _mode(value: str, variable: str) -> str:
+    if value not in MODES:
+        raise ValueError(f"{variable} must be one of {', '.join(MODES)}, got {value!r}")
+    return value
+
+
+def cassette_path(service: str, base_dir: Optional[str] = None) -> str:
+    return os.path.join(base_dir or CASSETTE_DIR, f"{service}.ndjson")
+
+
+def build_openai_client(build_live: Callable, mode: Optional[str] = None, latency: Optional[str] = None,
+                        cassette_dir: Optional[str] = None):
+    """The client for LLM_TRANSPORT; `build_live` constructs the real SDK client when one is needed"""
+    mode = _mode(mode or LLM_TRANSPORT, "LLM_TRANSPORT")
+    if mode == "live":
+        return build_live()
+    logger.info("Using OpenAI stand-in", extra={"mode": mode})
+    if mode == "record":
+        return RecordingOpenAI(build_live(), Cassette(cassette_path("openai", cassette_dir)))
+    if mode == "replay":
+        return ReplayOpenAI(Cassette(cassette_path("openai", cassette_dir)), Latency(latency or LLM_LATENCY))
+    return SyntheticOpenAI(Latency(latency or LLM_LATENCY))
+
+
+def build_sendgrid_client(build_live: Callable, mode: Optional[str] = None, latency: Optional[str] = None,
+                          cassette_dir: Optional[str] = None):
+    """The client for EMAIL_TRANSPORT; `build_live` constructs the real SDK client when one is needed"""
+    mode = _mode(mode or EMAIL_TRANSPORT, "EMAIL_TRANSPORT")
+    if mode == "live":
+        return build_live()
+    logger.info("Using SendGrid stand-in", extra={"mode": mode})
+    if mode == "record":
+        return RecordingSendGrid(build_live(), Cassette(cassette_path("sendgrid", cassette_dir)))
+    if mode == "replay":
+        return ReplaySendGrid(Cassette(cassette_path("sendgrid", cassette_dir)), Latency(latency or EMAIL_LATENCY))
+    return SyntheticSendGrid(Latency(latency or EMAIL_LATENCY))
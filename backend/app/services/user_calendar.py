@@ -0,0 +1,158 @@
+"""A user's meetings across every chat, for GET /api/users/me/meetings.
+
+Single meetings come from one index-driven query: the user's rows in the
+(user_id, meeting_id) participant index joined to meetings and bounded by the
+(start_utc, id) index. Recurring series the user is in are expanded for the
+window only (app/services/recurrence.py), from the cursor on, and merged in
+by start time.
+
+Pages use keyset pagination on (start_utc, meeting_id): the cursor is the
+last entry's key, so page N costs the same as page 1 however many meetings
+the user has. free_busy() collapses the same stream into merged busy
+intervals.
+"""
+import base64
+import heapq
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple
+
+import pytz
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+
+from app.models import Meeting, MeetingParticipant
+from app.services.recurrence import iter_occurrences
+
+# Single meetings are built from one day's slot, so none is longer than this. It gives the
+# window a lower bound on start_utc, turning the index scan into a range of ~the window
+MAX_MEETING_LENGTH = timedelta(days=1)
+
+# Meetings that don't make the user busy
+FREE_STATUSES = ("cancelled",)
+FREE_RESPONSES = ("declined",)
+
+Cursor = Tuple[datetime, int]
+
+
+@dataclass
+class CalendarEntry:
+    meeting_id: int
+    chat_id: int
+    title: Optional[str]
+    start_utc: datetime
+    end_utc: datetime
+    status: str
+    response: Optional[str]
+    recurring: bool = False
+    original_start_utc: Optional[datetime] = None
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; everything stored is UTC
+    return value.replace(tzinfo=pytz.UTC) if value.tzinfo is None else value.astimezone(pytz.UTC)
+
+
+def encode_cursor(entry: CalendarEntry) -> str:
+    raw = f"{_as_utc(entry.start_utc).isoformat()}|{entry.meeting_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """(start_utc, meeting_id) of the last entry already returned; ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        start, meeting_id = raw.rsplit("|", 1)
+        return _as_utc(datetime.fromisoformat(start)), int(meeting_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+def _single_meetings(db: Session, user_id: int, window_start: datetime, window_end: datetime,
+                     after: Optional[Cursor], limit: Optional[int]) -> Iterator[CalendarEntry]:
+    statement = select(Meeting.id, Meeting.chat_id, Meeting.title, Meeting.start_utc, Meeting.end_utc,
+                       Meeting.status, MeetingParticipant.response) \
+        .select_from(MeetingParticipant) \
+        .join(Meeting, Meeting.id == MeetingParticipant.meeting_id) \
+        .where(MeetingParticipant.user_id == user_id,
+               Meeting.rrule.is_(None),
+               Meeting.start_utc > window_start - MAX_MEETING_LENGTH,
+               Meeting.start_utc < window_end,
+               Meeting.end_utc > window_start)
+    if after is not None:
+        # Row-value comparison spelled out, so both dialects bind the timestamps as DateTime
+        statement = statement.where(or_(Meeting.start_utc > after[0],
+                                        and_(Meeting.start_utc == after[0], Meeting.id > after[1])))
+    statement = statement.order_by(Meeting.start_utc, Meeting.id)
+    if limit is not None:
+        statement = statement.limit(limit)
+    for row in db.execute(statement):
+        start = _as_utc(row.start_utc)
+        yield CalendarEntry(row.id, row.chat_id, row.title, start, _as_utc(row.end_utc), row.status,
+                            row.response, False, start)
+
+
+def _series_occurrences(db: Session, user_id: int, window_start: datetime, window_end: datetime,
+                        after: Optional[Cursor]) -> Iterator[CalendarEntry]:
+    # Nothing starting before the cursor is returned, so later pages expand from there
+    if after is not None:
+        window_start = max(window_start, after[0])
+    # Series are few, so look them up first and probe the user's participant rows for each
+    series_ids = select(Meeting.id).where(
+        Meeting.rrule.isnot(None),
+        Meeting.start_utc < window_end,
+        or_(Meeting.series_end_utc.is_(None), Meeting.series_end_utc > window_start),
+    )
+    responses = dict(db.execute(
+        select(MeetingParticipant.meeting_id, MeetingParticipant.response)
+        .where(MeetingParticipant.user_id == user_id, MeetingParticipant.meeting_id.in_(series_ids))
+    ).all())
+    if not responses:
+        return
+    for occurrence in iter_occurrences(db, window_start, window_end, meeting_ids=list(responses)):
+        if after is not None and (occurrence.start_utc, occurrence.meeting_id) <= after:
+            continue
+        yield CalendarEntry(occurrence.meeting_id, occurrence.chat_id, occurrence.title, occurrence.start_utc,
+                            occurrence.end_utc, occurrence.status, responses[occurrence.meeting_id], True,
+                            occurrence.original_start_utc)
+
+
+def user_meetings(db: Session, user_id: int, window_start: datetime, window_end: datetime,
+                  after: Optional[Cursor] = None, limit: Optional[int] = None) -> Iterator[CalendarEntry]:
+    """The user's meetings and occurrences overlapping the window, ordered by (start_utc, meeting_id)"""
+    window_start, window_end = _as_utc(window_start), _as_utc(window_end)
+    streams = [
+        _single_meetings(db, user_id, window_start, window_end, after, limit),
+        _series_occurrences(db, user_id, window_start, window_end, after),
+    ]
+    merged = heapq.merge(*streams, key=lambda entry: (entry.start_utc, entry.meeting_id))
+    return islice(merged, limit) if limit is not None else merged
+
+
+def user_meetings_page(db: Session, user_id: int, window_start: datetime, window_end: datetime,
+                       limit: int, cursor: Optional[str] = None) -> Tuple[List[CalendarEntry], Optional[str]]:
+    """One page of user_meetings() and the cursor for the next one (None on the last page)"""
+    after = decode_cursor(cursor) if cursor else None
+    entries = list(user_meetings(db, user_id, window_start, window_end, after, limit + 1))
+    if len(entries) <= limit:
+        return entries, None
+    entries = entries[:limit]
+    return entries, encode_cursor(entries[-1])
+
+
+def free_busy(db: Session, user_id: int, window_start: datetime,
+              window_end: datetime) -> List[Tuple[datetime, datetime]]:
+    """Busy intervals in the window: the user's meetings merged where they overlap or touch"""
+    window_start, window_end = _as_utc(window_start), _as_utc(window_end)
+    busy: List[List[datetime]] = []
+    for entry in user_meetings(db, user_id, window_start, window_end):
+        if entry.status in FREE_STATUSES or entry.response in FREE_RESPONSES:
+            continue
+        start, end = max(entry.start_utc, window_start), min(entry.end_utc, window_end)
+        # Entries arrive ordered by start, so only the last interval can absorb this one
+        if busy and start <= busy[-1][1]:
+            busy[-1][1] = max(busy[-1][1], end)
+        else:
+            busy.append([start, end])
+    return [(start, end) for start, end in busy]
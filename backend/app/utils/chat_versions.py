@@ -0,0 +1,140 @@
+"""In-memory per-chat version stamps for conditional GETs.
+
+Each chat has a message version and a meeting version, bumped after any
+committed write that touches the chat's messages, meetings or meeting
+participants. Read endpoints turn the stamp into an ETag and answer a matching
+If-None-Match with 304 before running their queries, so an idle chat costs one
+dict lookup per poll. Tagged bodies are read where tagged_read_factory()
+says: a replica normally, but the primary while the resource's last change is
+younger than the replica lag bound, since a replica that hasn't replayed the
+write yet would pair the old body with the new ETag and leave the client on
+304s for data it never got.
+
+Stamps live in process memory and carry a per-process boot token: after a
+restart every old ETag simply misses. A process only sees its own commits:
+with several workers, or writes made by scripts, ETags can outlive the data
+they stand for, so conditional GETs need a single worker until the stamps
+move to shared storage.
+"""
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.database import (
+    REPLICA_HEALTH_INTERVAL_SECONDS, REPLICA_MAX_LAG_SECONDS, SessionLocal, read_session_factory,
+)
+from app.models import Message, Meeting, MeetingParticipant, MeetingException
+
+_BOOT = uuid.uuid4().hex[:8]
+_MESSAGES, _MEETINGS = 0, 1
+
+# A replica can be this far behind before a health check takes it out of rotation
+REPLICA_SETTLE_SECONDS = REPLICA_MAX_LAG_SECONDS + REPLICA_HEALTH_INTERVAL_SECONDS
+
+_versions: Dict[int, List[int]] = {}
+# time.time() of each chat's last message / meeting bump
+_changed_at: Dict[int, List[float]] = {}
+_lock = threading.Lock()
+
+
+def bump(chat_id: int, messages: bool = False, meetings: bool = False):
+    now = time.time()
+    with _lock:
+        version = _versions.setdefault(chat_id, [0, 0])
+        changed = _changed_at.setdefault(chat_id, [0.0, 0.0])
+        if messages:
+            version[_MESSAGES] += 1
+            changed[_MESSAGES] = now
+        if meetings:
+            version[_MEETINGS] += 1
+            changed[_MEETINGS] = now
+
+
+def _stamp(resource: str) -> int:
+    # Participants only change when a message arrives from a new member
+    return _MEETINGS if resource == "meetings" else _MESSAGES
+
+
+def chat_etag(chat_id: int, resource: str) -> str:
+    """ETag for one chat resource ("messages", "participants" or "meetings")"""
+    stamp = _versions.get(chat_id, (0, 0))[_stamp(resource)]
+    return f'W/"{_BOOT}-{resource}-{chat_id}-{stamp}"'
+
+
+def tagged_read_factory(chat_id: int, resource: str):
+    """Session factory for reading a tagged resource: the usual read routing, except the
+    primary while its last change may not have reached every replica yet"""
+    changed = _changed_at.get(chat_id)
+    if changed and time.time() - changed[_stamp(resource)] < REPLICA_SETTLE_SECONDS:
+        return SessionLocal
+    return read_session_factory()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: ignore W/ prefixes on either side
+    wanted = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == wanted for tag in if_none_match.split(","))
+
+
+def not_modified_or_tag(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Return a 304 if the client already has `etag`, else tag `response` and return None"""
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def _touched_chats(session: Session, obj):
+    """(chat_id, messages?, meetings?) for a flushed object, or None if it isn't chat data"""
+    if isinstance(obj, Message):
+        return obj.chat_id, True, False
+    if isinstance(obj, Meeting):
+        return obj.chat_id, False, True
+    if isinstance(obj, (MeetingParticipant, MeetingException)):
+        meeting = session.get(Meeting, obj.meeting_id) if obj.meeting_id else None
+        if meeting is not None:
+            return meeting.chat_id, False, True
+    return None
+
+
+def mark_changed(session: Session, chat_id: int, messages: bool = False, meetings: bool = False):
+    """Bump the chat's versions when this session commits.
+
+    Flushed ORM objects are picked up automatically; bulk Core statements
+    (UPDATE ... WHERE) bypass the flush and have to call this themselves.
+    """
+    flags = session.info.setdefault("chat_version_bumps", {}).setdefault(chat_id, [False, False])
+    flags[_MESSAGES] |= messages
+    flags[_MEETINGS] |= meetings
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_chat_writes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        touched = _touched_chats(session, obj)
+        if touched is None or touched[0] is None:
+            continue
+        chat_id, messages, meetings = touched
+        mark_changed(session, chat_id, messages, meetings)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_chat_writes(session):
+    # Only after commit: bumping earlier could tag pre-commit data with the new version
+    for chat_id, (messages, meetings) in session.info.pop("chat_version_bumps", {}).items():
+        bump(chat_id, messages=messages, meetings=meetings)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_chat_writes(session):
+    session.info.pop("chat_version_bumps", None)
@@ -0,0 +1,66 @@
+"""Bytes-level JSON for the large read endpoints.
+
+Rows are selected as plain columns, turned into dicts and encoded straight
+to bytes with orjson: no ORM identity map, no Pydantic model per row and no
+second encoding pass by FastAPI. Results are streamed, either as a chunked
+JSON array (the default, same shape as before) or as NDJSON when the client
+sends `Accept: application/x-ndjson` or `?format=ndjson`. Output is buffered
+into CHUNK_BYTES pieces so a 100k-row chat is a few hundred writes, and peak
+memory is one chunk plus the database driver's batch.
+"""
+from typing import Dict, Iterable, Iterator, Optional
+
+import orjson
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+
+NDJSON = "application/x-ndjson"
+CHUNK_BYTES = 64 * 1024
+
+# Rows fetched per database round trip while streaming (server-side cursor on Postgres)
+STREAM_BATCH_ROWS = 1000
+
+# Response headers worth keeping when a route swaps its Response for a stream
+_CARRIED_HEADERS = ("etag", "cache-control")
+
+
+def dumps(value) -> bytes:
+    return orjson.dumps(value)
+
+
+def wants_ndjson(request: Request) -> bool:
+    return request.query_params.get("format") == "ndjson" or NDJSON in request.headers.get("accept", "")
+
+
+def _chunked(pieces: Iterable[bytes]) -> Iterator[bytes]:
+    buffer = bytearray()
+    for piece in pieces:
+        buffer += piece
+        if len(buffer) >= CHUNK_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def iter_ndjson(rows: Iterable[Dict]) -> Iterator[bytes]:
+    return _chunked(orjson.dumps(row) + b"\n" for row in rows)
+
+
+def iter_json_array(rows: Iterable[Dict]) -> Iterator[bytes]:
+    def pieces():
+        yield b"["
+        for index, row in enumerate(rows):
+            yield (b"," if index else b"") + orjson.dumps(row)
+        yield b"]"
+    return _chunked(pieces())
+
+
+def stream_rows(request: Request, rows: Iterable[Dict], response: Optional[Response] = None) -> StreamingResponse:
+    """Stream rows as NDJSON or a JSON array, keeping the ETag/caching headers already set on `response`"""
+    headers = {}
+    if response is not None:
+        headers = {name: response.headers[name] for name in _CARRIED_HEADERS if name in response.headers}
+    if wants_ndjson(request):
+        return StreamingResponse(iter_ndjson(rows), media_type=NDJSON, headers=headers)
+    return StreamingResponse(iter_json_array(rows), media_type="application/json", headers=headers)
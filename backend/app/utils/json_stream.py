@@ -0,0 +1,82 @@
+"""Incremental parser for a JSON object arriving in streamed chunks.
+
+The LLM stages answer with one flat-ish JSON object. Instead of waiting for
+the whole completion, feed() reports each top-level field as soon as its value
+is complete, so a caller can act on e.g. "has_intent": false before the
+model has finished writing its reasoning. Leading text such as a ```json fence
+is skipped.
+"""
+import json
+from typing import Any, Dict
+
+
+class IncrementalJSONObjectParser:
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._segment_start = None
+        self._length = 0
+
+    def feed(self, chunk: str) -> Dict[str, Any]:
+        """Consume a chunk and return the top-level fields completed by it"""
+        completed = {}
+        if self.done or not chunk:
+            return completed
+
+        base = self._length
+        self._buffer.append(chunk)
+        self._length += len(chunk)
+        text = None
+
+        for offset, char in enumerate(chunk):
+            position = base + offset
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                    self._segment_start = position + 1
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    text = text if text is not None else "".join(self._buffer)
+                    completed.update(self._close_segment(text, position))
+                    self.done = True
+                    break
+            elif char == "," and self._depth == 1:
+                text = text if text is not None else "".join(self._buffer)
+                completed.update(self._close_segment(text, position))
+                self._segment_start = position + 1
+
+        self.fields.update(completed)
+        return completed
+
+    def _close_segment(self, text: str, end: int) -> Dict[str, Any]:
+        segment = text[self._segment_start:end].strip()
+        if not segment:
+            return {}
+        try:
+            return json.loads("{" + segment + "}")
+        except ValueError:
+            return {}
+
+    @property
+    def text(self) -> str:
+        return "".join(self._buffer)
@@ -0,0 +1,174 @@
+"""Structured, non-blocking logging.
+
+Log calls on the request path only enqueue a record; a QueueListener thread
+formats it as one JSON object per line and writes it to stdout. Every record
+carries the current request id and chat id (from context variables), and any
+`extra=` fields such as stage and duration_ms.
+
+Environment:
+    LOG_LEVEL                root level (default INFO)
+    LOG_LEVELS               per-logger overrides, e.g. "app.services=DEBUG,sqlalchemy.engine=WARNING"
+    LOG_FORMAT               json (default) or text
+    LOG_QUEUE_SIZE           max queued records before new ones are dropped (default 10000)
+    LOG_PAYLOAD_SAMPLE_RATE  fraction of verbose payloads (raw LLM output) to log (default 0.1)
+    LOG_PAYLOAD_MAX_CHARS    truncate sampled payloads to this length (default 2000)
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+chat_id_var: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("chat_id", default=None)
+
+PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.1"))
+PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "2000"))
+
+# Attributes every LogRecord has; anything else came from extra= and is emitted as a field
+_RESERVED = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "request_id", "chat_id"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def bind_chat_id(chat_id: Optional[int]):
+    """Attach a chat id to every record logged from the current context"""
+    return chat_id_var.set(chat_id)
+
+
+class ContextFilter(logging.Filter):
+    """Copy request/chat ids onto the record in the caller's context, before it is queued"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        record.chat_id = chat_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        if getattr(record, "chat_id", None) is not None:
+            entry["chat_id"] = record.chat_id
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the writer falls behind"""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+    def prepare(self, record):
+        # Keep extra= fields intact; the listener thread does the formatting
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _parse_levels(raw: str):
+    for item in raw.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            yield name.strip(), level.strip().upper()
+
+
+def configure_logging():
+    """Route the root logger through a queue to a background writer thread (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if os.getenv("LOG_FORMAT", "json").lower() == "text":
+        stream_handler.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s %(name)s [req=%(request_id)s chat=%(chat_id)s] %(message)s"
+        ))
+    else:
+        stream_handler.setFormatter(JsonFormatter())
+
+    queue_handler = _DroppingQueueHandler(queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000"))))
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    for name, level in _parse_levels(os.getenv("LOG_LEVELS", "")):
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def log_payload(logger: logging.Logger, message: str, payload: Any, **fields):
+    """Log a verbose payload (e.g. raw LLM output) at DEBUG for a sampled fraction of calls"""
+    if not logger.isEnabledFor(logging.DEBUG) or random.random() >= PAYLOAD_SAMPLE_RATE:
+        return
+    text = payload if isinstance(payload, str) else json.dumps(payload, default=str)
+    logger.debug(message, extra={"payload": text[:PAYLOAD_MAX_CHARS], **fields})
+
+
+class RequestContextMiddleware:
+    """Pure ASGI middleware assigning a request id (honouring X-Request-ID) to each request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", request_id.encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
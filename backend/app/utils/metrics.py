@@ -0,0 +1,208 @@
+"""Prometheus metrics for HTTP routes, the scheduling pipeline and external services"""
+import os
+import time
+from typing import Dict
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+
+# Buckets sized for LLM round trips (hundreds of ms to tens of seconds)
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+# Buckets sized for pool checkouts and other sub-millisecond waits
+FAST_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+
+SCHEDULING_STAGE_LATENCY = Histogram(
+    "scheduling_stage_duration_seconds",
+    "Duration of each scheduling pipeline stage",
+    ["stage"],
+    buckets=SLOW_BUCKETS,
+)
+
+LLM_CALL_LATENCY = Histogram(
+    "llm_call_duration_seconds",
+    "LLM completion latency by stage and outcome (success, json_error, fallback)",
+    ["stage", "outcome"],
+    buckets=SLOW_BUCKETS,
+)
+
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "LLM tokens consumed by stage and kind (prompt, completion)",
+    ["stage", "kind"],
+)
+
+LLM_STAGE_MODEL = Counter(
+    "llm_stage_model_total",
+    "Which model tier answered each scheduling stage",
+    ["stage", "model"],
+)
+
+LLM_ESCALATIONS = Counter(
+    "llm_escalations_total",
+    "Stage answers escalated to a stronger model, by reason (invalid, low_confidence)",
+    ["stage", "reason"],
+)
+
+SPECULATION_RUNS = Counter(
+    "scheduling_speculation_total",
+    "Speculative availability extractions by outcome (hit: intent positive, miss: cancelled)",
+    ["outcome"],
+)
+
+SPECULATION_WASTED_TOKENS = Counter(
+    "scheduling_speculation_wasted_tokens_total",
+    "Estimated tokens spent on speculative extractions that were cancelled",
+)
+
+SPECULATION_SAVED_SECONDS = Counter(
+    "scheduling_speculation_saved_seconds_total",
+    "Critical-path time saved by overlapping extraction with intent detection",
+)
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the database pool",
+    buckets=FAST_BUCKETS,
+)
+
+EMAIL_SEND_LATENCY = Histogram(
+    "email_send_duration_seconds",
+    "Email send latency by kind and outcome",
+    ["kind", "outcome"],
+    buckets=SLOW_BUCKETS,
+)
+
+LAZY_LOAD_LATENCY = Histogram(
+    "lazy_load_duration_seconds",
+    "Time to import and construct a deferred SDK or client on first use",
+    ["component"],
+    buckets=SLOW_BUCKETS,
+)
+
+PROMPT_MESSAGES = Counter(
+    "scheduling_prompt_messages_total",
+    "Chat messages kept in or dropped from LLM prompts by relevance selection",
+    ["outcome"],
+)
+
+AVAILABILITY_INDEX_LOOKUPS = Counter(
+    "availability_index_lookups_total",
+    "Per-chat availability index lookups by result (hit, miss, stale)",
+    ["result"],
+)
+
+STAND_IN_REQUESTS = Counter(
+    "stand_in_requests_total",
+    "Requests served by the record/replay/synthetic transports, by service, mode and match (exact, stage, miss)",
+    ["service", "mode", "match"],
+)
+
+OUTBOX_DELIVERIES = Counter(
+    "outbox_deliveries_total",
+    "Outbox delivery attempts by kind and outcome (sent, retry, dead, cancelled)",
+    ["kind", "outcome"],
+)
+
+OUTBOX_DELIVERY_DELAY = Histogram(
+    "outbox_delivery_delay_seconds",
+    "Time from a notification being queued to being sent",
+    ["kind"],
+    buckets=SLOW_BUCKETS,
+)
+
+PROFILES_CAPTURED = Counter(
+    "request_profiles_total",
+    "Requests profiled on demand, by trigger (header, sample)",
+    ["trigger"],
+)
+
+
+def record_llm_usage(stage: str, usage) -> None:
+    """Count prompt/completion tokens from an OpenAI usage object (may be None)"""
+    if usage is None:
+        return
+    LLM_TOKENS.labels(stage, "prompt").inc(getattr(usage, "prompt_tokens", 0) or 0)
+    LLM_TOKENS.labels(stage, "completion").inc(getattr(usage, "completion_tokens", 0) or 0)
+
+
+def render_metrics():
+    """Return (payload, content type) for the /metrics endpoint"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # Aggregate across uvicorn/gunicorn worker processes
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+# Full path template (router prefix included) by id() of every registered route;
+# routes live as long as the app, and aren't hashable themselves
+_ROUTE_TEMPLATES: Dict[int, str] = {}
+
+
+def register_route_templates(router, prefix: str = "") -> None:
+    """Remember the full path templates of a router's routes for route_label.
+
+    The route left in the request scope only knows its path within its router
+    (/meetings/{meeting_id}), not the prefix it was included under.
+    """
+    for route in router.routes:
+        path = getattr(route, "path", None)
+        if path:
+            _ROUTE_TEMPLATES[id(route)] = prefix + path
+
+
+def route_label(scope) -> str:
+    """Full route template for a request, so /api/meetings/1 and /api/meetings/2 share a series.
+
+    The label is root path + router prefix + route path, the form QUERY_BUDGETS
+    keys use.
+    """
+    route = scope.get("route")
+    path = _ROUTE_TEMPLATES.get(id(route)) or getattr(route, "path", None)
+    return scope.get("root_path", "") + path if path else "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request latency per route template.
+
+    Kept as a raw ASGI callable rather than BaseHTTPMiddleware so the
+    per-request cost on the polling hot path is a timer and one observe().
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_LATENCY.labels(scope["method"], route_label(scope), str(status_code)).observe(
+                time.perf_counter() - start
+            )
@@ -0,0 +1,408 @@
+"""On-demand profiling of single requests.
+
+A request is profiled when an admin (ADMIN_EMAILS) sends `X-Profile: 1`, or
+by sampling: PROFILE_SAMPLE_RATE of the requests under PROFILE_SAMPLE_PATHS.
+Everything else passes straight through; no sampler thread, task factory or
+statement log exists unless a profiled request is in flight.
+
+While a request is profiled, a sampler thread wakes every PROFILE_INTERVAL_MS
+and looks at each asyncio task the request owns (its own task plus any task
+it created, e.g. a streaming body or speculative extraction):
+
+  - a task running on the event loop contributes its real stack to both the
+    CPU and the wall-clock profile
+  - a suspended task contributes its chain of awaiting coroutines, ending in
+    an `[await ...]` frame, to the wall-clock profile only
+
+Work handed to threads (asyncio.to_thread, streamed generators) shows up as
+the await that waits for it. The SQL statements the request ran and the
+scheduling stages it went through (stage_timer) are recorded too.
+
+Artifacts go to PROFILE_DIR as <id>.json (timings, stages, SQL, summary) and
+<id>.cpu.folded / <id>.wall.folded: folded stacks, one `a;b;c count` line per
+stack, readable by flamegraph.pl, speedscope and inferno. The id is returned
+in the X-Profile-Id header; the newest PROFILE_KEEP profiles are kept and
+served by /api/admin/profiles.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import random
+import re
+import sys
+import sysconfig
+import threading
+import time
+import uuid
+import weakref
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.auth import ADMIN_EMAILS, verify_token
+from app.utils.log import request_id_var
+from app.utils.metrics import PROFILES_CAPTURED, route_label
+from app.utils.query_tracking import current_query_stats
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SAMPLE_PATHS = tuple(
+    path.strip() for path in os.getenv("PROFILE_SAMPLE_PATHS", "/api/schedule,/api/messages").split(",") if path.strip()
+)
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+# Sampler stops after this long; the rest of the request is still timed
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+# Sampled (not admin-requested) profiles running at once
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", "2"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+PROFILE_SQL_MAX_CHARS = 2000
+
+PROFILE_ID = re.compile(r"^\d{8}T\d{6}-[0-9a-f]{8}$")
+
+_active_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar(
+    "active_profile", default=None
+)
+_sampled_in_flight = 0
+_factories: Dict[asyncio.AbstractEventLoop, Tuple[object, int]] = {}
+
+_SITE_PACKAGES = re.compile(r".*[/\\](?:site|dist)-packages[/\\]")
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_STDLIB_DIR = sysconfig.get_paths()["stdlib"]
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if _SITE_PACKAGES.match(filename):
+        filename = _SITE_PACKAGES.sub("", filename)
+    elif filename.startswith((_BACKEND_DIR, _STDLIB_DIR)):
+        filename = os.path.relpath(filename, _BACKEND_DIR if filename.startswith(_BACKEND_DIR) else _STDLIB_DIR)
+    # Folded stacks are ';'-separated and end in ' <count>'
+    return f"{code.co_qualname} ({filename}:{code.co_firstlineno})".replace(";", ",")
+
+
+def record_span(name: str, start: float, duration: float):
+    """Add a named span (perf_counter start, seconds) to the profile of the current request, if any"""
+    profile = _active_profile.get()
+    if profile is not None:
+        profile.spans.append((name, start, duration))
+
+
+class RequestProfile:
+    """Samples and timings for one request"""
+
+    def __init__(self, trigger: str, loop: asyncio.AbstractEventLoop, root: asyncio.Task):
+        self.id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.trigger = trigger
+        self.loop = loop
+        self.tasks: "weakref.WeakSet[asyncio.Task]" = weakref.WeakSet([root])
+        self.loop_thread = threading.get_ident()
+        self.started_at = datetime.now(timezone.utc)
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.cpu: Counter = Counter()
+        self.wall: Counter = Counter()
+        self.ticks = 0
+        self.cpu_samples = 0
+        self.spans: List[Tuple[str, float, float]] = []
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_loop, name=f"profiler-{self.id}", daemon=True)
+
+    def start_sampling(self):
+        self._sampler.start()
+
+    def stop_sampling(self):
+        self.end = time.perf_counter()
+        self._stop.set()
+        self._sampler.join()
+
+    def _sample_loop(self):
+        interval = PROFILE_INTERVAL_MS / 1000
+        deadline = self.start + PROFILE_MAX_SECONDS
+        while not self._stop.wait(interval) and time.perf_counter() < deadline:
+            self.ticks += 1
+            running = asyncio.current_task(self.loop)
+            try:
+                tasks = list(self.tasks)
+            except RuntimeError:
+                # The loop thread added a task mid-copy; catch it next tick
+                continue
+            for task in tasks:
+                if task.done():
+                    continue
+                if task is running:
+                    stack = self._running_stack(task)
+                    if stack is not None:
+                        self.cpu[stack] += 1
+                        self.wall[stack] += 1
+                        self.cpu_samples += 1
+                else:
+                    self.wall[self._awaiting_stack(task)] += 1
+
+    def _running_stack(self, task: asyncio.Task) -> Optional[Tuple[str, ...]]:
+        frame = sys._current_frames().get(self.loop_thread)
+        # The task may have yielded while we looked; drop the sample rather than misattribute it
+        if frame is None or asyncio.current_task(self.loop) is not task:
+            return None
+        root = getattr(task.get_coro(), "cr_frame", None)
+        frames = []
+        while frame is not None:
+            frames.append(frame.f_code)
+            if frame is root:
+                break
+            frame = frame.f_back
+        return tuple(_frame_label(code) for code in reversed(frames))
+
+    @staticmethod
+    def _awaiting_stack(task: asyncio.Task) -> Tuple[str, ...]:
+        labels = []
+        awaitable = task.get_coro()
+        while awaitable is not None:
+            frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None) \
+                or getattr(awaitable, "ag_frame", None)
+            if frame is None:
+                break
+            labels.append(_frame_label(frame.f_code))
+            awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None) \
+                or getattr(awaitable, "ag_await", None)
+        if awaitable is None:
+            # Nothing awaited: the task is ready and waiting for its turn on the loop
+            labels.append("[runnable]")
+        elif isinstance(awaitable, asyncio.Task):
+            labels.append(f"[await task {getattr(awaitable.get_coro(), '__qualname__', awaitable.get_name())}]")
+        else:
+            labels.append(f"[await {type(awaitable).__name__}]")
+        return tuple(labels)
+
+    def summary(self, scope, status_code: int, stats) -> Dict:
+        end = self.end or time.perf_counter()
+        interval = PROFILE_INTERVAL_MS / 1000
+        statements = (stats.statements or []) if stats is not None else []
+        total = end - self.start
+        on_loop = self.cpu_samples * interval
+        return {
+            "id": self.id,
+            "trigger": self.trigger,
+            "request_id": request_id_var.get(),
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": route_label(scope),
+            "status": status_code,
+            "started_at": self.started_at.isoformat(),
+            "interval_ms": PROFILE_INTERVAL_MS,
+            "samples": {"cpu": self.cpu_samples, "wall": sum(self.wall.values()), "ticks": self.ticks},
+            "wall_ms": {
+                "total": round(total * 1000, 2),
+                # Estimated from samples: time one of the request's tasks held the event loop
+                "on_event_loop": round(min(on_loop, total) * 1000, 2),
+                "awaiting": round(max(0.0, total - on_loop) * 1000, 2),
+                "sql": round(sum(duration for _, duration, _ in statements) * 1000, 2),
+            },
+            "stages": [
+                {"name": name, "start_ms": round((start - self.start) * 1000, 2), "duration_ms": round(duration * 1000, 2)}
+                for name, start, duration in sorted(self.spans, key=lambda span: span[1])
+            ],
+            "sql": [
+                {
+                    "start_ms": round((finished - duration - self.start) * 1000, 2),
+                    "duration_ms": round(duration * 1000, 3),
+                    "statement": statement[:PROFILE_SQL_MAX_CHARS],
+                }
+                for finished, duration, statement in statements
+            ],
+        }
+
+
+# --- Task tracking: tasks created inside a profiled request belong to it ---
+
+def _install_task_factory(loop: asyncio.AbstractEventLoop):
+    if loop in _factories:
+        previous, users = _factories[loop]
+        _factories[loop] = (previous, users + 1)
+        return
+    previous = loop.get_task_factory()
+
+    def factory(loop, coro, **kwargs):
+        task = previous(loop, coro, **kwargs) if previous else asyncio.Task(coro, loop=loop, **kwargs)
+        context = kwargs.get("context")
+        profile = context.get(_active_profile) if context is not None else _active_profile.get()
+        if profile is not None:
+            profile.tasks.add(task)
+        return task
+
+    loop.set_task_factory(factory)
+    _factories[loop] = (previous, 1)
+
+
+def _uninstall_task_factory(loop: asyncio.AbstractEventLoop):
+    previous, users = _factories[loop]
+    if users > 1:
+        _factories[loop] = (previous, users - 1)
+        return
+    del _factories[loop]
+    loop.set_task_factory(previous)
+
+
+# --- Artifacts ---
+
+def _folded(stacks: Counter) -> str:
+    return "".join(f"{';'.join(stack)} {count}\n" for stack, count in stacks.most_common())
+
+
+def save_profile(profile: RequestProfile, summary: Dict, directory: str = PROFILE_DIR):
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, profile.id)
+    with open(base + ".cpu.folded", "w") as f:
+        f.write(_folded(profile.cpu))
+    with open(base + ".wall.folded", "w") as f:
+        f.write(_folded(profile.wall))
+    # Summary last: list_profiles() only shows profiles whose files are complete
+    with open(base + ".json", "w") as f:
+        json.dump(summary, f, indent=1)
+    _prune(directory)
+
+
+def _prune(directory: str, keep: int = PROFILE_KEEP):
+    ids = sorted(name[:-len(".json")] for name in os.listdir(directory) if name.endswith(".json"))
+    for profile_id in ids[:max(0, len(ids) - keep)]:
+        for suffix in (".json", ".cpu.folded", ".wall.folded"):
+            try:
+                os.remove(os.path.join(directory, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(directory: str = PROFILE_DIR, limit: int = 50) -> List[Dict]:
+    """Newest profiles first, without their SQL and stage detail"""
+    if not os.path.isdir(directory):
+        return []
+    ids = sorted((name[:-len(".json")] for name in os.listdir(directory) if name.endswith(".json")), reverse=True)
+    profiles = []
+    for profile_id in ids[:limit]:
+        summary = load_profile(profile_id, directory)
+        if summary is not None:
+            profiles.append({key: value for key, value in summary.items() if key not in ("sql", "stages")})
+    return profiles
+
+
+def load_profile(profile_id: str, directory: str = PROFILE_DIR) -> Optional[Dict]:
+    if not PROFILE_ID.match(profile_id):
+        return None
+    try:
+        with open(os.path.join(directory, profile_id + ".json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def load_folded(profile_id: str, kind: str, directory: str = PROFILE_DIR) -> Optional[str]:
+    """A profile's folded stacks; kind is "cpu" or "wall" """
+    if not PROFILE_ID.match(profile_id) or kind not in ("cpu", "wall"):
+        return None
+    try:
+        with open(os.path.join(directory, f"{profile_id}.{kind}.folded")) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+# --- Middleware ---
+
+def _requested_by_admin(headers) -> bool:
+    """X-Profile set by a caller whose bearer token names an admin (no DB lookup)"""
+    requested = False
+    token = None
+    for name, value in headers:
+        if name == b"x-profile":
+            requested = value.strip() not in (b"", b"0", b"false")
+        elif name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            token = token.strip() if scheme.lower() == "bearer" else None
+    if not requested or not token:
+        return False
+    try:
+        payload = verify_token(token)
+    except Exception:
+        return False
+    email = (payload or {}).get("sub")
+    return bool(email) and email.lower() in ADMIN_EMAILS
+
+
+def _trigger(scope) -> Optional[str]:
+    if _requested_by_admin(scope.get("headers", [])):
+        return "header"
+    if PROFILE_SAMPLE_RATE > 0 and scope["path"].startswith(PROFILE_SAMPLE_PATHS) \
+            and _sampled_in_flight < PROFILE_MAX_CONCURRENT and random.random() < PROFILE_SAMPLE_RATE:
+        return "sample"
+    return None
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware profiling the requests picked by header or sampling.
+
+    Must sit inside QueryCountMiddleware, whose per-request stats carry the SQL log.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trigger = _trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+        await self._profiled(scope, receive, send, trigger)
+
+    async def _profiled(self, scope, receive, send, trigger: str):
+        global _sampled_in_flight
+        loop = asyncio.get_running_loop()
+        profile = RequestProfile(trigger, loop, asyncio.current_task())
+        stats = current_query_stats()
+        if stats is not None:
+            stats.statements = []
+        if trigger == "sample":
+            _sampled_in_flight += 1
+        token = _active_profile.set(profile)
+        _install_task_factory(loop)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile.id.encode()))
+                message["headers"] = headers
+            await send(message)
+
+        profile.start_sampling()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            await asyncio.to_thread(profile.stop_sampling)
+            _uninstall_task_factory(loop)
+            _active_profile.reset(token)
+            if trigger == "sample":
+                _sampled_in_flight -= 1
+            summary = profile.summary(scope, status_code, stats)
+            if stats is not None:
+                stats.statements = None
+            PROFILES_CAPTURED.labels(trigger).inc()
+            try:
+                await asyncio.to_thread(save_profile, profile, summary)
+                logger.info("Request profiled", extra={
+                    "profile_id": profile.id, "trigger": trigger, "route": summary["route"],
+                    "duration_ms": summary["wall_ms"]["total"],
+                })
+            except OSError as e:
+                logger.error("Could not save request profile", extra={"profile_id": profile.id, "error": str(e)})
@@ -0,0 +1,209 @@
+"""Per-request SQL query counting and N+1 detection.
+
+Hooks SQLAlchemy cursor events on the engine and attributes every statement
+to the request currently being served (via a context variable). In debug mode
+the totals are returned as X-DB-Query-Count / X-DB-Time-Ms response headers;
+they are always recorded as Prometheus metrics.
+"""
+import contextvars
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from prometheus_client import Counter as MetricCounter, Histogram
+from sqlalchemy import event
+
+from app.utils.metrics import FAST_BUCKETS, route_label
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DEBUG = os.getenv("DEBUG", "False").lower() in ("1", "true", "yes")
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "20"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request",
+    "Number of SQL statements executed per request",
+    ["route"],
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds",
+    "Total time spent executing SQL per request",
+    ["route"],
+    buckets=FAST_BUCKETS,
+)
+
+DB_QUERY_BUDGET_EXCEEDED = MetricCounter(
+    "db_query_budget_exceeded_total",
+    "Requests that ran more statements than their query budget",
+    ["route"],
+)
+
+DB_N_PLUS_ONE = MetricCounter(
+    "db_n_plus_one_total",
+    "Requests that repeated the same statement shape N_PLUS_ONE_THRESHOLD times or more",
+    ["route"],
+)
+
+_IN_LIST = re.compile(r"IN \((?:\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*,?)+\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _parse_budgets(raw: str) -> Dict[str, int]:
+    """Parse QUERY_BUDGETS, e.g. "/api/meetings=5,/api/messages=4" """
+    budgets = {}
+    for item in raw.split(","):
+        if "=" in item:
+            route, limit = item.rsplit("=", 1)
+            budgets[route.strip()] = int(limit)
+    return budgets
+
+
+ROUTE_BUDGETS = _parse_budgets(os.getenv("QUERY_BUDGETS", ""))
+
+
+def statement_shape(statement: str) -> str:
+    """Normalise a statement so repeated executions with different IN-lists compare equal"""
+    return _IN_LIST.sub("IN (...)", _WHITESPACE.sub(" ", statement).strip())
+
+
+class QueryStats:
+    """Statements executed within one request (or one counting block)"""
+
+    __slots__ = ("count", "duration", "shapes", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes: Counter = Counter()
+        # (finished at perf_counter, duration, statement); only kept while the request is profiled
+        self.statements: Optional[List[Tuple[float, float, str]]] = None
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        self.shapes[statement_shape(statement)] += 1
+        if self.statements is not None:
+            self.statements.append((time.perf_counter(), duration, statement))
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[Tuple[str, int]]:
+        """Statement shapes executed at least `threshold` times, most frequent first"""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+_request_stats: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar("query_stats", default=None)
+_collectors: List[QueryStats] = []
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _request_stats.get()
+
+
+def install_query_hooks(engine):
+    """Attach cursor event listeners that feed per-request stats and active collectors"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _request_stats.get() is not None or _collectors:
+            conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start")
+        if not starts:
+            return
+        duration = time.perf_counter() - starts.pop()
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.record(statement, duration)
+        for collector in _collectors:
+            collector.record(statement, duration)
+
+
+@contextmanager
+def count_queries():
+    """Count every statement run on the engine inside the block, from any thread"""
+    stats = QueryStats()
+    _collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        _collectors.remove(stats)
+
+
+@contextmanager
+def assert_max_queries(limit: int, n_plus_one_threshold: int = N_PLUS_ONE_THRESHOLD):
+    """Fail when the block runs more than `limit` statements or repeats a statement shape.
+
+    Example:
+        with assert_max_queries(3):
+            client.get("/api/meetings", params={"chat_id": 1}, headers=auth)
+    """
+    with count_queries() as stats:
+        yield stats
+    problems = []
+    if stats.count > limit:
+        problems.append(f"expected at most {limit} queries, ran {stats.count}")
+    for shape, n in stats.repeated(n_plus_one_threshold):
+        problems.append(f"possible N+1, statement ran {n} times: {shape}")
+    if problems:
+        statements = "\n".join(f"  {n}x {shape}" for shape, n in stats.shapes.most_common())
+        raise AssertionError("; ".join(problems) + "\nStatements:\n" + statements)
+
+
+class QueryCountMiddleware:
+    """Pure ASGI middleware that tracks SQL statements per request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _request_stats.set(stats)
+
+        async def send_wrapper(message):
+            if DEBUG and message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-query-count", str(stats.count).encode()))
+                headers.append((b"x-db-time-ms", f"{stats.duration * 1000:.2f}".encode()))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            self._report(scope, stats)
+
+    def _report(self, scope, stats: QueryStats):
+        route = route_label(scope)
+        DB_QUERIES_PER_REQUEST.labels(route).observe(stats.count)
+        DB_TIME_PER_REQUEST.labels(route).observe(stats.duration)
+
+        budget = ROUTE_BUDGETS.get(route, QUERY_BUDGET)
+        if stats.count > budget:
+            DB_QUERY_BUDGET_EXCEEDED.labels(route).inc()
+            logger.warning("Query budget exceeded", extra={
+                "method": scope["method"], "route": route, "queries": stats.count, "budget": budget
+            })
+
+        repeated = stats.repeated()
+        if repeated:
+            DB_N_PLUS_ONE.labels(route).inc()
+            shape, n = repeated[0]
+            logger.warning("Possible N+1 query pattern", extra={
+                "method": scope["method"], "route": route, "repeats": n, "statement": shape[:200]
+            })
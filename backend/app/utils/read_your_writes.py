@@ -0,0 +1,87 @@
+"""Read-your-writes pinning for read-replica routing.
+
+After a client's successful write (any non-GET/HEAD/OPTIONS request that
+didn't fail), the response carries a pin: an `X-DB-Pin` header and a
+`db_pin` cookie holding the time until which that client's reads go to the
+primary. Clients echo it back (the cookie does this for same-site requests;
+the frontend and API clients send the header, which CORS exposes), and
+get_read_db() skips the replicas while it is valid, so a user never reads a replica that hasn't caught up with their
+own write yet. The pin is stateless, so it works across worker processes.
+"""
+import contextvars
+import os
+import time
+from http.cookies import SimpleCookie
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PIN_SECONDS = float(os.getenv("REPLICA_PIN_SECONDS", "5"))
+PIN_HEADER = b"x-db-pin"
+PIN_COOKIE = "db_pin"
+
+_SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_pinned_until: contextvars.ContextVar[float] = contextvars.ContextVar("db_pinned_until", default=0.0)
+
+
+def pinned_to_primary() -> bool:
+    return time.time() < _pinned_until.get()
+
+
+def pin_to_primary(seconds: float = PIN_SECONDS):
+    """Pin the rest of the current request to the primary"""
+    _pinned_until.set(max(_pinned_until.get(), time.time() + seconds))
+
+
+def _parse_pin(value: str) -> float:
+    try:
+        until = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    # A client can't pin itself for longer than one window
+    return until if until <= time.time() + PIN_SECONDS else 0.0
+
+
+def _request_pin(headers) -> float:
+    until = 0.0
+    for name, value in headers:
+        if name == PIN_HEADER:
+            until = max(until, _parse_pin(value.decode("latin-1")))
+        elif name == b"cookie":
+            morsel = SimpleCookie(value.decode("latin-1")).get(PIN_COOKIE)
+            if morsel is not None:
+                until = max(until, _parse_pin(morsel.value))
+    return until
+
+
+class PrimaryPinMiddleware:
+    """Pure ASGI middleware reading the client's pin and issuing a new one after writes"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        is_write = scope["method"] not in _SAFE_METHODS
+        token = _pinned_until.set(_request_pin(scope.get("headers", [])))
+
+        async def send_wrapper(message):
+            if is_write and message["type"] == "http.response.start" and message["status"] < 400:
+                until = f"{time.time() + PIN_SECONDS:.3f}"
+                headers = list(message.get("headers", []))
+                headers.append((PIN_HEADER, until.encode("latin-1")))
+                headers.append((b"set-cookie", (
+                    f"{PIN_COOKIE}={until}; Max-Age={int(PIN_SECONDS) + 1}; Path=/; HttpOnly; SameSite=Lax"
+                ).encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _pinned_until.reset(token)
@@ -1,11 +1,12 @@
 from sqlalchemy.orm import Session
-from app.database import SessionLocal, engine, Base
+from app.database import SessionLocal
+from app.migrate import migrate
 from app.models import User, Chat, Message
 from datetime import datetime
 
 def init_database():
     # Create tables
-    Base.metadata.create_all(bind=engine)
+    migrate()
     
     # Create session
     db = SessionLocal()
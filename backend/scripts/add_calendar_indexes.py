@@ -0,0 +1,37 @@
+"""
+Create the indexes behind GET /api/users/me/meetings on an existing database.
+
+    meeting_participants (user_id, meeting_id)   a user's meetings, index-only on Postgres
+    meetings (start_utc, id)                     window bounds and keyset page order
+    meetings (start_utc) WHERE rrule IS NOT NULL recurring series overlapping the window
+
+create_all only adds indexes together with new tables, so run this once
+after upgrading. Safe to run more than once.
+
+Usage:
+    cd backend
+    python scripts/add_calendar_indexes.py
+"""
+
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+INDEXES = ("meeting_participants_user_meeting_idx", "meetings_start_utc_idx", "meetings_series_start_idx")
+
+
+def main():
+    from app.database import engine
+    from app.models import Meeting, MeetingParticipant
+
+    for table in (MeetingParticipant.__table__, Meeting.__table__):
+        for index in table.indexes:
+            if index.name in INDEXES:
+                index.create(bind=engine, checkfirst=True)
+                print(f"Index ready: {index.name}")
+
+
+if __name__ == "__main__":
+    main()
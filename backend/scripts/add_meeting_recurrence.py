@@ -0,0 +1,43 @@
+"""
+Add the recurrence columns to an existing meetings table.
+
+New databases get them from `python -m app.migrate`; create_all does not alter
+tables that already exist, so run this once after upgrading. It also creates
+the meeting_exceptions table. Safe to run more than once.
+
+Usage:
+    cd backend
+    python scripts/add_meeting_recurrence.py
+"""
+
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+COLUMNS = {
+    "rrule": "TEXT",
+    "timezone": "VARCHAR",
+    "series_end_utc": "TIMESTAMP WITH TIME ZONE",
+}
+
+
+def main():
+    from sqlalchemy import inspect, text
+    from app.database import Base, engine
+    from app.models import MeetingException
+
+    existing = {column["name"] for column in inspect(engine).get_columns("meetings")}
+    added = []
+    with engine.begin() as connection:
+        for name, column_type in COLUMNS.items():
+            if name not in existing:
+                connection.execute(text(f"ALTER TABLE meetings ADD COLUMN {name} {column_type}"))
+                added.append(name)
+    Base.metadata.create_all(bind=engine, tables=[MeetingException.__table__])
+    print(f"meetings columns added: {', '.join(added) or 'none (already present)'}; meeting_exceptions ready")
+
+
+if __name__ == "__main__":
+    main()
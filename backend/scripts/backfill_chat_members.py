@@ -0,0 +1,76 @@
+"""
+Rebuild the chat_members table from existing messages.
+
+The API keeps chat_members up to date on every message insert; run this once
+after upgrading a database that already has messages (or any time the table
+is suspected to be out of sync). Supabase installs get the same backfill from
+supabase/schemas/06_chat_members.sql.
+
+Usage:
+    cd backend
+    python scripts/backfill_chat_members.py
+    python scripts/backfill_chat_members.py --chat-id 42
+"""
+
+import argparse
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Rebuild chat_members from the messages table")
+    parser.add_argument("--chat-id", type=int, default=None, help="only rebuild this chat")
+    return parser.parse_args()
+
+
+def backfill(db, chat_id=None) -> int:
+    from sqlalchemy import func
+    from app.models import ChatMember, Message
+
+    rows = db.query(
+        Message.chat_id,
+        Message.user_id,
+        func.min(Message.created_at),
+        func.max(Message.created_at),
+        func.count(Message.id),
+    ).group_by(Message.chat_id, Message.user_id)
+    members = db.query(ChatMember)
+    if chat_id is not None:
+        rows = rows.filter(Message.chat_id == chat_id)
+        members = members.filter(ChatMember.chat_id == chat_id)
+
+    members.delete(synchronize_session=False)
+    count = 0
+    for row_chat_id, user_id, first_at, last_at, message_count in rows.all():
+        db.add(ChatMember(
+            chat_id=row_chat_id,
+            user_id=user_id,
+            first_message_at=first_at,
+            last_message_at=last_at,
+            message_count=message_count,
+        ))
+        count += 1
+    db.commit()
+    return count
+
+
+def main():
+    args = parse_args()
+
+    from app.database import Base, SessionLocal, engine
+    from app.models import ChatMember
+
+    Base.metadata.create_all(bind=engine, tables=[ChatMember.__table__])
+    db = SessionLocal()
+    try:
+        count = backfill(db, args.chat_id)
+    finally:
+        db.close()
+    print(f"chat_members rebuilt: {count} rows")
+
+
+if __name__ == "__main__":
+    main()
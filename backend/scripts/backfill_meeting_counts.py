@@ -0,0 +1,57 @@
+"""
+Add and fill the attendance counters on meetings.
+
+participant_count, confirmed_count and declined_count are kept up to date by
+the RSVP endpoints; run this once after upgrading a database that already has
+meetings (create_all does not alter existing tables), or any time the counters
+are suspected to be out of sync. Safe to run more than once.
+
+Usage:
+    cd backend
+    python scripts/backfill_meeting_counts.py
+    python scripts/backfill_meeting_counts.py --meeting-id 42
+"""
+
+import argparse
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+COLUMNS = ("participant_count", "confirmed_count", "declined_count")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Recompute meeting attendance counters")
+    parser.add_argument("--meeting-id", type=int, default=None, help="only recount this meeting")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    from sqlalchemy import inspect, text
+    from app.database import SessionLocal, engine
+    from app.models import MeetingParticipant
+    from app.services.rsvp import recount
+
+    existing = {column["name"] for column in inspect(engine).get_columns("meetings")}
+    with engine.begin() as connection:
+        for name in COLUMNS:
+            if name not in existing:
+                connection.execute(text(f"ALTER TABLE meetings ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0"))
+    # (meeting_id, user_id) lookups used by the set-based RSVP updates
+    for index in MeetingParticipant.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+    db = SessionLocal()
+    try:
+        updated = recount(db, [args.meeting_id] if args.meeting_id is not None else None)
+    finally:
+        db.close()
+    print(f"Meeting counters recomputed: {updated} meetings")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Create (or rebuild) the full-text search index on an existing messages table.
+
+New databases get the index from create_all; run this once after upgrading a
+database that already has messages. Postgres gets the generated search_vector
+column and its GIN index, SQLite the messages_fts FTS5 table, triggers and a
+rebuild from the current messages.
+
+Usage:
+    cd backend
+    python scripts/build_search_index.py
+"""
+
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def main():
+    from sqlalchemy import text
+    from app.database import engine
+    from app.models.message import POSTGRES_SEARCH_DDL, SQLITE_SEARCH_DDL
+
+    dialect = engine.dialect.name
+    if dialect == "postgresql":
+        statements = POSTGRES_SEARCH_DDL
+    elif dialect == "sqlite":
+        statements = SQLITE_SEARCH_DDL + ["INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')"]
+    else:
+        print(f"No full-text index for {dialect}; search falls back to LIKE")
+        return
+
+    with engine.begin() as connection:
+        for statement in statements:
+            connection.execute(text(statement))
+    print(f"Search index ready ({dialect})")
+
+
+if __name__ == "__main__":
+    main()
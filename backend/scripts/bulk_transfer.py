@@ -0,0 +1,98 @@
+"""
+Export chats, messages and meetings to a file, or import such a file.
+
+Exports are gzip-compressed NDJSON (every entity, importable) or CSV (one
+entity, for analysis), written as they are read, so memory stays flat for
+chats of any size. Imports give every row a new id and match users by email;
+imported users have no password until they reset it.
+
+Usage:
+    cd backend
+    python scripts/bulk_transfer.py export backup.ndjson.gz
+    python scripts/bulk_transfer.py export chat7.ndjson.gz --chat-id 7
+    python scripts/bulk_transfer.py export messages.csv.gz --format csv --entity messages
+    python scripts/bulk_transfer.py export - | ssh other-host ...   # "-" is stdout
+    python scripts/bulk_transfer.py import backup.ndjson.gz --batch-rows 10000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+READ_BYTES = 1024 * 1024
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Bulk export and import")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="write an export file")
+    export.add_argument("path", help='output file, or "-" for stdout')
+    export.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    export.add_argument("--entity", default=None, help="CSV only: which table to export")
+    export.add_argument("--chat-id", dest="chat_ids", type=int, action="append", default=None,
+                        help="only this chat (repeatable)")
+    load = commands.add_parser("import", help="load an NDJSON export (gzip or plain)")
+    load.add_argument("path", help='input file, or "-" for stdin')
+    load.add_argument("--batch-rows", type=int, default=None, help="rows per insert (default IMPORT_BATCH_ROWS)")
+    return parser.parse_args()
+
+
+def read_chunks(stream):
+    while True:
+        chunk = stream.read(READ_BYTES)
+        if not chunk:
+            return
+        yield chunk
+
+
+def main():
+    args = parse_args()
+
+    from app.database import SessionLocal
+    from app.services import bulk_transfer
+
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        if args.command == "export":
+            if args.format == "csv":
+                if args.entity not in bulk_transfer.ENTITIES:
+                    sys.exit(f"--entity must be one of {', '.join(bulk_transfer.EXPORT_ORDER)}")
+                chunks = bulk_transfer.export_csv_gz(db, args.entity, args.chat_ids)
+            else:
+                chunks = bulk_transfer.export_ndjson_gz(db, args.chat_ids)
+            out = sys.stdout.buffer if args.path == "-" else open(args.path, "wb")
+            written = 0
+            try:
+                for chunk in chunks:
+                    out.write(chunk)
+                    written += len(chunk)
+            finally:
+                if out is not sys.stdout.buffer:
+                    out.close()
+            print(f"Exported {written / 1e6:.1f} MB in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        else:
+            source = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+            try:
+                counts = bulk_transfer.import_records(
+                    db, read_chunks(source), args.batch_rows or bulk_transfer.IMPORT_BATCH_ROWS
+                )
+            except bulk_transfer.BulkImportError as e:
+                kept = ", ".join(map(str, e.chat_ids)) or "none"
+                sys.exit(f"Import failed at {e} (chats already imported: {kept})")
+            finally:
+                if source is not sys.stdin.buffer:
+                    source.close()
+            for name, count in sorted(counts.items()):
+                print(f"{name:<20} {count}")
+            print(f"Imported in {time.perf_counter() - started:.1f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
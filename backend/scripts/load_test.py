@@ -0,0 +1,304 @@
+"""
+Load-testing harness for the PropVivo Meeting Scheduler API.
+
+Simulates N concurrent chat users against app.main:app running in-process.
+Every simulated user logs in, polls /api/messages the way frontend/static/app.js
+does, posts messages and occasionally triggers /api/schedule. OpenAI and
+SendGrid are replaced by app.services.transports stand-ins (synthetic answers
+with configurable latency, or a recorded cassette), so the run needs no
+network access or API keys.
+
+Usage:
+    cd backend
+    python scripts/load_test.py --users 50 --duration 60
+    python scripts/load_test.py --users 200 --llm-latency 2.0 --schedule-probability 0.05
+    python scripts/load_test.py --users 50 --transport replay --cassette-dir cassettes
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+LOADTEST_PASSWORD = "loadtest-password"
+
+CHATTER = [
+    "Morning everyone!",
+    "Did anyone look at the latest designs?",
+    "I'll push the fix after lunch.",
+    "Thanks, that helps a lot.",
+    "Can someone review my PR?",
+]
+
+AVAILABILITY = [
+    "Let's meet this week to discuss the project timeline.",
+    "I'm free Thursday 2-5 PM IST and Friday morning.",
+    "Thursday after 4 works for me; Friday I'm out of office.",
+    "Thursday 4-5 PM IST works perfectly for me!",
+    "Can we schedule a quick sync up tomorrow?",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Drive app.main:app with simulated chat users")
+    parser.add_argument("--users", type=int, default=20, help="number of concurrent simulated users")
+    parser.add_argument("--chats", type=int, default=4, help="number of chats the users are spread across")
+    parser.add_argument("--duration", type=float, default=30.0, help="test duration in seconds")
+    parser.add_argument("--poll-interval", type=float, default=5.0, help="seconds between message polls (app.js uses 5)")
+    parser.add_argument("--message-interval", type=float, default=10.0, help="mean seconds between posted messages per user")
+    parser.add_argument("--schedule-probability", type=float, default=0.02,
+                        help="probability that a posted message is followed by /api/schedule")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="mean latency of a stand-in LLM completion (s)")
+    parser.add_argument("--email-latency", type=float, default=0.2, help="mean latency of a stand-in email send (s)")
+    parser.add_argument("--transport", choices=("synthetic", "replay"), default="synthetic",
+                        help="generate LLM/email answers, or replay a recorded cassette with its recorded latency")
+    parser.add_argument("--cassette-dir", default=None,
+                        help="cassettes to replay (default TRANSPORT_CASSETTE_DIR); record them with LLM_TRANSPORT=record")
+    parser.add_argument("--database-url", default=os.getenv("LOADTEST_DATABASE_URL", "sqlite:///./loadtest.db"),
+                        help="database used for the run (seeded on start)")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for reproducible runs")
+    parser.add_argument("--json", dest="json_path", default=None, help="also write the report to this JSON file")
+    return parser.parse_args()
+
+
+# --- Stand-ins for external services ---
+
+def install_stand_ins(llm_latency: float, email_latency: float, transport: str = "synthetic",
+                      cassette_dir: Optional[str] = None):
+    """Swap OpenAI and SendGrid for app.services.transports stand-ins.
+
+    Synthetic answers take uniform(0.5, 1.5) x the given mean latency; replayed
+    ones take as long as they did when they were recorded.
+    """
+    from app.services.clients import set_clients
+    from app.services.transports import (
+        Cassette, Latency, ReplayOpenAI, ReplaySendGrid, SyntheticOpenAI, SyntheticSendGrid, cassette_path,
+    )
+
+    if transport == "replay":
+        set_clients(
+            openai=ReplayOpenAI(Cassette(cassette_path("openai", cassette_dir)), Latency("recorded")),
+            sendgrid=ReplaySendGrid(Cassette(cassette_path("sendgrid", cassette_dir)), Latency("recorded")),
+        )
+        return
+    set_clients(
+        openai=SyntheticOpenAI(Latency(f"uniform:{0.5 * llm_latency},{1.5 * llm_latency}")),
+        sendgrid=SyntheticSendGrid(Latency(f"uniform:{0.5 * email_latency},{1.5 * email_latency}")),
+    )
+
+
+# --- Seeding ---
+
+def seed_database(n_users: int, n_chats: int) -> List[Dict]:
+    """Create load-test users and chats, returning one profile per simulated user"""
+    from app.database import SessionLocal
+    from app.migrate import migrate
+    from app.models import User, Chat, Message
+    from app.auth import get_password_hash
+
+    migrate()
+    db = SessionLocal()
+    try:
+        chats = db.query(Chat).filter(Chat.title.like("Load Test Chat %")).order_by(Chat.id).all()
+        while len(chats) < n_chats:
+            chat = Chat(title=f"Load Test Chat {len(chats) + 1}")
+            db.add(chat)
+            db.commit()
+            chats.append(chat)
+
+        hashed_password = get_password_hash(LOADTEST_PASSWORD)
+        profiles = []
+        for i in range(n_users):
+            email = f"loadtest-{i}@example.com"
+            user = db.query(User).filter(User.email == email).first()
+            if not user:
+                user = User(name=f"Load User {i}", email=email, hashed_password=hashed_password, is_active=True)
+                db.add(user)
+                db.commit()
+            chat = chats[i % n_chats]
+            # Every user says something so they count as a chat participant
+            if not db.query(Message).filter(Message.chat_id == chat.id, Message.user_id == user.id).first():
+                db.add(Message(chat_id=chat.id, user_id=user.id, text=random.choice(AVAILABILITY)))
+                db.commit()
+            profiles.append({"email": email, "user_id": user.id, "chat_id": chat.id})
+        return profiles
+    finally:
+        db.close()
+
+
+# --- Measurement ---
+
+class Stats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.loop_lag: List[float] = []
+
+    def record(self, route: str, seconds: float, ok: bool):
+        self.latencies[route].append(seconds)
+        if not ok:
+            self.errors[route] += 1
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def monitor_loop_lag(stats: Stats, stop: asyncio.Event, interval: float = 0.05):
+    """Measure how late the event loop wakes up compared to the requested sleep"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        stats.loop_lag.append(max(0.0, loop.time() - start - interval))
+
+
+async def timed_request(client, stats: Stats, route: str, method: str, url: str, **kwargs):
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+        ok = response.status_code < 400
+    except Exception:
+        response = None
+        ok = False
+    stats.record(route, time.perf_counter() - start, ok)
+    return response
+
+
+# --- Simulated user ---
+
+async def simulated_user(client, stats: Stats, profile: Dict, args, deadline: float):
+    response = await timed_request(
+        client, stats, "POST /api/auth/login", "POST", "/api/auth/login",
+        json={"email": profile["email"], "password": LOADTEST_PASSWORD},
+    )
+    if response is None or response.status_code != 200:
+        return
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    chat_id = profile["chat_id"]
+
+    async def poll_messages():
+        # Stagger the first poll so users don't all fire on the same tick
+        await asyncio.sleep(random.uniform(0, args.poll_interval))
+        while time.monotonic() < deadline:
+            await timed_request(client, stats, "GET /api/messages", "GET", "/api/messages",
+                                params={"chat_id": chat_id}, headers=headers)
+            await asyncio.sleep(args.poll_interval)
+
+    async def chat_and_schedule():
+        while time.monotonic() < deadline:
+            await asyncio.sleep(random.expovariate(1.0 / args.message_interval))
+            if time.monotonic() >= deadline:
+                break
+            text = random.choice(AVAILABILITY if random.random() < 0.3 else CHATTER)
+            await timed_request(client, stats, "POST /api/messages", "POST", "/api/messages",
+                                json={"chat_id": chat_id, "user_id": profile["user_id"], "text": text},
+                                headers=headers)
+            if random.random() < args.schedule_probability:
+                await timed_request(client, stats, "POST /api/schedule", "POST", "/api/schedule",
+                                    json={"chat_id": chat_id}, headers=headers)
+
+    await asyncio.gather(poll_messages(), chat_and_schedule())
+
+
+async def run(args) -> Dict:
+    import httpx
+    from app.main import app
+
+    profiles = seed_database(args.users, args.chats)
+    stats = Stats()
+    stop = asyncio.Event()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+        lag_task = asyncio.create_task(monitor_loop_lag(stats, stop))
+        started = time.monotonic()
+        deadline = started + args.duration
+        await asyncio.gather(*(simulated_user(client, stats, p, args, deadline) for p in profiles))
+        elapsed = time.monotonic() - started
+        stop.set()
+        await lag_task
+
+    return build_report(stats, elapsed, args)
+
+
+def build_report(stats: Stats, elapsed: float, args) -> Dict:
+    routes = {}
+    total = 0
+    for route, values in sorted(stats.latencies.items()):
+        total += len(values)
+        routes[route] = {
+            "requests": len(values),
+            "errors": stats.errors[route],
+            "error_rate": stats.errors[route] / len(values),
+            "throughput_rps": len(values) / elapsed,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "max_ms": max(values) * 1000,
+        }
+    return {
+        "users": args.users,
+        "duration_s": elapsed,
+        "total_requests": total,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "routes": routes,
+        "event_loop_lag": {
+            "samples": len(stats.loop_lag),
+            "p50_ms": percentile(stats.loop_lag, 50) * 1000,
+            "p95_ms": percentile(stats.loop_lag, 95) * 1000,
+            "p99_ms": percentile(stats.loop_lag, 99) * 1000,
+            "max_ms": max(stats.loop_lag, default=0.0) * 1000,
+        },
+    }
+
+
+def print_report(report: Dict):
+    print(f"\n{report['users']} users, {report['duration_s']:.1f}s, "
+          f"{report['total_requests']} requests ({report['throughput_rps']:.1f} req/s)\n")
+    header = f"{'route':<24}{'reqs':>8}{'err%':>8}{'rps':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for route, r in report["routes"].items():
+        print(f"{route:<24}{r['requests']:>8}{r['error_rate'] * 100:>7.1f}%{r['throughput_rps']:>8.1f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['max_ms']:>10.1f}")
+    lag = report["event_loop_lag"]
+    print(f"\nevent loop lag: p50 {lag['p50_ms']:.1f} ms, p95 {lag['p95_ms']:.1f} ms, "
+          f"p99 {lag['p99_ms']:.1f} ms, max {lag['max_ms']:.1f} ms ({lag['samples']} samples)")
+
+
+def main():
+    args = parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+        # Stand-in latencies are sampled from their own generator
+        os.environ["TRANSPORT_SEED"] = str(args.seed)
+
+    # Must be set before app.database is imported
+    os.environ["DATABASE_URL"] = args.database_url
+    install_stand_ins(args.llm_latency, args.email_latency, args.transport, args.cassette_dir)
+    # The harness' own client would otherwise log every request it makes
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
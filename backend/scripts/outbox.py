@@ -0,0 +1,84 @@
+"""
+Inspect and operate the notification outbox.
+
+The API process drains the outbox on OUTBOX_WORKERS background threads. Set
+OUTBOX_WORKERS=0 there and run `work` here to deliver from separate
+processes instead (any number of them; rows are claimed, never shared).
+
+Usage:
+    cd backend
+    python scripts/outbox.py status
+    python scripts/outbox.py dead --limit 20
+    python scripts/outbox.py requeue            # every dead-lettered row
+    python scripts/outbox.py requeue --id 7 --id 9
+    python scripts/outbox.py work --workers 4
+    python scripts/outbox.py work --once        # one batch, then exit
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Notification outbox operations")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="count rows per status")
+    dead = commands.add_parser("dead", help="list dead-lettered rows")
+    dead.add_argument("--limit", type=int, default=50)
+    requeue = commands.add_parser("requeue", help="retry dead-lettered rows from scratch")
+    requeue.add_argument("--id", dest="ids", type=int, action="append", default=None, help="only these rows")
+    work = commands.add_parser("work", help="deliver queued notifications in the foreground")
+    work.add_argument("--workers", type=int, default=None, help="worker threads (default OUTBOX_WORKERS)")
+    work.add_argument("--once", action="store_true", help="deliver one batch and exit")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    from app.database import SessionLocal
+    from app.models import OutboxMessage
+    from app.services import outbox
+    from app.services.email_service import EmailService
+    from app.utils.log import configure_logging
+
+    configure_logging()
+
+    if args.command == "work":
+        if args.once:
+            handled = asyncio.run(outbox.process_batch(EmailService()))
+            print(f"Handled {handled} outbox rows")
+            return
+        stop = threading.Event()
+        threads = outbox.start_outbox_workers(stop, args.workers or outbox.OUTBOX_WORKERS or 1)
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            stop.set()
+        return
+
+    db = SessionLocal()
+    try:
+        if args.command == "status":
+            for status, count in sorted(outbox.status_counts(db).items()):
+                print(f"{status:<10} {count}")
+        elif args.command == "dead":
+            rows = db.query(OutboxMessage).filter(OutboxMessage.status == "dead") \
+                .order_by(OutboxMessage.id.desc()).limit(args.limit).all()
+            for row in rows:
+                print(f"{row.id:>8}  {row.kind:<22} {row.recipient:<32} attempts={row.attempts}  {row.last_error}")
+        elif args.command == "requeue":
+            print(f"Requeued {outbox.requeue_dead(db, args.ids)} outbox rows")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""
+Storage maintenance for the messages table: indexes, monthly partitions and cold archiving.
+
+Commands:
+    indexes            create the (chat_id, created_at) and user_id indexes on an existing table
+    migrate            Postgres: convert messages into a table partitioned by month of created_at
+    create-partitions  Postgres: make sure the next months' partitions exist (run from cron)
+    archive            move messages older than MESSAGE_ARCHIVE_AFTER_DAYS into gzip NDJSON files
+
+Once partitioned, a recent-chat query only touches the current months'
+partitions and their small (chat_id, created_at) indexes, however much history
+there is. Archiving a fully expired month detaches and drops its partition
+instead of deleting rows one by one, then rebuilds chat_members for the
+archived chats from the messages that remain. Archived messages are served by
+GET /api/chats/{chat_id}/archive/{month}.
+
+Usage:
+    cd backend
+    python scripts/partition_messages.py indexes
+    python scripts/partition_messages.py migrate --months-ahead 3
+    python scripts/partition_messages.py create-partitions --months-ahead 3
+    python scripts/partition_messages.py archive --older-than-days 365 --dry-run
+"""
+
+import argparse
+import os
+import sys
+from collections import defaultdict
+from datetime import date, datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+DEFAULT_PARTITION = "messages_default"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Partition, index and archive the messages table")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("indexes", help="create the hot-path indexes on an existing messages table")
+
+    migrate = commands.add_parser("migrate", help="convert messages into monthly partitions (Postgres)")
+    migrate.add_argument("--months-ahead", type=int, default=3, help="future months to create partitions for")
+    migrate.add_argument("--keep-old", action="store_true",
+                         help="keep the original table as messages_unpartitioned instead of dropping it")
+
+    partitions = commands.add_parser("create-partitions", help="create upcoming monthly partitions (Postgres)")
+    partitions.add_argument("--months-ahead", type=int, default=3, help="future months to create partitions for")
+
+    archive = commands.add_parser("archive", help="move old messages to compressed archive files")
+    archive.add_argument("--older-than-days", type=int, default=None,
+                         help="archive messages older than this (default MESSAGE_ARCHIVE_AFTER_DAYS)")
+    archive.add_argument("--archive-dir", default=None, help="archive directory (default MESSAGE_ARCHIVE_DIR)")
+    archive.add_argument("--batch-size", type=int, default=5000, help="rows deleted per statement")
+    archive.add_argument("--dry-run", action="store_true", help="write nothing, only report what would move")
+    return parser.parse_args()
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def next_month(day: date) -> date:
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"messages_y{month.year}m{month.month:02d}"
+
+
+def month_partitions(first: date, last: date):
+    """(name, start, end) for every month from first to last inclusive"""
+    month = month_start(first)
+    while month <= last:
+        yield partition_name(month), month, next_month(month)
+        month = next_month(month)
+
+
+def require_postgres(engine):
+    if engine.dialect.name != "postgresql":
+        sys.exit(f"Partitioning needs PostgreSQL (DATABASE_URL is {engine.dialect.name}); "
+                 "use the 'indexes' and 'archive' commands instead")
+
+
+def is_partitioned(connection) -> bool:
+    from sqlalchemy import text
+
+    return connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'messages'::regclass)"
+    )).scalar()
+
+
+def create_indexes(connection):
+    from sqlalchemy import text
+    from app.models import Message
+
+    for index in Message.__table__.indexes:
+        columns = ", ".join(column.name for column in index.columns)
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS {index.name} ON messages ({columns})"))
+
+
+def create_partitions(connection, first: date, months_ahead: int) -> int:
+    from sqlalchemy import text
+
+    last = month_start(date.today())
+    for _ in range(months_ahead):
+        last = next_month(last)
+    created = 0
+    for name, start, end in month_partitions(first, last):
+        exists = connection.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}).scalar()
+        if exists:
+            continue
+        connection.execute(text(
+            f"CREATE TABLE {name} PARTITION OF messages FOR VALUES FROM ('{start}') TO ('{end}')"
+        ))
+        created += 1
+    return created
+
+
+def command_indexes(engine):
+    with engine.begin() as connection:
+        create_indexes(connection)
+    print("messages indexes ready")
+
+
+def command_migrate(engine, months_ahead: int, keep_old: bool):
+    from sqlalchemy import text
+    from app.models.message import POSTGRES_SEARCH_DDL
+
+    require_postgres(engine)
+    with engine.begin() as connection:
+        if is_partitioned(connection):
+            print("messages is already partitioned")
+            return
+
+        # Writers wait for the copy; readers keep going until the swap
+        connection.execute(text("LOCK TABLE messages IN EXCLUSIVE MODE"))
+
+        columns = connection.execute(text(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = 'messages' AND is_generated = 'NEVER' "
+            "ORDER BY ordinal_position"
+        )).scalars().all()
+        foreign_keys = connection.execute(text(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = 'messages'::regclass AND contype = 'f'"
+        )).all()
+        triggers = connection.execute(text(
+            "SELECT tgname, pg_get_triggerdef(oid) FROM pg_trigger "
+            "WHERE tgrelid = 'messages'::regclass AND NOT tgisinternal"
+        )).all()
+        indexes = connection.execute(text(
+            "SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = 'messages'::regclass"
+        )).scalars().all()
+        sequence = connection.execute(text("SELECT pg_get_serial_sequence('messages', 'id')")).scalar()
+        oldest = connection.execute(text("SELECT min(created_at) FROM messages")).scalar()
+        total = connection.execute(text("SELECT count(*) FROM messages")).scalar()
+
+        # The partition key has to be part of the primary key
+        connection.execute(text(
+            "CREATE TABLE messages_partitioned (LIKE messages INCLUDING DEFAULTS INCLUDING GENERATED) "
+            "PARTITION BY RANGE (created_at)"
+        ))
+        connection.execute(text("ALTER TABLE messages_partitioned ALTER COLUMN created_at SET NOT NULL"))
+        connection.execute(text("ALTER TABLE messages_partitioned ADD PRIMARY KEY (id, created_at)"))
+
+        # Free the old table's names for the new one
+        if sequence:
+            connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+        for index in indexes:
+            connection.execute(text(f'ALTER INDEX {index} RENAME TO "{index.split(".")[-1]}_unpartitioned"'))
+        for name, _ in triggers:
+            connection.execute(text(f'DROP TRIGGER "{name}" ON messages'))
+        connection.execute(text("ALTER TABLE messages RENAME TO messages_unpartitioned"))
+        connection.execute(text("ALTER TABLE messages_partitioned RENAME TO messages"))
+
+        first = (oldest.date() if oldest else date.today())
+        created = create_partitions(connection, first, months_ahead)
+        connection.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF messages DEFAULT"))
+
+        column_list = ", ".join(columns)
+        select_list = ", ".join(
+            "coalesce(created_at, now())" if column == "created_at" else column for column in columns
+        )
+        copied = connection.execute(text(
+            f"INSERT INTO messages ({column_list}) SELECT {select_list} FROM messages_unpartitioned"
+        )).rowcount
+        if copied != total:
+            raise RuntimeError(f"Copied {copied} of {total} messages; rolling back")
+
+        for name, definition in foreign_keys:
+            connection.execute(text(f'ALTER TABLE messages ADD CONSTRAINT "{name}" {definition}'))
+        for _, definition in triggers:
+            # Captured before the rename, so "ON messages" now means the partitioned table
+            connection.execute(text(definition))
+        create_indexes(connection)
+        for statement in POSTGRES_SEARCH_DDL:
+            connection.execute(text(statement))
+        if sequence:
+            connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY messages.id"))
+        if not keep_old:
+            connection.execute(text("DROP TABLE messages_unpartitioned"))
+
+    print(f"messages partitioned by month: {copied} rows copied, {created} monthly partitions created")
+
+
+def command_create_partitions(engine, months_ahead: int):
+    from sqlalchemy import text
+
+    require_postgres(engine)
+    with engine.begin() as connection:
+        if not is_partitioned(connection):
+            sys.exit("messages is not partitioned yet; run 'migrate' first")
+        created = create_partitions(connection, date.today(), months_ahead)
+        # Rows that landed in the default partition block creating a partition for their month
+        stray = connection.execute(text(f"SELECT count(*) FROM {DEFAULT_PARTITION}")).scalar()
+    print(f"{created} partitions created")
+    if stray:
+        print(f"warning: {stray} rows are in {DEFAULT_PARTITION}; archive them or move them into a partition")
+
+
+def expired_partitions(connection, cutoff: datetime):
+    """Monthly partitions whose whole range is older than cutoff"""
+    from sqlalchemy import text
+
+    names = connection.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = 'messages'::regclass AND child.relname LIKE 'messages_y%'"
+    )).scalars().all()
+    expired = []
+    for name in names:
+        year, month = int(name[10:14]), int(name[15:17])
+        if next_month(date(year, month, 1)) <= cutoff.date():
+            expired.append(name)
+    return sorted(expired)
+
+
+def command_archive(engine, older_than_days, archive_dir, batch_size: int, dry_run: bool):
+    from sqlalchemy import select, text
+    from sqlalchemy.orm import Session
+    from app.models import Message, User
+    from app.models.chat_member import rebuild_chat_members
+    from app.services.message_archive import archive_cutoff, write_archive
+    from app.utils.chat_versions import mark_changed
+
+    cutoff = archive_cutoff(older_than_days)
+    if engine.dialect.name == "sqlite":
+        # SQLite stores naive UTC timestamps
+        cutoff = cutoff.replace(tzinfo=None)
+
+    query = select(Message.id, Message.chat_id, Message.user_id, User.name, Message.text, Message.created_at) \
+        .join(User, Message.user_id == User.id) \
+        .where(Message.created_at < cutoff) \
+        .order_by(Message.chat_id, Message.created_at, Message.id) \
+        .execution_options(yield_per=batch_size)
+
+    # Stream old rows chat by chat and write one archive file per chat and month
+    archived = 0
+    last_id = None
+    files = 0
+    chat_ids = set()
+    with engine.connect() as connection:
+        pending = defaultdict(list)
+        current_chat = None
+        for row in connection.execute(query):
+            if row.chat_id != current_chat and pending:
+                files += flush_archives(current_chat, pending, archive_dir, dry_run, write_archive)
+                pending = defaultdict(list)
+            current_chat = row.chat_id
+            created_at = row.created_at if row.created_at.tzinfo else row.created_at.replace(tzinfo=timezone.utc)
+            pending[created_at.strftime("%Y-%m")].append({
+                "id": row.id,
+                "chat_id": row.chat_id,
+                "user_id": row.user_id,
+                "user_name": row.name,
+                "text": row.text,
+                "created_at": created_at.isoformat(),
+            })
+            archived += 1
+            chat_ids.add(row.chat_id)
+            last_id = row.id if last_id is None else max(last_id, row.id)
+        if pending:
+            files += flush_archives(current_chat, pending, archive_dir, dry_run, write_archive)
+
+    if dry_run:
+        print(f"would archive {archived} messages into {files} files (cutoff {cutoff.isoformat()})")
+        return
+
+    # Archives are on disk; now remove the rows. Each commit also bumps the archived chats'
+    # conditional-GET versions (only seen by servers sharing this process, see chat_versions)
+    with Session(engine) as session:
+        def commit():
+            for chat_id in chat_ids:
+                mark_changed(session, chat_id, messages=True)
+            session.commit()
+
+        dropped = []
+        if engine.dialect.name == "postgresql" and is_partitioned(session.connection()):
+            for name in expired_partitions(session.connection(), cutoff):
+                session.execute(text(f"ALTER TABLE messages DETACH PARTITION {name}"))
+                session.execute(text(f"DROP TABLE {name}"))
+                dropped.append(name)
+        commit()
+        # Delete in batches so no single statement holds locks on millions of rows; the id bound
+        # keeps anything that arrived after the export out of it
+        table = Message.__table__
+        while last_id is not None:
+            batch = select(table.c.id).where(table.c.created_at < cutoff, table.c.id <= last_id).limit(batch_size)
+            deleted = session.execute(table.delete().where(table.c.id.in_(batch.scalar_subquery()))).rowcount
+            commit()
+            if deleted < batch_size:
+                break
+        # Counts and first/last message times now describe only the messages left in the table
+        rebuild_chat_members(session, chat_ids)
+        commit()
+
+    print(f"archived {archived} messages into {files} files; dropped partitions: {', '.join(dropped) or 'none'}")
+
+
+def flush_archives(chat_id, by_month, archive_dir, dry_run, write_archive) -> int:
+    if not dry_run:
+        for month, messages in by_month.items():
+            write_archive(chat_id, month, messages, archive_dir)
+    return len(by_month)
+
+
+def main():
+    args = parse_args()
+
+    from app.database import engine
+
+    if args.command == "indexes":
+        command_indexes(engine)
+    elif args.command == "migrate":
+        command_migrate(engine, args.months_ahead, args.keep_old)
+    elif args.command == "create-partitions":
+        command_create_partitions(engine, args.months_ahead)
+    elif args.command == "archive":
+        command_archive(engine, args.older_than_days, args.archive_dir, args.batch_size, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Show what relevance selection keeps from a chat's history before it goes to the LLM.
+
+For each chat: messages and estimated prompt tokens (characters / 4, as the
+agent estimates them) before and after selection, and any dropped message
+that still contains a time expression. That list should be empty unless the
+chat has more scheduling talk than PROMPT_MESSAGE_BUDGET allows; it is the
+quick check that extraction input didn't lose anything.
+
+Usage:
+    cd backend
+    python scripts/prompt_selection_report.py --chat-id 1
+    python scripts/prompt_selection_report.py --chat-id 1 --budget 20 --show
+"""
+
+import argparse
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Report prompt reduction from relevance-based message selection")
+    parser.add_argument("--chat-id", type=int, action="append", required=True, help="chat to report on (repeatable)")
+    parser.add_argument("--budget", type=int, default=None, help="override PROMPT_MESSAGE_BUDGET")
+    parser.add_argument("--show", action="store_true", help="print the selected history")
+    return parser.parse_args()
+
+
+def report(db, chat_id, budget=None, show=False):
+    from app.models import ChatMember, User
+    from app.services import message_relevance
+    from app.services.scheduling_agent import SchedulingAgent
+
+    agent = SchedulingAgent(db)
+    messages = agent._load_chat_messages(chat_id)
+    members = db.query(User.id, User.name).join(ChatMember, User.id == ChatMember.user_id) \
+        .filter(ChatMember.chat_id == chat_id).all()
+    participant_names = {member.id: member.name for member in members}
+
+    selected = message_relevance.select_relevant(
+        messages, participant_names, budget=budget or message_relevance.PROMPT_MESSAGE_BUDGET
+    )
+    before = len(agent._format_chat_for_llm(messages)) // 4
+    after = len(agent._format_chat_for_llm(selected)) // 4
+    kept_ids = {message.id for message, _ in selected}
+    dropped_with_times = [
+        (message, user) for message, user in messages
+        if message.id not in kept_ids and message_relevance.has_time_expression(message.text or "")
+    ]
+
+    saved = 100 * (1 - after / before) if before else 0.0
+    print(f"chat {chat_id}: {len(messages)} -> {len(selected)} messages, "
+          f"~{before} -> ~{after} prompt tokens ({saved:.0f}% fewer)")
+    for message, user in dropped_with_times:
+        print(f"  dropped with a time expression: #{message.id} {user.name}: {message.text}")
+    if show:
+        print(agent._format_chat_for_llm(selected))
+
+
+def main():
+    args = parse_args()
+
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        for chat_id in args.chat_id:
+            report(db, chat_id, args.budget, args.show)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Cold-start benchmark for the PropVivo Meeting Scheduler API.
+
+Measures, in fresh processes so nothing is cached:
+  - import time of app.main (and the slowest modules it pulls in, via -X importtime)
+  - time to first response: from launching uvicorn until GET /health answers
+  - time to first authenticated-route response (GET /api/messages without a token, which
+    still runs routing, dependencies and the auth scheme)
+
+Usage:
+    cd backend
+    python scripts/startup_benchmark.py
+    python scripts/startup_benchmark.py --runs 10 --json startup.json
+    python scripts/startup_benchmark.py --max-import-seconds 0.8   # exit 1 on regression (CI)
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure import time and time-to-first-response")
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per measurement")
+    parser.add_argument("--top", type=int, default=10, help="slowest imported modules to list")
+    parser.add_argument("--database-url", default=os.getenv("STARTUP_DATABASE_URL", "sqlite:///./startup_benchmark.db"),
+                        help="database the app is pointed at (never written to unless AUTO_CREATE_SCHEMA is set)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for the server to answer")
+    parser.add_argument("--max-import-seconds", type=float, default=None, help="fail if median import time exceeds this")
+    parser.add_argument("--max-first-response-seconds", type=float, default=None,
+                        help="fail if median time to first response exceeds this")
+    parser.add_argument("--json", dest="json_path", default=None, help="also write the results to this JSON file")
+    return parser.parse_args()
+
+
+def child_env(database_url: str) -> dict:
+    env = dict(os.environ)
+    env["DATABASE_URL"] = database_url
+    env["PYTHONPATH"] = BACKEND_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    # Measure the serving path only: no background SDK warm-up competing for the CPU
+    env.setdefault("WARM_CLIENTS", "False")
+    env.setdefault("LOG_LEVEL", "WARNING")
+    return env
+
+
+def measure_import(env: dict) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True,
+    )
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(env: dict, top: int):
+    """Cumulative import time per module for one `import app.main`, slowest first"""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True,
+    )
+    modules = []
+    for line in output.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(cumulative) / 1_000_000))
+    # Top-level packages only, so openai doesn't show up once per submodule
+    top_level = {}
+    for name, seconds in modules:
+        root = name.split(".")[0]
+        top_level[root] = max(top_level.get(root, 0.0), seconds)
+    return sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url: str, deadline: float, accept_status=(200,)) -> float:
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status in accept_status:
+                    return time.perf_counter()
+        except urllib.error.HTTPError as e:
+            if e.code in accept_status:
+                return time.perf_counter()
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(f"No response from {url}")
+
+
+def measure_first_response(env: dict, timeout: float):
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = start + timeout
+        health = wait_for(f"{base}/health", deadline) - start
+        # 401/403: routed and through the auth dependency, no database needed
+        routed_start = time.perf_counter()
+        wait_for(f"{base}/api/messages?chat_id=1", deadline, accept_status=(200, 401, 403))
+        routed = time.perf_counter() - routed_start
+        return health, routed
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "median": statistics.median(ordered),
+        "min": ordered[0],
+        "max": ordered[-1],
+    }
+
+
+def main():
+    args = parse_args()
+    env = child_env(args.database_url)
+
+    imports = [measure_import(env) for _ in range(args.runs)]
+    first_responses, routed = [], []
+    for _ in range(args.runs):
+        health, api = measure_first_response(env, args.timeout)
+        first_responses.append(health)
+        routed.append(api)
+
+    report = {
+        "runs": args.runs,
+        "import_seconds": summarize(imports),
+        "first_response_seconds": summarize(first_responses),
+        "first_api_request_seconds": summarize(routed),
+        "slowest_imports": [{"module": name, "seconds": seconds} for name, seconds in slowest_imports(env, args.top)],
+    }
+
+    print(f"Cold start over {args.runs} runs (median / min / max):")
+    for key, label in (("import_seconds", "import app.main"),
+                       ("first_response_seconds", "launch -> GET /health"),
+                       ("first_api_request_seconds", "first API request")):
+        stats = report[key]
+        print(f"  {label:<24} {stats['median'] * 1000:8.1f} ms {stats['min'] * 1000:8.1f} ms {stats['max'] * 1000:8.1f} ms")
+    print("Slowest imports (cumulative):")
+    for entry in report["slowest_imports"]:
+        print(f"  {entry['module']:<24} {entry['seconds'] * 1000:8.1f} ms")
+
+    if args.json_path:
+        with open(args.json_path, "w") as output:
+            json.dump(report, output, indent=2)
+
+    failed = False
+    if args.max_import_seconds is not None and report["import_seconds"]["median"] > args.max_import_seconds:
+        print(f"FAIL: median import time above {args.max_import_seconds}s")
+        failed = True
+    if (args.max_first_response_seconds is not None
+            and report["first_response_seconds"]["median"] > args.max_first_response_seconds):
+        print(f"FAIL: median time to first response above {args.max_first_response_seconds}s")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,8 @@ CREATE TABLE IF NOT EXISTS public.messages (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     is_edited BOOLEAN DEFAULT FALSE,
-    edited_at TIMESTAMP WITH TIME ZONE
+    edited_at TIMESTAMP WITH TIME ZONE,
+    search_vector TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', coalesce(text, ''))) STORED
 );
 
 -- Indexes for performance
@@ -17,6 +18,7 @@ CREATE INDEX messages_chat_id_idx ON public.messages (chat_id);
 CREATE INDEX messages_user_id_idx ON public.messages (user_id);
 CREATE INDEX messages_created_at_idx ON public.messages (created_at);
 CREATE INDEX messages_chat_created_idx ON public.messages (chat_id, created_at DESC);
+CREATE INDEX messages_search_vector_idx ON public.messages USING GIN (search_vector);
 
 -- Trigger to update updated_at
 CREATE OR REPLACE FUNCTION update_messages_updated_at()
@@ -16,6 +16,13 @@ CREATE TABLE IF NOT EXISTS public.meetings (
     location VARCHAR(255),
     meeting_url VARCHAR(500),
     notes TEXT,
+    -- Recurrence: RRULE expanded from start_utc in `timezone`; occurrences are not stored
+    rrule TEXT,
+    series_end_utc TIMESTAMP WITH TIME ZONE,
+    -- Attendance counters, maintained by the RSVP endpoints
+    participant_count INTEGER NOT NULL DEFAULT 0,
+    confirmed_count INTEGER NOT NULL DEFAULT 0,
+    declined_count INTEGER NOT NULL DEFAULT 0,
     
     -- Constraints
     CONSTRAINT meetings_time_check CHECK (end_utc > start_utc)
@@ -24,6 +31,9 @@ CREATE TABLE IF NOT EXISTS public.meetings (
 -- Indexes for performance
 CREATE INDEX idx_meetings_chat_id ON public.meetings (chat_id);
 CREATE INDEX idx_meetings_scheduled_by ON public.meetings (scheduled_by);
+CREATE INDEX idx_meetings_recurring ON public.meetings (chat_id, start_utc) WHERE rrule IS NOT NULL;
+CREATE INDEX idx_meetings_start_utc ON public.meetings (start_utc, id);
+CREATE INDEX idx_meetings_series_start ON public.meetings (start_utc) WHERE rrule IS NOT NULL;
 
 -- Trigger to update updated_at
 CREATE OR REPLACE FUNCTION update_meetings_updated_at()
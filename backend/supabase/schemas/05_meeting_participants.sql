@@ -15,7 +15,8 @@ CREATE TABLE IF NOT EXISTS public.meeting_participants (
 
 -- Indexes for performance
 CREATE INDEX idx_meeting_participants_meeting_id ON public.meeting_participants (meeting_id);
-CREATE INDEX idx_meeting_participants_user_id ON public.meeting_participants (user_id);
+-- Covers per-user calendar lookups (user's meeting ids and RSVP) without heap access
+CREATE INDEX idx_meeting_participants_user_meeting ON public.meeting_participants (user_id, meeting_id) INCLUDE (response);
 CREATE INDEX idx_meeting_participants_response ON public.meeting_participants (response);
 CREATE INDEX idx_meeting_participants_meeting_response ON public.meeting_participants (meeting_id, response);
 
@@ -0,0 +1,26 @@
+-- Chat members table schema for PropVivo Meeting Scheduler
+-- Purpose: Materialized chat membership, maintained by the API on every message insert
+-- so participant lookups are O(members) instead of a DISTINCT over the chat's messages
+
+CREATE TABLE IF NOT EXISTS public.chat_members (
+    chat_id INTEGER NOT NULL REFERENCES public.chats(id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+    first_message_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    last_message_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    message_count INTEGER NOT NULL DEFAULT 0,
+    
+    PRIMARY KEY (chat_id, user_id)
+);
+
+-- Indexes for performance
+CREATE INDEX IF NOT EXISTS idx_chat_members_user_id ON public.chat_members (user_id);
+
+-- Backfill from existing messages (safe to re-run)
+INSERT INTO public.chat_members (chat_id, user_id, first_message_at, last_message_at, message_count)
+SELECT chat_id, user_id, MIN(created_at), MAX(created_at), COUNT(*)
+FROM public.messages
+GROUP BY chat_id, user_id
+ON CONFLICT (chat_id, user_id) DO UPDATE SET
+    first_message_at = EXCLUDED.first_message_at,
+    last_message_at = EXCLUDED.last_message_at,
+    message_count = EXCLUDED.message_count;
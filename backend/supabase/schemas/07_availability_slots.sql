@@ -0,0 +1,26 @@
+-- Availability slots table schema for PropVivo Meeting Scheduler
+-- Purpose: Participant availability extracted from chats, one row per user, chat and time range
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+CREATE TABLE IF NOT EXISTS public.availability_slots (
+    id SERIAL PRIMARY KEY,
+    chat_id INTEGER NOT NULL REFERENCES public.chats(id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+    start_utc TIMESTAMP WITH TIME ZONE NOT NULL,
+    end_utc TIMESTAMP WITH TIME ZONE NOT NULL,
+    during TSTZRANGE GENERATED ALWAYS AS (tstzrange(start_utc, end_utc, '[)')) STORED,
+    kind VARCHAR(20) NOT NULL DEFAULT 'available' CHECK (kind IN ('available', 'unavailable')),
+    source VARCHAR(20) NOT NULL DEFAULT 'llm',
+    -- No foreign key: partitioned messages have a composite (id, created_at) key
+    source_message_id INTEGER,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    
+    CONSTRAINT availability_slots_range_check CHECK (end_utc > start_utc)
+);
+
+-- Indexes for performance
+CREATE INDEX IF NOT EXISTS availability_slots_during_idx ON public.availability_slots USING GIST (chat_id, during);
+CREATE INDEX IF NOT EXISTS availability_slots_chat_range_idx ON public.availability_slots (chat_id, start_utc, end_utc);
+CREATE INDEX IF NOT EXISTS ix_availability_slots_user_id ON public.availability_slots (user_id);
+CREATE INDEX IF NOT EXISTS ix_availability_slots_source_message_id ON public.availability_slots (source_message_id);
@@ -0,0 +1,22 @@
+-- Meeting exceptions table schema for PropVivo Meeting Scheduler
+-- Purpose: Cancelled or moved occurrences of recurring meetings
+
+CREATE TABLE IF NOT EXISTS public.meeting_exceptions (
+    id SERIAL PRIMARY KEY,
+    meeting_id INTEGER NOT NULL REFERENCES public.meetings(id) ON DELETE CASCADE,
+    -- Start the rule gave the occurrence
+    original_start_utc TIMESTAMP WITH TIME ZONE NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'cancelled' CHECK (status IN ('cancelled', 'moved')),
+    -- New times for a moved occurrence
+    start_utc TIMESTAMP WITH TIME ZONE,
+    end_utc TIMESTAMP WITH TIME ZONE,
+    title VARCHAR(255),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    
+    -- Constraints
+    CONSTRAINT meeting_exceptions_occurrence_key UNIQUE (meeting_id, original_start_utc),
+    CONSTRAINT meeting_exceptions_moved_check CHECK (status <> 'moved' OR end_utc > start_utc)
+);
+
+-- Indexes for performance
+CREATE INDEX IF NOT EXISTS meeting_exceptions_moved_idx ON public.meeting_exceptions (start_utc);
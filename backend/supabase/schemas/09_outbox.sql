@@ -0,0 +1,27 @@
+-- Outbox table schema for PropVivo Meeting Scheduler
+-- Purpose: Notifications written with the meeting change that caused them, delivered by a background worker
+
+CREATE TABLE IF NOT EXISTS public.outbox (
+    id SERIAL PRIMARY KEY,
+    kind VARCHAR(50) NOT NULL,
+    -- No foreign key: rows for a replaced meeting are kept (cancelled) for the record
+    meeting_id INTEGER,
+    recipient VARCHAR(255) NOT NULL,
+    payload TEXT NOT NULL,
+    idempotency_key VARCHAR(255) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'sending', 'sent', 'cancelled', 'dead')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    claim_token VARCHAR(64),
+    locked_until TIMESTAMP WITH TIME ZONE,
+    last_error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    sent_at TIMESTAMP WITH TIME ZONE,
+    
+    -- Constraints
+    CONSTRAINT outbox_idempotency_key UNIQUE (idempotency_key)
+);
+
+-- Indexes for performance
+CREATE INDEX IF NOT EXISTS outbox_due_idx ON public.outbox (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS ix_outbox_meeting_id ON public.outbox (meeting_id);
@@ -8,6 +8,10 @@
 \i schemas/03_messages.sql
 \i schemas/04_meetings.sql
 \i schemas/05_meeting_participants.sql
+\i schemas/06_chat_members.sql
+\i schemas/07_availability_slots.sql
+\i schemas/08_meeting_exceptions.sql
+\i schemas/09_outbox.sql
 
 -- Step 2: Enable Row Level Security
 \i policies/01_users_rls.sql
@@ -0,0 +1,63 @@
+"""Shared fixtures: every test session runs against a throwaway SQLite database.
+
+The environment is set before anything under app/ is imported, since modules
+read their configuration at import time.
+"""
+import os
+import tempfile
+
+_DB_FILE = os.path.join(tempfile.mkdtemp(prefix="propvivo-tests-"), "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_FILE}"
+os.environ.setdefault("ADMIN_EMAILS", "admin@example.com")
+os.environ.setdefault("LLM_TRANSPORT", "synthetic")
+os.environ.setdefault("EMAIL_TRANSPORT", "synthetic")
+os.environ.setdefault("OUTBOX_WORKERS", "0")
+os.environ.setdefault("WARM_CLIENTS", "False")
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    """A fresh schema per test"""
+    import app.models  # noqa: F401  (registers every table)
+    from app.database import Base, SessionLocal, engine
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def _login(client, db, name: str, email: str) -> dict:
+    from app.auth import get_password_hash
+    from app.models import User
+
+    db.add(User(name=name, email=email, hashed_password=get_password_hash("pw")))
+    db.commit()
+    token = client.post("/api/auth/login", json={"email": email, "password": "pw"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def auth(client, db):
+    """Bearer headers for a regular user"""
+    return _login(client, db, "Alice", "alice@example.com")
+
+
+@pytest.fixture
+def admin_auth(client, db):
+    """Bearer headers for a user listed in ADMIN_EMAILS"""
+    return _login(client, db, "Admin", "admin@example.com")
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+
+import pytz
+
+from app.models import AvailabilitySlot, Chat, User
+from app.services.availability import majority_windows, replace_extracted_slots
+from app.services.availability_index import MIN_LEAD, build_index
+from app.services.scheduling_agent import MEETING_DURATION, _meeting_details
+from app.utils.query_tracking import count_queries
+
+UTC = pytz.UTC
+DAY = datetime(2030, 3, 7, tzinfo=UTC)
+
+
+def _at(hour: float) -> datetime:
+    return DAY + timedelta(hours=hour)
+
+
+def _setup(db, users: int = 3):
+    chat = Chat(title="planning")
+    people = [User(name=f"U{i}", email=f"u{i}@example.com") for i in range(users)]
+    db.add(chat)
+    db.add_all(people)
+    db.commit()
+    return chat.id, [person.id for person in people]
+
+
+def _slot(chat_id, user_id, start, end, kind="available"):
+    return AvailabilitySlot(chat_id=chat_id, user_id=user_id, start_utc=_at(start), end_utc=_at(end), kind=kind)
+
+
+def test_unavailable_ranges_are_subtracted(db):
+    chat_id, (alice, bob, _) = _setup(db)
+    replace_extracted_slots(db, chat_id, [
+        _slot(chat_id, alice, 9, 13),
+        _slot(chat_id, alice, 10, 11, "unavailable"),
+        _slot(chat_id, bob, 9, 13),
+    ])
+    windows = majority_windows(db, chat_id, 2, _at(0), _at(24))
+    assert [(w.start_utc, w.end_utc) for w in windows] == [(_at(9), _at(10)), (_at(11), _at(13))]
+    index = build_index(db, chat_id, timedelta(hours=1), now=_at(8))
+    best = index.best_window(not_before=_at(10))
+    assert (best.start_utc, best.user_ids) == (_at(11), [alice, bob])
+
+
+def test_overlapping_slots_of_one_user_count_once(db):
+    chat_id, (alice, bob, carol) = _setup(db)
+    replace_extracted_slots(db, chat_id, [
+        _slot(chat_id, alice, 9, 12),
+        _slot(chat_id, alice, 10, 14),
+        _slot(chat_id, bob, 13, 15),
+    ])
+    windows = majority_windows(db, chat_id, 2, _at(0), _at(24))
+    assert [(w.start_utc, w.end_utc, w.available) for w in windows] == [(_at(13), _at(14), 2)]
+
+
+def test_open_window_is_booked_from_the_next_boundary_after_the_lead(db):
+    chat_id, (alice, bob, _) = _setup(db)
+    replace_extracted_slots(db, chat_id, [_slot(chat_id, alice, 9, 13), _slot(chat_id, bob, 9, 13)])
+    now = _at(10) + timedelta(minutes=12, seconds=23)
+    index = build_index(db, chat_id, timedelta(hours=1), now=now)
+    best = index.best_window(not_before=now + MIN_LEAD)
+    assert best.start_utc == _at(11)
+    assert best.end_utc == _at(12)
+
+
+def test_slots_are_inserted_in_one_statement(db):
+    chat_id, users = _setup(db)
+    slots = [_slot(chat_id, user_id, hour, hour + 1) for user_id in users for hour in range(8, 18)]
+    with count_queries() as stats:
+        replace_extracted_slots(db, chat_id, slots)
+    inserts = [shape for shape in stats.shapes if shape.startswith("INSERT INTO availability_slots")]
+    assert len(inserts) == 1 and stats.shapes[inserts[0]] == 1
+    assert db.query(AvailabilitySlot).count() == len(slots)
+
+
+def test_meeting_details_come_from_the_extraction():
+    assert _meeting_details({"meeting": {"title": "Design review", "duration_minutes": 90}}) == \
+        ("Design review", timedelta(minutes=90))
+    assert _meeting_details({"meeting": {"title": " ", "duration_minutes": "soon"}}) == ("Team Meeting", MEETING_DURATION)
+    assert _meeting_details({}) == ("Team Meeting", MEETING_DURATION)
+
+
+def test_scheduler_uses_sql_on_a_cold_index_and_the_index_when_warm(db, monkeypatch):
+    from app.services import availability_index
+    from app.services.scheduling_agent import SchedulingAgent
+
+    chat_id, (alice, bob, carol) = _setup(db)
+    start = datetime.now(UTC).replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+    replace_extracted_slots(db, chat_id, [
+        AvailabilitySlot(chat_id=chat_id, user_id=user_id, start_utc=start, end_utc=start + timedelta(hours=3),
+                         kind="available")
+        for user_id in (alice, bob)
+    ])
+    monkeypatch.setattr(availability_index, "_indexes", type(availability_index._indexes)())
+    agent = SchedulingAgent(db)
+    names = {alice: "Alice", bob: "Bob", carol: "Carol"}
+
+    with count_queries() as stats:
+        cold = agent._find_optimal_time_stored(chat_id, [alice, bob, carol], names, {})
+    assert agent.stage_models["optimal_time"] == "sql"
+    assert not any(shape.startswith("SELECT availability_slots.id") for shape in stats.shapes)
+
+    availability_index.get_index(db, chat_id, MEETING_DURATION)
+    with count_queries() as stats:
+        warm = agent._find_optimal_time_stored(chat_id, [alice, bob, carol], names, {})
+    assert agent.stage_models["optimal_time"] == "index" and stats.count == 0
+    assert cold["meeting_time"] == warm["meeting_time"]
+    assert cold["attending_participants"] == warm["attending_participants"] == ["Alice", "Bob"]
@@ -0,0 +1,114 @@
+import gzip
+import tracemalloc
+from datetime import datetime
+
+import pytest
+
+from app.models import Chat, ChatMember, Meeting, MeetingParticipant, Message, User
+from app.services.bulk_transfer import BulkImportError, LineSplitter, export_ndjson_gz, import_records
+from app.utils import chat_versions
+
+
+def _split(body: bytes, chunk_size: int, **kwargs):
+    splitter = LineSplitter(**kwargs)
+    lines = []
+    for start in range(0, len(body), chunk_size):
+        lines.extend(splitter.feed(body[start:start + chunk_size]))
+    return lines + splitter.close()
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_lines_survive_any_chunking(compress):
+    lines = [f'{{"type": "message", "id": {i}, "text": "{"x" * (i % 50)}"}}'.encode() for i in range(20000)]
+    body = b"\n".join(lines)
+    if compress:
+        body = gzip.compress(body)
+    assert _split(body, 7) == lines
+    assert _split(body, 64 * 1024) == lines
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_overlong_line_is_rejected_with_its_line_number(compress):
+    body = b"{}\n{}\n" + b"x" * 5000 + b"\n{}"
+    if compress:
+        body = gzip.compress(body)
+    with pytest.raises(BulkImportError) as error:
+        _split(body, 1024, max_line_bytes=4096)
+    assert error.value.line == 3
+
+
+def test_gzip_bomb_is_not_inflated_at_once():
+    bomb = gzip.compress(b"\0" * (64 * 1024 * 1024))
+    tracemalloc.start()
+    try:
+        with pytest.raises(BulkImportError):
+            _split(bomb, len(bomb))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < 8 * 1024 * 1024
+
+
+def test_export_imports_as_new_rows(db, monkeypatch):
+    monkeypatch.setattr(chat_versions, "_versions", {})
+    alice = User(name="Alice", email="alice@example.com")
+    bob = User(name="Bob", email="bob@example.com")
+    chat = Chat(title="planning")
+    db.add_all([alice, bob, chat])
+    db.commit()
+    meeting = Meeting(chat_id=chat.id, title="Sync", description="Weekly sync",
+                      start_utc=datetime(2030, 3, 7, 10), end_utc=datetime(2030, 3, 7, 11))
+    db.add(meeting)
+    db.add_all(Message(chat_id=chat.id, user_id=user.id, text=f"hi {i}") for i in range(5) for user in (alice, bob))
+    db.commit()
+    db.add_all([MeetingParticipant(meeting_id=meeting.id, user_id=alice.id, response="confirmed"),
+                MeetingParticipant(meeting_id=meeting.id, user_id=bob.id)])
+    db.commit()
+
+    counts = import_records(db, export_ndjson_gz(db, [chat.id]), batch_rows=3)
+
+    assert counts["users_matched"] == 2 and db.query(User).count() == 2
+    assert (counts["chats"], counts["meetings"], counts["participants"], counts["messages"]) == (1, 1, 2, 10)
+    copy = db.query(Chat).filter(Chat.id != chat.id).one()
+    assert copy.title == "planning"
+    assert db.query(Message).filter(Message.chat_id == copy.id).count() == 10
+    assert {member.user_id for member in db.query(ChatMember).filter(ChatMember.chat_id == copy.id)} == {alice.id, bob.id}
+    copied = db.query(Meeting).filter(Meeting.chat_id == copy.id).one()
+    responses = {p.user_id: p.response for p in db.query(MeetingParticipant).filter(MeetingParticipant.meeting_id == copied.id)}
+    assert responses == {alice.id: "confirmed", bob.id: "invited"}
+    # The Core inserts still move the new chat's ETags
+    assert all(chat_versions._versions[copy.id])
+
+
+def test_reference_to_a_missing_parent_names_the_line(db):
+    body = b'{"type": "chat", "id": 1, "title": "t", "created_at": null}\n' \
+           b'{"type": "message", "id": 1, "chat_id": 2, "user_id": 1, "text": "x", "created_at": null}\n'
+    with pytest.raises(BulkImportError) as error:
+        import_records(db, [body])
+    assert error.value.line == 2
+
+
+_PARTIAL_IMPORT = b'{"type": "user", "id": 7, "name": "Carol", "email": "carol@example.com", "created_at": null}\n' \
+                  b'{"type": "chat", "id": 1, "title": "t", "created_at": null}\n' \
+                  b'{"type": "message", "id": 1, "chat_id": 1, "user_id": 7, "text": "x", "created_at": null}\n' \
+                  b'{"type": "message", "id": 2, "chat_id": 9, "user_id": 7, "text": "y", "created_at": null}\n'
+
+
+def test_failed_import_leaves_committed_chats_consistent(db):
+    with pytest.raises(BulkImportError) as error:
+        import_records(db, [_PARTIAL_IMPORT], batch_rows=1)
+
+    chat = db.query(Chat).one()
+    assert error.value.chat_ids == [chat.id]
+    assert error.value.imported["messages"] == 1
+    member = db.query(ChatMember).filter(ChatMember.chat_id == chat.id).one()
+    assert member.message_count == 1
+
+
+def test_failed_import_reports_the_chats_it_left(client, db, admin_auth):
+    response = client.post("/api/admin/import", content=_PARTIAL_IMPORT, headers=admin_auth)
+
+    assert response.status_code == 400
+    detail = response.json()["detail"]
+    assert detail["line"] == 4 and detail["imported"]["chats"] == 1
+    assert detail["chat_ids"] == [db.query(Chat).filter(Chat.title == "t").one().id]
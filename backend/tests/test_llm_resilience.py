@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services import llm_resilience
+from app.services.llm_resilience import (
+    CircuitBreaker, CircuitOpenError, LLMDeadlineExceeded, call_with_resilience, hedged,
+)
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    fresh = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    monkeypatch.setattr(llm_resilience, "breaker", fresh)
+    monkeypatch.setattr(llm_resilience, "HEDGE_ENABLED", False)
+    return fresh
+
+
+def _half_open(breaker: CircuitBreaker):
+    breaker.record_failure()
+    breaker.opened_at = time.monotonic() - breaker.reset_timeout - 1
+    assert breaker.state == "half_open"
+
+
+async def _answer():
+    return "ok"
+
+
+def test_open_circuit_short_circuits(breaker):
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(call_with_resilience("intent", "gpt-4o", _answer))
+
+
+def test_half_open_success_closes_circuit(breaker):
+    _half_open(breaker)
+    assert asyncio.run(call_with_resilience("intent", "gpt-4o", _answer)) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_cancelled_trial_lets_the_next_call_probe(breaker):
+    _half_open(breaker)
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.sleep(60)
+
+        trial = asyncio.create_task(call_with_resilience("intent", "gpt-4o", hang))
+        await started.wait()
+        # A second call while the trial is out is short-circuited
+        with pytest.raises(CircuitOpenError):
+            await call_with_resilience("intent", "gpt-4o", _answer)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        return await call_with_resilience("intent", "gpt-4o", _answer)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_cancelling_a_closed_call_leaves_another_trial_alone(breaker):
+    breaker.failure_threshold = 5
+    breaker._trial_in_flight = True  # someone else's probe
+
+    async def scenario():
+        task = asyncio.create_task(call_with_resilience("intent", "gpt-4o", lambda: asyncio.sleep(60)))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert breaker._trial_in_flight
+
+
+def test_trial_with_no_time_left_lets_the_next_call_probe(breaker):
+    _half_open(breaker)
+    with pytest.raises(LLMDeadlineExceeded):
+        asyncio.run(call_with_resilience("intent", "gpt-4o", _answer, deadline=time.perf_counter() - 1))
+    assert asyncio.run(call_with_resilience("intent", "gpt-4o", _answer)) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_cancelling_during_the_hedge_delay_cancels_the_first_attempt():
+    async def scenario():
+        started = asyncio.Event()
+        attempts = []
+
+        async def hang():
+            attempts.append(asyncio.current_task())
+            started.set()
+            await asyncio.sleep(60)
+
+        call = asyncio.create_task(hedged(hang, delay=30, stage="intent"))
+        await started.wait()
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        await asyncio.sleep(0)
+        # Checked before asyncio.run() tears down whatever is still running
+        assert len(attempts) == 1 and attempts[0].cancelled()
+
+    asyncio.run(scenario())
@@ -0,0 +1,108 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models import Chat, Meeting, MeetingParticipant, User
+from app.utils.query_tracking import assert_max_queries
+
+START = datetime(2030, 3, 7, 10)
+
+
+def _meetings(db, count: int, attendees: int = 3):
+    chat = Chat(title="planning")
+    people = [User(name=f"U{i}", email=f"u{i}@example.com") for i in range(attendees)]
+    db.add(chat)
+    db.add_all(people)
+    db.commit()
+    meetings = [
+        Meeting(chat_id=chat.id, title=f"Sync {i}", description="Weekly sync", participant_count=attendees,
+                start_utc=START + timedelta(days=i), end_utc=START + timedelta(days=i, hours=1))
+        for i in range(count)
+    ]
+    db.add_all(meetings)
+    db.commit()
+    db.add_all(MeetingParticipant(meeting_id=meeting.id, user_id=person.id)
+               for meeting in meetings for person in people)
+    db.commit()
+    return chat.id, [meeting.id for meeting in meetings], [person.id for person in people]
+
+
+@pytest.mark.parametrize("count", [1, 25])
+def test_meeting_list_is_one_query_whatever_the_size(client, db, auth, count):
+    chat_id, _, _ = _meetings(db, count)
+    # the current user, then one meeting x participant join
+    with assert_max_queries(2):
+        response = client.get("/api/meetings", params={"chat_id": chat_id}, headers=auth)
+    meetings = response.json()
+    assert len(meetings) == count
+    assert all(len(meeting["participants"]) == 3 for meeting in meetings)
+
+
+def test_unchanged_meeting_list_is_answered_before_any_query(client, db, auth):
+    chat_id, _, _ = _meetings(db, 3)
+    etag = client.get("/api/meetings", params={"chat_id": chat_id}, headers=auth).headers["etag"]
+    with assert_max_queries(1):
+        response = client.get("/api/meetings", params={"chat_id": chat_id},
+                              headers={**auth, "If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_meeting_detail_loads_participants_in_one_query(client, db):
+    _, meeting_ids, _ = _meetings(db, 1, attendees=8)
+    with assert_max_queries(2):
+        response = client.get(f"/api/meetings/{meeting_ids[0]}")
+    assert len(response.json()["participants"]) == 8
+
+
+@pytest.mark.parametrize("count", [1, 20])
+def test_batch_rsvp_runs_a_fixed_number_of_statements(client, db, admin_auth, count):
+    _, meeting_ids, user_ids = _meetings(db, count)
+    rsvps = [{"meeting_id": meeting_id, "user_id": user_id, "response": "confirmed"}
+             for meeting_id in meeting_ids for user_id in user_ids]
+    with assert_max_queries(6):
+        response = client.post("/api/meetings/rsvp", json={"rsvps": rsvps}, headers=admin_auth)
+    result = response.json()
+    assert result["updated"] == len(rsvps)
+    assert {meeting["status"] for meeting in result["meetings"]} == {"confirmed"}
+
+
+def test_users_only_rsvp_for_themselves(client, db, auth):
+    _, meeting_ids, user_ids = _meetings(db, 1)
+    alice = db.query(User).filter(User.email == "alice@example.com").one()
+    db.add(MeetingParticipant(meeting_id=meeting_ids[0], user_id=alice.id))
+    db.commit()
+    rsvps = [{"meeting_id": meeting_ids[0], "user_id": user_id, "response": "declined"}
+             for user_id in [alice.id] + user_ids]
+    result = client.post("/api/meetings/rsvp", json={"rsvps": rsvps}, headers=auth).json()
+    assert result["updated"] == 1
+    assert result["missing"] == [{"meeting_id": meeting_ids[0], "user_id": user_id} for user_id in user_ids]
+    responses = dict(db.query(MeetingParticipant.user_id, MeetingParticipant.response))
+    assert responses == {alice.id: "declined", **{user_id: "invited" for user_id in user_ids}}
+
+
+def test_confirm_meeting(client, db):
+    _, meeting_ids, user_ids = _meetings(db, 1)
+    with assert_max_queries(6):
+        response = client.post(f"/api/meetings/{meeting_ids[0]}/confirm", json={"user_id": user_ids[0]})
+    assert response.json()["meeting_status"] == "scheduled"
+    client.post(f"/api/meetings/{meeting_ids[0]}/confirm", json={"user_id": user_ids[1]})
+    assert client.get(f"/api/meetings/{meeting_ids[0]}").json()["status"] == "confirmed"
+
+
+def test_occurrences_expand_a_series_without_a_query_per_occurrence(client, db, auth):
+    chat_id, meeting_ids, _ = _meetings(db, 1)
+    client.put(f"/api/meetings/{meeting_ids[0]}/recurrence", json={"rrule": "FREQ=DAILY;COUNT=30"}, headers=auth)
+    with assert_max_queries(4):
+        response = client.get("/api/meetings/occurrences", headers=auth, params={
+            "chat_id": chat_id, "start": START.isoformat(), "end": (START + timedelta(days=60)).isoformat(),
+        })
+    assert len(response.json()) == 30
+    assert response.json()[0]["start_utc"] == START.replace(tzinfo=timezone.utc).isoformat()
+
+    ndjson = client.get("/api/meetings/occurrences", headers=auth, params={
+        "chat_id": chat_id, "start": START.isoformat(), "end": (START + timedelta(days=60)).isoformat(),
+        "format": "ndjson",
+    })
+    assert ndjson.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in ndjson.text.splitlines()] == response.json()
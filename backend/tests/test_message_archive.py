@@ -0,0 +1,45 @@
+import importlib.util
+import os
+from datetime import datetime, timedelta
+
+from app.models import Chat, ChatMember, Message, User
+from app.services.message_archive import list_archive_months, read_archived_messages
+
+_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts", "partition_messages.py")
+
+
+def _partition_messages():
+    spec = importlib.util.spec_from_file_location("partition_messages", _SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_archive_moves_old_messages_and_recounts_members(db, tmp_path):
+    from app.database import engine
+
+    alice = User(name="Alice", email="alice@example.com")
+    bob = User(name="Bob", email="bob@example.com")
+    chat = Chat(title="planning")
+    db.add_all([alice, bob, chat])
+    db.commit()
+    old = datetime.utcnow() - timedelta(days=400)
+    recent = datetime.utcnow() - timedelta(days=1)
+    db.add_all([
+        Message(chat_id=chat.id, user_id=alice.id, text="last year", created_at=old),
+        Message(chat_id=chat.id, user_id=alice.id, text="yesterday", created_at=recent),
+        Message(chat_id=chat.id, user_id=bob.id, text="only last year", created_at=old),
+    ])
+    db.commit()
+
+    _partition_messages().command_archive(engine, 365, str(tmp_path), batch_size=1, dry_run=False)
+
+    assert [m.text for m in db.query(Message)] == ["yesterday"]
+    month = old.strftime("%Y-%m")
+    assert list_archive_months(chat.id, str(tmp_path)) == [month]
+    assert {m["text"] for m in read_archived_messages(chat.id, month, str(tmp_path))} == {"last year", "only last year"}
+
+    db.expire_all()
+    members = db.query(ChatMember).filter(ChatMember.chat_id == chat.id).all()
+    assert [(m.user_id, m.message_count) for m in members] == [(alice.id, 1)]
+    assert members[0].first_message_at.replace(tzinfo=None) == recent
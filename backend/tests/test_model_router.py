@@ -0,0 +1,78 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import llm_resilience, scheduling_agent
+from app.services.llm_resilience import CircuitBreaker
+from app.services.model_router import ModelRouter
+from app.services.scheduling_agent import SchedulingAgent
+
+
+class _Stream:
+    def __init__(self, pieces):
+        self._pieces = iter(pieces)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            piece = next(self._pieces)
+        except StopIteration:
+            raise StopAsyncIteration
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+    async def close(self):
+        pass
+
+
+class _StreamingClient:
+    """Streams a canned answer per model, one top-level field per chunk"""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, model, **request):
+        return _Stream(self.answers[model])
+
+
+@pytest.fixture
+def streaming(monkeypatch):
+    monkeypatch.setattr(scheduling_agent, "LLM_STREAMING", True)
+    monkeypatch.setattr(llm_resilience, "HEDGE_ENABLED", False)
+    monkeypatch.setattr(llm_resilience, "breaker", CircuitBreaker())
+
+
+def _detect_intent(answers):
+    agent = SchedulingAgent(db=None, client=_StreamingClient(answers))
+    agent.router = ModelRouter({"intent": ["small", "large"]}, confidence_threshold=0.6)
+    result = asyncio.run(agent._detect_meeting_intent_llm("Alice: hi"))
+    return agent, result
+
+
+def test_unsure_no_intent_still_escalates(streaming):
+    agent, result = _detect_intent({
+        "small": ['{"has_intent": false,', ' "confidence": 0.3,', ' "reasoning": "unclear"}'],
+        "large": ['{"confidence": 0.9,', ' "has_intent": true,', ' "reasoning": "lets meet"}'],
+    })
+    assert agent.stage_models["intent"] == "large"
+    assert result["has_intent"] is True
+
+
+def test_confident_no_intent_exits_before_the_reasoning(streaming):
+    agent, result = _detect_intent({
+        "small": ['{"confidence": 0.9,', ' "has_intent": false,', ' "reasoning": "small talk"}'],
+        "large": [],
+    })
+    assert agent.stage_models["intent"] == "small"
+    assert result == {"confidence": 0.9, "has_intent": False}
+
+
+def test_accepts_early_waits_for_confidence():
+    router = ModelRouter({}, confidence_threshold=0.6)
+    assert not router.accepts_early("intent", {"has_intent": False})
+    assert not router.accepts_early("intent", {"has_intent": False, "confidence": 0.4})
+    assert router.accepts_early("intent", {"has_intent": False, "confidence": 0.6})
+    assert router.accepts_early("missing_info", {"needs_followup": False})
@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from app.models import Chat, Meeting, OutboxMessage, User
+from app.services.outbox import MEETING_CONFIRMATION, enqueue, enqueue_meeting_confirmations
+from app.utils.query_tracking import count_queries
+
+
+def _meeting(db, attendees: int):
+    chat = Chat(title="planning")
+    db.add(chat)
+    db.commit()
+    meeting = Meeting(chat_id=chat.id, title="Sync", description="Weekly sync",
+                      start_utc=datetime(2030, 3, 7, 10), end_utc=datetime(2030, 3, 7, 11))
+    people = [User(name=f"U{i}", email=f"u{i}@example.com") for i in range(attendees)]
+    db.add(meeting)
+    db.add_all(people)
+    db.commit()
+    return meeting, people
+
+
+def test_confirmations_check_every_key_in_one_query(db):
+    meeting, people = _meeting(db, 12)
+    with count_queries() as stats:
+        assert enqueue_meeting_confirmations(db, meeting, people) == 12
+    lookups = [shape for shape in stats.shapes if shape.startswith("SELECT outbox.idempotency_key")]
+    assert len(lookups) == 1 and stats.shapes[lookups[0]] == 1
+    db.commit()
+    assert db.query(OutboxMessage).count() == 12
+
+
+def test_already_queued_confirmations_are_skipped(db):
+    meeting, people = _meeting(db, 3)
+    enqueue_meeting_confirmations(db, meeting, people[:2])
+    db.commit()
+    assert enqueue_meeting_confirmations(db, meeting, people + people) == 1
+    db.commit()
+    assert db.query(OutboxMessage).count() == 3
+    (key,) = db.query(OutboxMessage.idempotency_key).first()
+    assert enqueue(db, MEETING_CONFIRMATION, "u0@example.com", {}, key) is None
@@ -0,0 +1,53 @@
+from datetime import datetime
+
+from prometheus_client import REGISTRY
+
+from app.models import Chat, Meeting
+from app.utils import query_tracking
+from app.utils.metrics import route_label
+
+
+def _exceeded(route: str) -> float:
+    return REGISTRY.get_sample_value("db_query_budget_exceeded_total", {"route": route}) or 0.0
+
+
+def _meeting(db) -> int:
+    chat = Chat(title="planning")
+    db.add(chat)
+    db.commit()
+    meeting = Meeting(chat_id=chat.id, title="Sync", description="Weekly sync",
+                      start_utc=datetime(2030, 3, 7, 10), end_utc=datetime(2030, 3, 7, 11))
+    db.add(meeting)
+    db.commit()
+    return meeting.id
+
+
+def test_route_label_includes_the_router_prefix(client, db):
+    labels = []
+    original = query_tracking.route_label
+    query_tracking.route_label = lambda scope: labels.append(original(scope)) or labels[-1]
+    try:
+        client.get(f"/api/meetings/{_meeting(db)}")
+        client.get("/health")
+    finally:
+        query_tracking.route_label = original
+    assert labels == ["/api/meetings/{meeting_id}", "/health"]
+
+
+def test_route_label_keeps_the_root_path():
+    assert route_label({"root_path": "/backend", "route": None}) == "unmatched"
+    scope = {"root_path": "/backend", "route": type("Route", (), {"path": "/health"})()}
+    assert route_label(scope) == "/backend/health"
+
+
+def test_per_route_budget_is_enforced(client, db, monkeypatch):
+    route = "/api/meetings/{meeting_id}"
+    meeting_id = _meeting(db)
+    monkeypatch.setattr(query_tracking, "ROUTE_BUDGETS", {route: 1})
+    before = _exceeded(route)
+    client.get(f"/api/meetings/{meeting_id}")
+    assert _exceeded(route) == before + 1
+
+    monkeypatch.setattr(query_tracking, "ROUTE_BUDGETS", {route: 10})
+    client.get(f"/api/meetings/{meeting_id}")
+    assert _exceeded(route) == before + 1
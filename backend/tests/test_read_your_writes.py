@@ -0,0 +1,81 @@
+import os
+import tempfile
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import database
+from app.models import Chat, Meeting, User
+
+
+@pytest.fixture
+def stale_replica(monkeypatch):
+    """A healthy replica that hasn't replayed anything: the schema, no rows"""
+    path = os.path.join(tempfile.mkdtemp(prefix="propvivo-replica-"), "replica.db")
+    engine = create_engine(f"sqlite:///{path}")
+    database.Base.metadata.create_all(bind=engine)
+    replica = type("Replica", (), {"session_factory": sessionmaker(bind=engine), "healthy": True})()
+    monkeypatch.setattr(database.replicas, "pick", lambda: replica)
+    yield
+    engine.dispose()
+
+
+def test_just_changed_chats_are_read_from_the_primary(client, db, auth, stale_replica):
+    chat = Chat(title="planning")
+    db.add(chat)
+    db.commit()
+    user_id = db.query(User.id).scalar()
+    posted = client.post("/api/messages", json={"chat_id": chat.id, "user_id": user_id, "text": "hi"},
+                         headers=auth)
+    assert posted.status_code == 200
+
+    # A cross-origin client that didn't echo the pin: a replica read here would tag
+    # an empty body with the new version
+    client.cookies.clear()
+    response = client.get("/api/messages", params={"chat_id": chat.id}, headers=auth)
+    assert [message["text"] for message in response.json()] == ["hi"]
+    assert client.get("/api/messages", params={"chat_id": chat.id},
+                      headers={**auth, "If-None-Match": response.headers["etag"]}).status_code == 304
+    participants = client.get(f"/api/chats/{chat.id}/participants", headers=auth).json()
+    assert [participant["id"] for participant in participants] == [user_id]
+
+
+def test_just_changed_meeting_list_comes_from_the_primary(client, db, auth, stale_replica):
+    chat = Chat(title="planning")
+    db.add(chat)
+    db.commit()
+    db.add(Meeting(chat_id=chat.id, title="Sync", description="Weekly sync",
+                   start_utc=datetime(2030, 3, 7, 10), end_utc=datetime(2030, 3, 7, 11)))
+    db.commit()
+    client.cookies.clear()  # the login's pin
+    response = client.get("/api/meetings", params={"chat_id": chat.id}, headers=auth)
+    assert [meeting["title"] for meeting in response.json()] == ["Sync"]
+
+
+def test_pin_is_readable_cross_origin(client, db, auth):
+    chat = Chat(title="planning")
+    db.add(chat)
+    db.commit()
+    user_id = db.query(User.id).scalar()
+    response = client.post("/api/messages", json={"chat_id": chat.id, "user_id": user_id, "text": "hi"},
+                           headers={**auth, "Origin": "http://localhost:3000"})
+    assert response.headers["x-db-pin"]
+    assert "x-db-pin" in response.headers["access-control-expose-headers"].lower()
+
+
+def test_settled_chats_are_read_from_the_replica(client, db, auth, stale_replica, monkeypatch):
+    from app.utils import chat_versions
+
+    chat = Chat(title="planning")
+    db.add(chat)
+    db.commit()
+    db.add(Meeting(chat_id=chat.id, title="Sync", description="Weekly sync",
+                   start_utc=datetime(2030, 3, 7, 10), end_utc=datetime(2030, 3, 7, 11)))
+    db.commit()
+    client.cookies.clear()
+    # Long enough ago that every replica in rotation has the change
+    monkeypatch.setattr(chat_versions, "REPLICA_SETTLE_SECONDS", 0)
+    response = client.get("/api/meetings", params={"chat_id": chat.id}, headers=auth)
+    assert response.json() == []  # the (stale) replica answered
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import pytz
+
+from app.models import Chat, Meeting, MeetingParticipant, User
+from app.services import user_calendar
+from app.services.user_calendar import decode_cursor, user_meetings, user_meetings_page
+
+UTC = pytz.UTC
+START = datetime(2030, 3, 4, 9, tzinfo=UTC)
+
+
+def _calendar(db):
+    """A daily series plus a single meeting every day at 9:00 (tying with the series) and 15:00"""
+    user = User(name="Alice", email="alice@example.com")
+    chat = Chat(title="planning")
+    db.add_all([user, chat])
+    db.commit()
+    meetings = [Meeting(chat_id=chat.id, title="Standup", description="", rrule="FREQ=DAILY",
+                        start_utc=START, end_utc=START + timedelta(minutes=15))]
+    for day in range(10):
+        for hour in (0, 6):
+            start = START + timedelta(days=day, hours=hour)
+            meetings.append(Meeting(chat_id=chat.id, title=f"Day {day}", description="",
+                                    start_utc=start, end_utc=start + timedelta(hours=1)))
+    db.add_all(meetings)
+    db.commit()
+    db.add_all(MeetingParticipant(meeting_id=meeting.id, user_id=user.id) for meeting in meetings)
+    db.commit()
+    return user.id
+
+
+def _key(entry):
+    return entry.start_utc, entry.meeting_id
+
+
+def test_pages_cover_the_window_once_in_order(db):
+    user_id = _calendar(db)
+    window = (START, START + timedelta(days=10))
+    expected = [_key(entry) for entry in user_meetings(db, user_id, *window)]
+    assert len(expected) == 30
+
+    seen, cursor = [], None
+    while True:
+        entries, cursor = user_meetings_page(db, user_id, *window, limit=4, cursor=cursor)
+        seen += [_key(entry) for entry in entries]
+        if cursor is None:
+            break
+    assert seen == expected
+
+
+def test_series_are_expanded_from_the_cursor(db, monkeypatch):
+    user_id = _calendar(db)
+    window = (START, START + timedelta(days=10))
+    starts = []
+    expand = user_calendar.iter_occurrences
+
+    def recording(db, window_start, window_end, **kwargs):
+        starts.append(window_start)
+        return expand(db, window_start, window_end, **kwargs)
+
+    monkeypatch.setattr(user_calendar, "iter_occurrences", recording)
+    _, cursor = user_meetings_page(db, user_id, *window, limit=4)
+    entries, _ = user_meetings_page(db, user_id, *window, limit=4, cursor=cursor)
+    after = decode_cursor(cursor)
+    assert starts == [START, after[0]]
+    assert _key(entries[0]) > after
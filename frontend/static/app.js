@@ -7,6 +7,8 @@ let messages = [];
 let meetings = [];
 let participants = [];
 let currentUser = null;
+// Read-your-writes pin from our last write (the db_pin cookie isn't sent cross-origin)
+let dbPin = null;
 
 // Initialize app
 document.addEventListener('DOMContentLoaded', function() {
@@ -64,10 +66,27 @@ function getAuthHeaders() {
     const token = localStorage.getItem('authToken');
     return {
         'Content-Type': 'application/json',
-        'Authorization': `Bearer ${token}`
+        'Authorization': `Bearer ${token}`,
+        ...getPinHeaders()
     };
 }
 
+// Echo the pin while it lasts, so reads after our own write see it
+function getPinHeaders() {
+    if (dbPin && parseFloat(dbPin) * 1000 > Date.now()) {
+        return { 'X-DB-Pin': dbPin };
+    }
+    return {};
+}
+
+// Remember the pin a write returns
+function rememberPin(response) {
+    const pin = response.headers.get('X-DB-Pin');
+    if (pin) {
+        dbPin = pin;
+    }
+}
+
 // Load messages
 async function loadMessages() {
     try {
@@ -143,6 +162,7 @@ async function sendMessage() {
                 text: text
             })
         });
+        rememberPin(response);
         
         if (response.ok) {
             const newMessage = await response.json();
@@ -184,11 +204,13 @@ async function scheduleMeeting() {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                ...getPinHeaders()
             },
             body: JSON.stringify({
                 chat_id: CHAT_ID
             })
         });
+        rememberPin(response);
         
         const result = await response.json();
         const resultDiv = document.getElementById('scheduleResult');